@@ -11,6 +11,14 @@
  - if_pass_fully_completed
  - check_subprocesses_status
  - kill_subprocess
+ - pass_boundaries
+ - schedule_pass_boundaries
+ - refresh_config
+ - start_ready_tasks
+ - stop_timed_out_tasks
+ - pass_operations
+ - primary_pass_operations
+ - calibration_pass_operations
  - main (scheduler)
 
 
@@ -21,6 +29,7 @@
  - python sys library
  - python os library
  - python signal library
+ - shared events library
 
 
  @section todo_scheduler TODO
@@ -41,6 +50,17 @@ sys.path.append('/home/debian')
 from shared.config import Config
 from shared.logging import create_logger
 from shared.tasks import Tasks
+from shared.events import TimerHeap, ChildWatcher
+
+# tasks.json keys of the tasks run during and after each type of pass
+PASS_TASK_KEYS = {"PRIMARY": ("pass", "post_pass"),
+                  "CALIBRATION": ("calibration", "post_calibration")}
+
+# longest time (s) the scheduler blocks without a pass boundary or task exit, so that the bus is still polled
+MAX_IDLE_WAIT = 60
+
+# time (s) the scheduler wakes after a pass boundary, as the pass checks use strict comparisons
+BOUNDARY_MARGIN = 0.01
 
 def bus_read():
     """
@@ -126,7 +146,8 @@ def check_subprocesses_status(logger, tasks, complete_flag):
             complete_flag (bool): Boolean, only true if the scheduler has previously logged completion of all tasks
     """
 
-    for process, task_ in tasks.tasks_in_progress:
+    # iterate over a copy as finished tasks are removed from the list
+    for process, task_ in list(tasks.tasks_in_progress):
         task_id = task_["id"]
         task_delay = task_["delay"]
         poll_proc = process.poll()
@@ -140,16 +161,14 @@ def check_subprocesses_status(logger, tasks, complete_flag):
 
             tasks.tasks_in_progress.remove((process, task_))
 
-            # Append the process to an array so that it wasnt repeated
-            tasks.tasks_done.append(task_id)
+            # Append the process to an array so that it wasnt repeated, the delay is held off without blocking
+            tasks.task_finished(task_, datetime.datetime.now().timestamp())
 
             logger.info("Tasks done:")
             for task in tasks.tasks_done:
                 logger.info(str(task))
 
-            # Execute the delay
             logger.info("Waiting "+str(task_delay)+" secs before the next task...")
-            time.sleep(task_delay)
 
     # consider the state of the complete_flag and whether it needs changing to false
     if len(tasks.tasks_in_progress) != 0:
@@ -188,20 +207,164 @@ def kill_subprocess(process, task, tasks,logger):
     tasks_in_progress_copy = [(process, task_) for (process, task_) in tasks.tasks_in_progress if task_['id'] != task_id]
     tasks.tasks_in_progress = tasks_in_progress_copy
 
-    # Append the process to an array so that it wasnt repeated
-    tasks.tasks_done.append(task_id)
+    # Append the process to an array so that it wasnt repeated, the delay is held off without blocking
+    tasks.task_finished(task, datetime.datetime.now().timestamp())
 
     logger.info("Tasks done:")
-    for task in tasks.tasks_done:
-        logger.info(str(task))
+    for task_done in tasks.tasks_done:
+        logger.info(str(task_done))
 
-    # Execute the delay
     logger.info("Waiting "+str(task_delay)+" secs before the next task...")
-    time.sleep(task_delay)
 
-def primary_pass_operations(pass_ongoing, complete_flag, config: Config, tasks, logger):
+def pass_boundaries(config: Config):
     """
-    contains all the logic to perform all the tasks associated with a primary imaging pass
+    Calculates the timestamps at which the state of the pass changes, i.e. the times at which if_pass_started,
+    if_pass_finished or if_pass_fully_completed change their result
+
+        Parameters:
+            config (object): Object containing configuration information
+
+        Returns:
+            boundaries (list: float) - sorted pass boundary timestamps, empty if no pass is scheduled
+    """
+
+    general = config.configFull.general
+
+    if general.pass_start_timestamp is None or general.pass_end_timestamp is None:
+        return []
+
+    boundaries = [general.pass_start_timestamp - general.pre_pass_init,  # pass tasks start
+                  general.pass_end_timestamp - general.pre_pass_init,  # pass no longer ongoing
+                  general.pass_end_timestamp,  # pass finished
+                  general.pass_end_timestamp + general.pass_completion_time - general.pre_pass_init]  # fully completed
+
+    return sorted(boundaries)
+
+def schedule_pass_boundaries(timers: TimerHeap, current_date, config: Config):
+    """
+    Replaces any pass boundary timers with the boundaries of the pass currently in the config
+
+        Parameters:
+            timers (object): TimerHeap holding the scheduler deadlines
+            current_date (float): Current timestamp at time of function call
+            config (object): Object containing configuration information
+
+        Returns:
+            void
+    """
+
+    timers.cancel("pass boundary")
+
+    for boundary in pass_boundaries(config):
+        # the pass checks use strict comparisons, so wake just after the boundary rather than exactly on it
+        deadline = boundary + BOUNDARY_MARGIN
+        if deadline > current_date:
+            timers.schedule(deadline, "pass boundary")
+
+def refresh_config(config: Config, timers: TimerHeap, current_date, logger):
+    """
+    Re-reads the config if another process has changed it, e.g. the telemetry service entering safe mode or a new pass
+    being scheduled, and re-arms the pass boundary timers for the pass now in the config. A config that can not be
+    read is logged and the config in memory kept, it is read again on the next wakeup
+
+        Parameters:
+            config (object): Object containing configuration information
+            timers (object): TimerHeap holding the scheduler deadlines
+            current_date (float): Current timestamp at time of function call
+            logger (object): Object containing information on how to write logs
+
+        Returns:
+            changed (boolean) - True if the config was re-read
+    """
+
+    try:
+        if not config.refresh():
+            return False
+    except Exception:
+        logger.exception("Unable to re-read the changed config, keeping the current one")
+        return False
+
+    general = config.configFull.general
+    logger.info(f"Config changed: {general.next_pass_type} pass from {general.pass_start_timestamp} to "
+                f"{general.pass_end_timestamp}, safe mode {general.safe_mode}")
+    schedule_pass_boundaries(timers, current_date, config)
+
+    return True
+
+def start_ready_tasks(task_list, sequential, pass_ongoing, config: Config, tasks, logger, PassType, current_date,
+                      timers: TimerHeap):
+    """
+    Starts the tasks in a list that are not done or in progress and whose delays and dependencies are satisfied. A
+    timer is scheduled for tasks that become ready later, so the scheduler wakes up to start them
+
+        Parameters:
+            task_list (list: object) - the tasks to start
+            sequential (boolean) - True if each task waits for the previous task in the list to finish
+            pass_ongoing (boolean) - a flag denoting if the pass has started yet
+            config (object): Object containing configuration information
+            tasks (object): Object containing tasks information
+            logger (object): Object containing information on how to write logs
+            PassType (string): type of the pass, PRIMARY or CALIBRATION
+            current_date (float): Current timestamp at time of function call
+            timers (object): TimerHeap holding the scheduler deadlines
+
+        Returns:
+            void
+    """
+
+    in_progress_ids = [task_["id"] for process, task_ in tasks.tasks_in_progress]
+
+    for task in task_list:
+        task_id = task["id"]
+        if task_id in tasks.tasks_done or task_id in in_progress_ids:
+            continue
+
+        timer_name = f"task {task_id} ready"
+        timers.cancel(timer_name)
+
+        ready_time = tasks.ready_time(task, task_list if sequential else None)
+        if ready_time is None:
+            # waiting for another task to finish, its exit will wake the scheduler
+            continue
+        if ready_time > current_date:
+            timers.schedule(ready_time, timer_name, task_id)
+            continue
+
+        proc = tasks.start_task(current_date, pass_ongoing, task, config, logger, PassType)
+
+        if proc is not None and sequential:
+            # wake up to stop the task if it runs past the post-pass timeout
+            timers.schedule(current_date + config.configFull.general.post_pass_timeout, f"task {task_id} timeout",
+                            task_id)
+
+def stop_timed_out_tasks(task_list, config: Config, tasks, logger, current_date):
+    """
+    Stops any task in the list that has been running for longer than the post-pass timeout
+
+        Parameters:
+            task_list (list: object) - the tasks to check
+            config (object): Object containing configuration information
+            tasks (object): Object containing tasks information
+            logger (object): Object containing information on how to write logs
+            current_date (float): Current timestamp at time of function call
+
+        Returns:
+            void
+    """
+
+    timeout = config.configFull.general.post_pass_timeout
+    task_ids = [task["id"] for task in task_list]
+
+    for process, task_ in list(tasks.tasks_in_progress):
+        if task_["id"] in task_ids and current_date - tasks.tasks_started[task_["id"]] >= timeout:
+            # Stop post-pass subprocess due to timeout
+            logger.warning(f"Process ID: {task_['id']} timed out after {timeout} secs")
+            kill_subprocess(process, task_, tasks, logger)
+
+def pass_operations(pass_ongoing, complete_flag, config: Config, tasks, logger, PassType, current_date, timers):
+    """
+    contains all the logic to perform all the tasks associated with a pass, the tasks started depend on the pass type.
+    The function never blocks: task delays, dependencies and timeouts are scheduled as timers instead
 
         Parameters:
             pass_ongoing (boolean) - a flag denoting if the pass has started yet
@@ -209,23 +372,25 @@ def primary_pass_operations(pass_ongoing, complete_flag, config: Config, tasks,
             config (object): Object containing configuration information
             tasks (object): Object containing tasks information
             logger (object): Object containing information on how to write logs
+            PassType (string): type of the pass, PRIMARY or CALIBRATION
+            current_date (float): Current timestamp at time of function call
+            timers (object): TimerHeap holding the scheduler deadlines
 
         Returns:
             complete_flag (boolean) - a flag denoting if the pass is complete
             pass_ongoing (boolean) - a flag denoting if the pass has started yet
     """
-    PassType = "PRIMARY"
+    pass_key, post_pass_key = PASS_TASK_KEYS[PassType]
+
     # check if pass started/finished
-    current_date = datetime.datetime.now().timestamp()
     pass_started = if_pass_started(current_date, config)
     pass_finished = if_pass_finished(current_date, config)
 
     # check if pass subprocesses have reached their extra time allowed after the pass
-    current_date = datetime.datetime.now().timestamp()
     pass_fully_completed = if_pass_fully_completed(current_date, config)
 
     if pass_started and not pass_ongoing:
-        tasks.tasks_done = []
+        tasks.new_pass()
         pass_ongoing = True
     if not pass_started and pass_ongoing:
         pass_ongoing = False
@@ -233,41 +398,29 @@ def primary_pass_operations(pass_ongoing, complete_flag, config: Config, tasks,
     # Check the status of subprocesses
     complete_flag = check_subprocesses_status(logger, tasks, complete_flag)
 
-    # Go through all tasks
-    for task in tasks.tasks["tasks"]:
-        if pass_ongoing:
-            # Start pass tasks simultaneously
-            for task_pass in tasks.tasks['tasks']['pass']:
-                currentTime = datetime.datetime.now().timestamp()
-                proc = tasks.start_task(currentTime, pass_ongoing, task_pass, config, logger,PassType)
-        elif not pass_ongoing and pass_finished and pass_fully_completed:
-            # Stop any unfinished pass tasks
-            if tasks.tasks_in_progress:
-                tasksIds = tasks.pass_tasks_ids(PassType)
-                for process, task_ in tasks.tasks_in_progress:
-                    if task_["id"] in tasksIds:
-                        kill_subprocess(process, task_, tasks, logger)
-
-            # Start post-pass tasks non-simultaneously (wait for one to complete)
-            for task_post_pass in tasks.tasks['tasks']['post_pass']:
-                currentTime = datetime.datetime.now().timestamp()
-                proc = tasks.start_task(currentTime, pass_ongoing, task_post_pass, config, logger,PassType)
-
-                if proc is not None:
-                    try:
-                        proc.communicate(timeout=config.configFull.general.post_pass_timeout)
-                    except subprocess.TimeoutExpired as e:
-                        # Stop post-pass subprocess due to timeout
-                        logger.warning(e)
-                        kill_subprocess(proc, task_post_pass, tasks, logger)
-
-                    # Wait for a proc to complete and check the status of all subprocesses
-                    complete_flag = check_subprocesses_status(logger, tasks, complete_flag)
-    return pass_ongoing,complete_flag,config,tasks,logger
-
-def calibration_pass_operations(pass_ongoing, complete_flag, config: Config, tasks, logger):
+    if pass_ongoing:
+        # Start pass tasks simultaneously
+        start_ready_tasks(tasks.tasks['tasks'][pass_key], False, pass_ongoing, config, tasks, logger, PassType,
+                          current_date, timers)
+    elif pass_finished and pass_fully_completed:
+        # Stop any unfinished pass tasks
+        if tasks.tasks_in_progress:
+            tasksIds = tasks.pass_tasks_ids(PassType)
+            for process, task_ in tasks.tasks_in_progress:
+                if task_["id"] in tasksIds:
+                    kill_subprocess(process, task_, tasks, logger)
+
+        # Start post-pass tasks non-simultaneously (each waits for the previous one to complete)
+        post_pass_tasks = tasks.tasks['tasks'][post_pass_key]
+        stop_timed_out_tasks(post_pass_tasks, config, tasks, logger, current_date)
+        complete_flag = check_subprocesses_status(logger, tasks, complete_flag)
+        start_ready_tasks(post_pass_tasks, True, pass_ongoing, config, tasks, logger, PassType, current_date, timers)
+    return pass_ongoing, complete_flag, config, tasks, logger
+
+def primary_pass_operations(pass_ongoing, complete_flag, config: Config, tasks, logger, current_date=None,
+                            timers=None):
     """
-    contains all the logic to perform all the tasks associated with a calibration pass
+    contains all the logic to perform all the tasks associated with a primary imaging pass
 
         Parameters:
             pass_ongoing (boolean) - a flag denoting if the pass has started yet
@@ -275,61 +428,44 @@ def calibration_pass_operations(pass_ongoing, complete_flag, config: Config, tas
             config (object): Object containing configuration information
             tasks (object): Object containing tasks information
             logger (object): Object containing information on how to write logs
+            current_date (float): Current timestamp, defaults to the time of the function call
+            timers (object): TimerHeap the task timers are scheduled on, timers are discarded if not given
 
         Returns:
             complete_flag (boolean) - a flag denoting if the pass is complete
             pass_ongoing (boolean) - a flag denoting if the pass has started yet
     """
-    PassType = "CALIBRATION"
-    # check if pass started/finished
-    current_date = datetime.datetime.now().timestamp()
-    pass_started = if_pass_started(current_date, config)
-    pass_finished = if_pass_finished(current_date, config)
+    if current_date is None:
+        current_date = datetime.datetime.now().timestamp()
+    if timers is None:
+        timers = TimerHeap()
 
-    # check if pass subprocesses have reached their extra time allowed after the pass
-    current_date = datetime.datetime.now().timestamp()
-    pass_fully_completed = if_pass_fully_completed(current_date, config)
+    return pass_operations(pass_ongoing, complete_flag, config, tasks, logger, "PRIMARY", current_date, timers)
 
-    if pass_started and not pass_ongoing:
-        tasks.tasks_done = []
-        pass_ongoing = True
-    if not pass_started and pass_ongoing:
-        pass_ongoing = False
+def calibration_pass_operations(pass_ongoing, complete_flag, config: Config, tasks, logger, current_date=None,
+                                timers=None):
+    """
+    contains all the logic to perform all the tasks associated with a calibration pass
 
-    # Check the status of subprocesses
-    complete_flag = check_subprocesses_status(logger, tasks, complete_flag)
+        Parameters:
+            pass_ongoing (boolean) - a flag denoting if the pass has started yet
+            complete_flag (boolean) - a flag denoting if the pass is complete
+            config (object): Object containing configuration information
+            tasks (object): Object containing tasks information
+            logger (object): Object containing information on how to write logs
+            current_date (float): Current timestamp, defaults to the time of the function call
+            timers (object): TimerHeap the task timers are scheduled on, timers are discarded if not given
 
-    # Go through all tasks
-    for task in tasks.tasks["tasks"]:
-        if pass_ongoing:
-            # Start pass tasks simultaneously
-            for task_pass in tasks.tasks['tasks']['calibration']:
-                currentTime = datetime.datetime.now().timestamp()
-                proc = tasks.start_task(currentTime, pass_ongoing, task_pass, config, logger,PassType)
-        elif not pass_ongoing and pass_finished and pass_fully_completed:
-            # Stop any unfinished pass tasks
-            if tasks.tasks_in_progress:
-                tasksIds = tasks.pass_tasks_ids(PassType)
-                for process, task_ in tasks.tasks_in_progress:
-                    if task_["id"] in tasksIds:
-                        kill_subprocess(process, task_, tasks, logger)
-
-            # Start post-pass tasks non-simultaneously (wait for one to complete)
-            for task_post_pass in tasks.tasks['tasks']['post_calibration']:
-                currentTime = datetime.datetime.now().timestamp()
-                proc = tasks.start_task(currentTime, pass_ongoing, task_post_pass, config, logger,PassType)
-
-                if proc is not None:
-                    try:
-                        proc.communicate(timeout=config.general.post_pass_timeout)
-                    except subprocess.TimeoutExpired as e:
-                        # Stop post-pass subprocess due to timeout
-                        logger.warning(e)
-                        kill_subprocess(proc, task_post_pass, tasks, logger)
-
-                    # Wait for a proc to complete and check the status of all subprocesses
-                    complete_flag = check_subprocesses_status(logger, tasks, complete_flag)
-    return pass_ongoing, complete_flag, config, tasks, logger
+        Returns:
+            complete_flag (boolean) - a flag denoting if the pass is complete
+            pass_ongoing (boolean) - a flag denoting if the pass has started yet
+    """
+    if current_date is None:
+        current_date = datetime.datetime.now().timestamp()
+    if timers is None:
+        timers = TimerHeap()
+
+    return pass_operations(pass_ongoing, complete_flag, config, tasks, logger, "CALIBRATION", current_date, timers)
 
 
 def main():
@@ -366,6 +502,11 @@ def main():
 
     logger.info(f"performing {config.configFull.general.next_pass_type} pass")
 
+    # the scheduler sleeps until the next pass boundary, task delay or timeout, or until a task subprocess exits
+    timers = TimerHeap()
+    watcher = ChildWatcher()
+    schedule_pass_boundaries(timers, datetime.datetime.now().timestamp(), config)
+
     while True:
 
         # read the bus for new updates
@@ -378,19 +519,28 @@ def main():
 
             # TODO: check what type of information received
             #       if info on next pass received, edit config.json
+            watcher.close()
             return
 
+        current_date = datetime.datetime.now().timestamp()
+        timers.pop_due(current_date)
+
+        # pick up the changes other processes made to the config since the last wakeup
+        refresh_config(config, timers, current_date, logger)
+
         # check type of next pass
         try:
             if config.configFull.general.safe_mode is False:
                 safe_logged = False
                 if config.configFull.general.next_pass_type == "PRIMARY":
                     Pass_Ongoing, Complete_Flag, config, tasks, logger = primary_pass_operations(Pass_Ongoing,Complete_Flag,
-                                                                                                 config,tasks,logger)
+                                                                                                 config,tasks,logger,
+                                                                                                 current_date, timers)
                 elif config.configFull.general.next_pass_type == "CALIBRATION":
                       Pass_Ongoing, Complete_Flag, config, tasks, logger = calibration_pass_operations(Pass_Ongoing,
                                                                                                  Complete_Flag,
-                                                                                                 config, tasks, logger)
+                                                                                                 config, tasks, logger,
+                                                                                                 current_date, timers)
             else:
                 if safe_logged is False:
                     logger.warning("SCHEDULER IN SAFE MODE")
@@ -398,7 +548,11 @@ def main():
         except:
             logger.exception("Incorrect next pass type")
 
-
-        time.sleep(1)
+        # sleep until the next deadline, waking early if a task subprocess exits
+        timeout = MAX_IDLE_WAIT
+        next_deadline = timers.next_deadline()
+        if next_deadline is not None:
+            timeout = min(timeout, next_deadline - datetime.datetime.now().timestamp())
+        watcher.wait(timeout)
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,13 +3,19 @@
  @brief Defines the transfer_image_SD task.
 
  @section description_transfer_image_SD Description
- Defines the transfer_image_SD task that is run after the end of a pass to transfer all the images save on the BBB emmc to the SD card
+ Defines the transfer_image_SD task that is run after the end of a pass to transfer all the images save on the BBB emmc to the SD card.
+ Each file is moved with the shared transfer functions, so it is only removed from the emmc once its copy on the SD card
+ is verified and synced, and a transfer interrupted by a power loss resumes where it stopped the next time the task runs.
+ The files are moved by as many threads as configured for the SD card, timings first and raw frames last.
+ The oldest passes on the SD card are deleted beforehand if the pass would take its usage above the high-water mark
  - main (transfer_image_SD)
 
  @section libraries_transfer_image_SD Libraries/Modules
- - python shutil library
  - python os library
  - python sys library
+ - shared previews library
+ - shared storage library
+ - shared transfer library
 
 
  @section todo_transfer_image_SD TODO
@@ -20,54 +26,14 @@
  - Modified by Louis Timperley on 02/08/2021.
 '''
 
-import shutil
 import os
 import sys
 sys.path.append('/home/debian')
 from shared.config import Config
 from shared.logging import create_logger
-
-def check_free_storage(path,config,logger):
-    """
-        checks there is enough free space (more than 700 MB) on the SD card (and later other external drives) and
-        deletes the oldest files first if not enough space
-
-        Parameters:
-            config (object): Object containing configuration information
-            logger (object): Object containing information on how to write logs
-        Returns:
-             void
-    """
-    # check SD free space
-    total, used, free = shutil.disk_usage(path)
-    deletions = 0
-    logger.info(f'free space on SD: {free}Bytes')
-    # will remove upto three directories before giving up
-    while free < 700000000 & deletions < 3: # 700MB
-        # scan SD directory for the last pass' images
-        scanpath = path
-        files = os.listdir(scanpath)
-        dates = []
-
-        if len(files) > 0:
-            # loop through files in current directory
-            for f in files:
-
-                # identify files with extensions  and assume ones without are folders
-                len = f.rfind('.')
-
-                # if folder, append to list of folders
-                if len == -1:
-                    dates.append(float(f))
-
-            # now delete oldest folder
-            foldername = path+ str(min(dates))
-            logger.info(f'deleting folder: {foldername}')
-            os.rmdir(foldername)
-            deletions = deletions + 1
-        else:
-            logger.info('no more files to remove')
-            break
+from shared.previews import PREVIEW_BYTES, FRAME_EXTENSIONS
+from shared.storage import StorageManager
+from shared.transfer import TransferJournal, transfer_files, transfer_workers, TRANSFER_PRIORITIES
 
 def main():
     """
@@ -81,9 +47,9 @@ def main():
     config = Config()
     logger = create_logger("SD_Transfer","/media/SD1/logs.log")
 
-    #check SD free space then create new directory on SD card, called the timestamp of the most recent pass
+    #create new directory on SD card, called the timestamp of the most recent pass
     SDpath = "/media/SD1" # mounting point for SD card
-    check_free_storage(SDpath,config, logger)
+    storage = StorageManager(SDpath, config.configFull.storage.high_water_mark)
     newdirectory = config.recentpasstimestamp()
 
     newdirectorypath = os.path.join(SDpath, newdirectory) # path to new directory on SD card
@@ -92,32 +58,37 @@ def main():
 
     logger.info("Target directory on SD card: " + str(newdirectorypath))
 
+    # verified copies of the files not yet removed from the emmc, left behind if the last transfer was interrupted
+    journal = TransferJournal(newdirectorypath)
+
     # scan scheduler directory for the last pass' images
     scanpaths = ["/home/debian/Scheduler",
                  "/home/debian/Tasks/basler",
                  "/home/debian/Tasks/tau2"]
 
+    transfers = []
     # loop through scanned directories where images should be
     for dir in scanpaths:
-
-        files =  os.listdir(dir)
-
-        # loop through files in current directory
-        for f in files:
-
-            #identify file extensions
-            len = f.rfind('.')
-            extension = f[len:]
-
-            #if tiff, JPEG, JPG then move Image to directory on SD card
-            if extension == ".tiff" or extension == ".jpeg" or extension == ".jpg" or extension == ".dat":
-                src = dir + "/" + f
-                dst = newdirectorypath + "/"+ f
-                shutil.copyfile(src,dst)
-
-                logger.info("Saved " + f + " to" + str(dst))
-
-                os.remove(src)
+        # images, raw frames and capture timing tables are moved to the directory on the SD card, the previews are
+        # generated there after the transfer
+        for f in os.listdir(dir):
+            if os.path.splitext(f)[1] in TRANSFER_PRIORITIES:
+                transfers.append((os.path.join(dir, f), os.path.join(newdirectorypath, f)))
+
+    # make room for the pass and the previews generated on the SD card after it, deleting the oldest passes if needed
+    needed = sum(os.path.getsize(src) for src, dst in transfers)
+    needed += PREVIEW_BYTES * sum(os.path.splitext(src)[1] in FRAME_EXTENSIONS for src, dst in transfers)
+    storage.evict(needed, keep=[newdirectory], logger=logger)
+
+    workers = transfer_workers(newdirectorypath, config.configFull.storage.transfer_workers)
+    transferred, failed = transfer_files(transfers, journal, workers, logger)
+    storage.record_pass(newdirectory, transferred, len(transfers) - len(failed))
+
+    if not failed:
+        journal.clear()
+    else:
+        # the sources are kept, so the files are transferred the next time the task runs
+        logger.warning(f"{len(failed)} files could not be transferred and were left on the emmc")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
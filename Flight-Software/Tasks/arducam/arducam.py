@@ -21,6 +21,10 @@
  - set_mirror_flip
  - set_compress_quality
  - set_test_pattern
+ - current_boot_id
+ - CameraProfile (class)
+ - BurstFrame (class)
+ - capture_burst
  - main (arducam)
 
 
@@ -30,9 +34,12 @@
  - python datetime library
  - python sys library
  - python os library
+ - python tempfile library
  - python argpass library
  - python json library
  - python types library
+ - shared capture timing library
+ - shared timing library
 
 
  @section todo_arducam TODO
@@ -50,14 +57,28 @@ sys.path.append('/home/debian')
 import argparse
 from shared.logging import create_logger
 from shared.config import Config
+from shared.capture_timing import CaptureTimingLog
+from shared.timing import sleep_until
 import pyBBBCAM
 import time
 import datetime
 import subprocess
 import json
+import os
+import tempfile
 import logging
 from types import SimpleNamespace
 
+# delay after its scheduled time after which a capture is logged as late (ns)
+LATE_CAPTURE_NS = 100000000
+# settings last applied to the sensor
+PROFILE_PATH = "/home/debian/Tasks/arducam/profile.json"
+# id of the current boot
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+# settings of the camera profile, in the order they are applied
+PROFILE_SETTINGS = ["format", "resolution", "lightmode", "saturation", "brightness", "contrast", "special_effects",
+                    "hue", "exposure", "sharpness", "mirror_flip", "compress_quality", "test_pattern"]
+
 def add_arguments(config: Config):
     """
         Adds command line arguments to a python arguments parser
@@ -75,91 +96,91 @@ def add_arguments(config: Config):
         '-res',
         '--resolution', 
         dest='resolution', 
-        default=config.arducam.properties.resolution.default, 
+        default=config.configFull.cameras.arducam.properties.resolution.default, 
         help='change resolution'
     )
     parser.add_argument(
         '-f',
         '--format', 
         dest='format', 
-        default=config.arducam.properties.format.default, 
+        default=config.configFull.cameras.arducam.properties.format.default, 
         help='change format'
     )
     parser.add_argument(
         '-lm',
         '--lightmode', 
         dest='lightmode', 
-        default=config.arducam.properties.lightmode.default,
+        default=config.configFull.cameras.arducam.properties.lightmode.default,
         help='change light mode'
     )
     parser.add_argument(
         '-sat',
         '--saturation', 
         dest='saturation', 
-        default=config.arducam.properties.saturation.default,
+        default=config.configFull.cameras.arducam.properties.saturation.default,
         help='change saturation'
     )
     parser.add_argument(
         '-br',
         '--brightness', 
         dest='brightness', 
-        default=config.arducam.properties.brightness.default,
+        default=config.configFull.cameras.arducam.properties.brightness.default,
         help='change brightness'
     )
     parser.add_argument(
         '-c',
         '--contrast', 
         dest='contrast', 
-        default=config.arducam.properties.contrast.default, 
+        default=config.configFull.cameras.arducam.properties.contrast.default, 
         help='change contrast'
     )
     parser.add_argument(
         '-spec',
         '--specialeffects', 
         dest='special_effects', 
-        default=config.arducam.properties.special_effects.default,
+        default=config.configFull.cameras.arducam.properties.special_effects.default,
         help='change special effects'
     )
     parser.add_argument(
         '-hu',
         '--hue', 
         dest='hue', 
-        default=config.arducam.properties.hue.default, 
+        default=config.configFull.cameras.arducam.properties.hue.default, 
         help='change hue'
     )
     parser.add_argument(
         '-exp',
         '--exposure', 
         dest='exposure', 
-        default=config.arducam.properties.exposure.default,
+        default=config.configFull.cameras.arducam.properties.exposure.default,
         help='change exposure'
     )
     parser.add_argument(
         '-sh',
         '--sharpness', 
         dest='sharpness', 
-        default=config.arducam.properties.sharpness.default,
+        default=config.configFull.cameras.arducam.properties.sharpness.default,
         help='change sharpness'
     )
     parser.add_argument(
         '-mf',
         '--mirrorflip', 
         dest='mirror_flip', 
-        default=config.arducam.properties.mirror_flip.default,
+        default=config.configFull.cameras.arducam.properties.mirror_flip.default,
         help='change mirror flip'
     )
     parser.add_argument(
         '-cq',
         '--compressquality', 
         dest='compress_quality', 
-        default=config.arducam.properties.compress_quality.default,
+        default=config.configFull.cameras.arducam.properties.compress_quality.default,
         help='change compress quality'
     )
     parser.add_argument(
         '-tp',
         '--testpattern', 
         dest='test_pattern', 
-        default=config.arducam.properties.test_pattern.default,
+        default=config.configFull.cameras.arducam.properties.test_pattern.default,
         help='change test pattern'
     )
     parser.add_argument(
@@ -183,25 +204,20 @@ def set_format(arg: int, config: Config, logger: logging.Logger):
             config (Config): config
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2]
-    arg_default = config.arducam.properties.format.default
     
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Format: {arg} (default)")
-        return
-
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_format(arg)
             if result:
-                config.arducam.properties.format.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.format.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Format was changed to: {arg} (non-default)")
+                logger.info(f"Format was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the format. Library result: {result}")
         except Exception as e:
@@ -209,6 +225,8 @@ def set_format(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for format")
 
+    return False
+
 def set_resolution(arg1: int, arg2: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the image resolution
@@ -231,29 +249,23 @@ def set_resolution(arg1: int, arg2: int, config: Config, logger: logging.Logger)
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     jpeg_res_allowed = [0, 1, 2, 3, 4, 5, 6]
     raw_res_allowed = [1, 3, 6, 7]
-    
-    arg_default = config.arducam.properties.resolution.default
 
     # jpeg, bmp
     if arg2 == 1 or arg2 == 0:
-        # return if the value is default
-        if arg1 == arg_default:
-            logger.info(f"JPEG Resolution: {arg1} (default)")
-            return
-
         if arg1 in jpeg_res_allowed:
             try:
                 result = pyBBBCAM.py_set_JPEG_size(arg1)
                 if result:
-                    config.arducam.properties.resolution.value = arg1
-                    config.write_config(config)
+                    config.configFull.cameras.arducam.properties.resolution.value = arg1
+                    config.write_config(config.configFull)
 
-                    logger.info(f"JPEG Resolution was changed to: {arg1} (non-default)")
+                    logger.info(f"JPEG Resolution was changed to: {arg1}")
+                    return True
                 else:
                     logger.info(f"Error when setting the JPEG resolution. Library result: {result}")
             except Exception as e:
@@ -262,19 +274,15 @@ def set_resolution(arg1: int, arg2: int, config: Config, logger: logging.Logger)
             logger.warn(f"Argument {arg1} is not allowed for JPEG resolution")
     # raw
     elif arg2 == 2:
-        # return if the value is default
-        if arg1 == arg_default:
-            logger.info(f"RAW Resolution: {arg1} (default)")
-            return
-
         if arg1 in raw_res_allowed:
             try:
                 result = pyBBBCAM.py_set_RAW_size(arg1)
                 if result:
-                    config.arducam.properties.resolution.value = arg1
-                    config.write_config(config)
+                    config.configFull.cameras.arducam.properties.resolution.value = arg1
+                    config.write_config(config.configFull)
 
-                    logger.info(f"RAW Resolution was changed to: {arg1} (non-default)")
+                    logger.info(f"RAW Resolution was changed to: {arg1}")
+                    return True
                 else:
                     logger.error(f"Error when setting the RAW resolution. Library result: {result}")
             except Exception as e:
@@ -284,6 +292,8 @@ def set_resolution(arg1: int, arg2: int, config: Config, logger: logging.Logger)
     else:
         logger.warn(f"Argument {arg2} is not allowed for format")
 
+    return False
+
 def set_light_mode(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the light mode
@@ -299,25 +309,20 @@ def set_light_mode(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5]
-    arg_default = config.arducam.properties.lightmode.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Light Mode: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Light_Mode(arg)
             if result:
-                config.arducam.properties.lightmode.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.lightmode.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Light Mode was changed to: {arg} (non-default)")
+                logger.info(f"Light Mode was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Light Mode. Library result: {result}")
         except Exception as e:
@@ -325,6 +330,8 @@ def set_light_mode(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for light mode")
 
+    return False
+
 def set_saturation(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the saturation
@@ -343,25 +350,20 @@ def set_saturation(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8]
-    arg_default = config.arducam.properties.saturation.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Saturation: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Color_Saturation(arg)
             if result:
-                config.arducam.properties.saturation.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.saturation.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Saturation was changed to: {arg} (non-default)")
+                logger.info(f"Saturation was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Saturation. Library result: {result}")
         except Exception as e:
@@ -369,6 +371,8 @@ def set_saturation(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Saturation")
 
+    return False
+
 def set_brightness(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the brightness
@@ -387,25 +391,20 @@ def set_brightness(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8]
-    arg_default = config.arducam.properties.brightness.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Brightness: {arg} (default)")
-        return
 
     if arg in args_allowed:     
         try:
             result = pyBBBCAM.py_set_Brightness(arg)
             if result:
-                config.arducam.properties.brightness.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.brightness.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Brightness was changed to: {arg} (non-default)")
+                logger.info(f"Brightness was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Brightness. Library result: {result}")
         except Exception as e:
@@ -413,6 +412,8 @@ def set_brightness(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Brightness")
 
+    return False
+
 def set_contrast(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the contrast
@@ -431,25 +432,20 @@ def set_contrast(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8]
-    arg_default = config.arducam.properties.contrast.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Contrast: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Contrast(arg)
             if result:
-                config.arducam.properties.contrast.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.contrast.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Contrast was changed to: {arg} (non-default)")
+                logger.info(f"Contrast was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Contrast. Library result: {result}")
         except Exception as e:
@@ -457,6 +453,8 @@ def set_contrast(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Contrast")
 
+    return False
+
 def set_special_effects(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the special effects
@@ -473,25 +471,20 @@ def set_special_effects(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [1, 2, 3, 4, 5, 6, 7]
-    arg_default = config.arducam.properties.special_effects.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Special Effects: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Special_effects(arg)
             if result:
-                config.arducam.properties.special_effects.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.special_effects.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Special Effects was changed to: {arg} (non-default)")
+                logger.info(f"Special Effects was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Special effects. Library result: {result}")
         except Exception as e:
@@ -499,6 +492,8 @@ def set_special_effects(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Special effects")
 
+    return False
+
 def set_hue(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the hue
@@ -520,25 +515,20 @@ def set_hue(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
     
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
-    arg_default = config.arducam.properties.hue.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Hue: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_hue(arg)
             if result:
-                config.arducam.properties.hue.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.hue.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Hue was changed to: {arg} (non-default)")
+                logger.info(f"Hue was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Hue. Library result: {result}")
         except Exception as e:
@@ -546,6 +536,8 @@ def set_hue(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Hue")
 
+    return False
+
 def set_exposure(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the exposure
@@ -566,25 +558,20 @@ def set_exposure(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-    arg_default = config.arducam.properties.exposure.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Exposure: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Exposure(arg)
             if result:
-                config.arducam.properties.exposure.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.exposure.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Exposure was changed to: {arg} (non-default)")
+                logger.info(f"Exposure was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Exposure. Library result: {result}")
         except Exception as e:
@@ -592,6 +579,8 @@ def set_exposure(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Exposure")
 
+    return False
+
 def set_sharpness(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the sharpness
@@ -610,25 +599,20 @@ def set_sharpness(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3, 4, 5, 6, 7, 8]
-    arg_default = config.arducam.properties.sharpness.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Sharpness: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Sharpness(arg)
             if result:
-                config.arducam.properties.sharpness.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.sharpness.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Sharpness was changed to: {arg} (non-default)")
+                logger.info(f"Sharpness was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Sharpness. Library result: {result}")
         except Exception as e:
@@ -636,6 +620,8 @@ def set_sharpness(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Sharpness")
 
+    return False
+
 def set_mirror_flip(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the mirror flip setting
@@ -649,25 +635,20 @@ def set_mirror_flip(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
     
     args_allowed = [0, 1, 2, 7]
-    arg_default = config.arducam.properties.mirror_flip.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Mirror Flip: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Mirror_flip(arg)
             if result:
-                config.arducam.properties.mirror_flip.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.mirror_flip.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Mirror Flip was changed to: {arg} (non-default)")
+                logger.info(f"Mirror Flip was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Mirror flip. Library result: {result}")
         except Exception as e:
@@ -675,6 +656,8 @@ def set_mirror_flip(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Mirror flip")
 
+    return False
+
 def set_compress_quality(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the compress quality setting
@@ -687,25 +670,20 @@ def set_compress_quality(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2]
-    arg_default = config.arducam.properties.compress_quality.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Compressibility Quality: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Compress_quality(arg)
             if result:
-                config.arducam.properties.compress_quality.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.compress_quality.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Compressibility Quality was changed to: {arg} (non-default)")
+                logger.info(f"Compressibility Quality was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Compress quality. Library result: {result}")
         except Exception as e:
@@ -713,6 +691,8 @@ def set_compress_quality(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Compress quality")
 
+    return False
+
 def set_test_pattern(arg: int, config: Config, logger: logging.Logger):
     """
         Sends a request to the ArduCAM library to change the test pattern setting
@@ -726,25 +706,20 @@ def set_test_pattern(arg: int, config: Config, logger: logging.Logger):
             logger (object): returns a custom logger object
 
         Returns:
-            void
+            success (boolean): True if the setting was applied
     """
 
     args_allowed = [0, 1, 2, 3]
-    arg_default = config.arducam.properties.test_pattern.default
-
-    # return if the value is default
-    if arg == arg_default:
-        logger.info(f"Test Pattern: {arg} (default)")
-        return
 
     if arg in args_allowed:
         try:
             result = pyBBBCAM.py_set_Test_Pattern(arg)
             if result:
-                config.arducam.properties.test_pattern.value = arg
-                config.write_config(config)
+                config.configFull.cameras.arducam.properties.test_pattern.value = arg
+                config.write_config(config.configFull)
 
-                logger.info(f"Test Pattern was changed to: {arg} (non-default)")
+                logger.info(f"Test Pattern was changed to: {arg}")
+                return True
             else:
                 logger.error(f"Error when setting the Test Pattern. Library result: {result}")
         except Exception as e:
@@ -752,6 +727,233 @@ def set_test_pattern(arg: int, config: Config, logger: logging.Logger):
     else:
         logger.warn(f"Argument {arg} is not allowed for Test Pattern")
 
+    return False
+
+def current_boot_id():
+    """
+        Returns the id of the current boot, the camera is powered with the board so it identifies the sensor's power
+        session
+
+        Parameters:
+            void
+
+        Returns:
+            bootId (string) - the boot id, None if it cannot be read
+    """
+
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+class CameraProfile:
+    """
+    The settings last applied to the camera sensor, cached on disk, so a run only writes the settings that changed.
+    The cache only holds while the sensor keeps its state: pyBBBCAM.py_setup() returns the sensor to its defaults, so
+    a run that sets the camera up calls reset() before apply()
+    ...
+
+    Methods
+    -------
+    reset():
+        Marks the sensor as back at its defaults and invalidates the cache
+    diff(desired):
+        Returns the settings that differ from those last applied
+    apply(desired, config, logger):
+        Writes the changed settings to the sensor, then persists the config and the cache once
+    """
+
+    def __init__(self, defaults, path=PROFILE_PATH):
+        """
+            Initialises the CameraProfile class from the cache. A cache from an earlier boot is ignored, as the sensor
+            is back at its defaults after a power cycle
+
+            Parameters:
+                self (CameraProfile) - default class from the Python convention
+                defaults (dict) - the sensor's power on value of each setting
+                path (string) - path of the cache
+
+            Returns:
+                void
+        """
+
+        self.path = path
+        self.bootId = current_boot_id()
+        self.defaults = dict(defaults)
+        self.applied = dict(defaults)
+
+        try:
+            with open(path) as f:
+                cache = json.load(f)
+            if self.bootId is not None and cache["boot_id"] == self.bootId:
+                self.applied.update(cache["settings"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def reset(self):
+        """
+            Marks the sensor as back at its defaults, after pyBBBCAM.py_setup() has reset it, and removes the cache so
+            a later run does not trust settings the sensor no longer has
+
+            Parameters:
+                self (CameraProfile) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.applied = dict(self.defaults)
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def diff(self, desired):
+        """
+            Returns the settings that differ from those last applied. The resolution is reapplied with a new format,
+            as its allowed values depend on the format
+
+            Parameters:
+                self (CameraProfile) - default class from the Python convention
+                desired (dict) - desired value of each setting
+
+            Returns:
+                changes (dict) - desired value of each setting to write, in the order they are applied
+        """
+
+        changed = [name for name in PROFILE_SETTINGS if self.applied.get(name) != desired[name]]
+        if "format" in changed and "resolution" not in changed:
+            changed.append("resolution")
+
+        return {name: desired[name] for name in PROFILE_SETTINGS if name in changed}
+
+    def apply(self, desired, config: Config, logger: logging.Logger):
+        """
+            Writes the changed settings to the sensor, then persists the config and the cache once. A setting the
+            library rejects is left as last applied, so it is retried on the next run
+
+            Parameters:
+                self (CameraProfile) - default class from the Python convention
+                desired (dict) - desired value of each setting
+                config (Config): config
+                logger (object): returns a custom logger object
+
+            Returns:
+                changes (dict) - the settings that were written
+        """
+
+        changes = self.diff(desired)
+        if not changes:
+            logger.info("Camera settings unchanged")
+            return changes
+
+        with config.batch():
+            for name, value in changes.items():
+                if name == "resolution":
+                    success = set_resolution(value, desired["format"], config, logger)
+                else:
+                    success = PROFILE_SETTERS[name](value, config, logger)
+
+                if success:
+                    self.applied[name] = value
+
+        try:
+            # a temporary file unique to this process, so concurrent runs never replace each other's partial write
+            descriptor, tempPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            with os.fdopen(descriptor, "w") as f:
+                json.dump({"boot_id": self.bootId, "settings": self.applied}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tempPath, self.path)
+        except OSError as e:
+            logger.warning(f"Unable to write the camera profile cache: {e}")
+
+        logger.info(f"{len(changes)} camera settings written: {changes}")
+
+        return changes
+
+# setters of the camera profile settings other than the resolution, which also depends on the format
+PROFILE_SETTERS = {"format": set_format,
+                   "lightmode": set_light_mode,
+                   "saturation": set_saturation,
+                   "brightness": set_brightness,
+                   "contrast": set_contrast,
+                   "special_effects": set_special_effects,
+                   "hue": set_hue,
+                   "exposure": set_exposure,
+                   "sharpness": set_sharpness,
+                   "mirror_flip": set_mirror_flip,
+                   "compress_quality": set_compress_quality,
+                   "test_pattern": set_test_pattern}
+
+class BurstFrame:
+    """
+    The status and timing of an image of a burst capture, times are in nanoseconds since the epoch
+    ...
+
+    Attributes
+    ----------
+    image : int
+        number of the image
+    scheduled : int
+        scheduled capture time
+    trigger : int
+        time the capture started, None if it was not started
+    landed : int
+        time the image was saved, None if the capture failed
+    status : boolean
+        True if the image was captured and saved
+    error : string
+        error reported by the library, empty if none
+    """
+
+    def __init__(self, image, scheduled):
+        self.image = image
+        self.scheduled = scheduled
+        self.trigger = None
+        self.landed = None
+        self.status = False
+        self.error = ""
+
+def capture_burst(times, img_type, logger: logging.Logger):
+    """
+        Captures one image at each of a list of times, in a single call. The camera is set up once before the burst
+        and stays configured, and each capture starts on its deadline (sleep_until) rather than after a coarse sleep.
+        A failed capture is recorded and the burst carries on with the next image
+
+        Parameters:
+            times (list: string) - capture times, as timestamps
+            img_type (int): 0 for pass images, 1 for high-res post-pass images (sets the image names)
+            logger (object): returns a custom logger object
+
+        Returns:
+            frames (list: BurstFrame) - status and timing of each image, in capture order
+    """
+
+    frames = [BurstFrame(i+1, int(float(captureTime) * 10 ** 9)) for i, captureTime in enumerate(times)]
+
+    for frame in frames:
+        frame.trigger = sleep_until(frame.scheduled)
+        if frame.trigger - frame.scheduled > LATE_CAPTURE_NS:
+            logger.warning(f"Image {frame.image} started {(frame.trigger - frame.scheduled) / 10 ** 9:.3f} s late")
+
+        # py_capture returns once the image is saved
+        camCapture = pyBBBCAM.py_capture(1, frame.image, img_type)
+        frame.status = bool(camCapture.status)
+        frame.error = camCapture.error
+
+        if frame.status:
+            frame.landed = time.time_ns()
+        elif len(camCapture.error) > 0:
+            logger.error(camCapture.error)
+
+    captured = sum(frame.status for frame in frames)
+    logger.info(f"Burst of {len(frames)} images done, {captured} captured")
+
+    return frames
+
 
 def main():
     """
@@ -771,11 +973,8 @@ def main():
         logger: logging.Logger = create_logger("ArduCam", logFile)
 
         # parse arguments
-        args = add_arguments()
-        numbOfImages = len(args.times)
-        
-        # Images to capture per single call
-        imgsToCapture = 1
+        args = add_arguments(config)
+
         # Type = 0 for pass images, 1 for high-res post-pass
         img_type = 0
 
@@ -787,69 +986,35 @@ def main():
 
         camSetup = pyBBBCAM.py_setup()
 
-        # Change camera settings after setup (if specified)
-        # Check if argument exists
-        if "format" in vars(args):
-            set_format(int(args.format), config, logger)
-        if "resolution" in vars(args):
-            if "format" in vars(args):
-                set_resolution(int(args.resolution), int(args.format), config, logger)
-            else:
-                set_resolution(int(args.resolution), 1, config, logger)
-        if "lightmode" in vars(args):
-            set_light_mode(int(args.lightmode), config, logger)
-        if "saturation" in vars(args):
-            set_saturation(int(args.saturation), config, logger)
-        if "brightness" in vars(args):
-            set_brightness(int(args.brightness), config, logger)
-        if "contrast" in vars(args):
-            set_contrast(int(args.contrast), config, logger)
-        if "special_effects" in vars(args):
-            set_special_effects(int(args.special_effects), config, logger)
-        if "hue" in vars(args):
-            set_hue(int(args.hue), config, logger)
-        if "exposure" in vars(args):
-            set_exposure(int(args.exposure), config, logger)
-        if "sharpness" in vars(args):
-            set_sharpness(int(args.sharpness), config, logger)
-        if "mirror_flip" in vars(args):
-            set_mirror_flip(int(args.mirror_flip), config, logger)
-        if "compress_quality" in vars(args):
-            set_compress_quality(int(args.compress_quality), config, logger)
-        if "test_pattern" in vars(args):
-            set_test_pattern(int(args.test_pattern), config, logger)
-    
-    
         # Check the camera status after its initialisation
         if not camSetup.status:
             if len(camSetup.error) > 0:
                 logger.error(camSetup.error)
 
-        # Iteration through the capture times
-        for i in range(numbOfImages):
-            currentImage = i+1
-            currentRealTimestamp = time.time()
-            currentImgTimestamp = float(args.times[i])
-
-            # Wait until the capture time is reached and its time to take an image
-            if currentRealTimestamp < currentImgTimestamp:           
-                logger.info("Waiting (s):")
-                waitTime = currentImgTimestamp - currentRealTimestamp            
-                logger.info(waitTime)
-                time.sleep(waitTime)
-
-            # Change the img type to have different image names for post-pass imaging
-            if "resolution" in vars(args):
-                if int(args.resolution) == int(6):
-                    img_type = 1    
-
-            # Start capture & save
-            camCapture = pyBBBCAM.py_capture(imgsToCapture, currentImage, img_type)
-            
-            # Check the camera status after the capture
-            if not camCapture.status:
-                if len(camCapture.error) > 0:
-                    logger.error(camCapture.error)
+        # Apply the camera settings that differ from those last applied to the sensor, the config is written once
+        defaults = {name: getattr(config.configFull.cameras.arducam.properties, name).default for name in PROFILE_SETTINGS}
+        desired = {name: int(getattr(args, name)) for name in PROFILE_SETTINGS}
+        profile = CameraProfile(defaults, PROFILE_PATH)
+        if camSetup.status:
+            # the setup has put the sensor back at its defaults, whatever an earlier run of this boot applied
+            profile.reset()
+        profile.apply(desired, config, logger)
+
+        # Change the img type to have different image names for post-pass imaging
+        if "resolution" in vars(args):
+            if int(args.resolution) == int(6):
+                img_type = 1
+
+        # Capture all the images in one burst, the sensor stays configured between the captures
+        frames = capture_burst(args.times, img_type, logger)
+
+        # timing of each image, written to a csv timing table at the end of the pass
+        timingLog = CaptureTimingLog("arducam-timings.csv", "ArduCam")
+        for frame in frames:
+            timingLog.record(frame.image, frame.scheduled, frame.trigger, frame.landed)
+
+        # Write timings to file and log the trigger jitter of the pass
+        timingLog.write(logger)
 
     except Exception as e:
         logger.error(f"{e}")
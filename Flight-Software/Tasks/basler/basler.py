@@ -18,6 +18,17 @@
  - set_mirror_flip
  - set_compress_quality
  - set_test_pattern
+ - save_image
+ - load_transport_cache
+ - save_transport_cache
+ - apply_transport
+ - remember_transport
+ - configure_triggering
+ - latch_camera_clock
+ - camera_to_host_time
+ - frame_timestamp
+ - find_camera
+ - basler_connect
  - main (basler)
  @section libraries_basler Libraries/Modules
  - python subprocess library
@@ -28,6 +39,11 @@
  - python argpass library
  - python psutil library
  - python PIL library
+ - python numpy library
+ - shared capture timing library
+ - shared pipeline library
+ - shared bayer library
+ - shared timing library
  @section todo_basler TODO
  - None.
  @section author_basler Author(s)
@@ -38,6 +54,7 @@
 
 from pypylon import pylon
 from PIL import Image
+import numpy as np
 import datetime
 import psutil
 import time
@@ -55,6 +72,33 @@ sys.path.append('/Users/nicolekwli/Documents/Bristol/PROVE/Flight-Software/Fligh
 
 from shared.logging import create_logger
 from shared.config import Config
+from shared.capture_timing import CaptureTimingLog, nearest_scheduled
+from shared.pipeline import FramePipeline, BufferPool
+from shared.timing import poll_with_backoff, sleep_until
+from shared.bayer import bayer_format, write_raw
+
+# number of threads encoding and saving images in the background
+ENCODE_WORKERS = 2
+# number of grabbed images that can wait to be saved before the capture loop blocks
+QUEUE_DEPTH = 4
+# longest time (ms) to wait for the camera to be ready for a trigger
+TRIGGER_READY_TIMEOUT = 5000
+# longest time (ms) to wait for an image after its trigger
+GRAB_TIMEOUT = 5000
+# GigE transport parameters, by their pylon names: packet size, frame transmission delay and inter-packet delay
+TRANSPORT_PARAMETERS = ["GevSCPSPacketSize", "GevSCFTD", "GevSCPD"]
+# transport parameters cycled through when none are cached, the camera only works after the first set is applied
+TRANSPORT_PHASES = [{"GevSCPSPacketSize": 16404, "GevSCFTD": 60000, "GevSCPD": 12126},
+                    {"GevSCPSPacketSize": 1000, "GevSCFTD": 60000, "GevSCPD": 10186}]
+# transport parameters of the last successful pass and the recent enumeration times
+TRANSPORT_CACHE_PATH = "/home/debian/Tasks/basler/transport.json"
+# longest time (s) to wait for the camera to enumerate after power up
+ENUMERATION_TIMEOUT = 90
+# number of enumeration times kept in the transport cache
+ENUMERATION_HISTORY = 20
+# number of preallocated image buffers: one being filled by the capture loop and one per encoding thread. The capture
+# loop blocks when every buffer is waiting to be saved, so a pass never holds more images than this in memory
+FRAME_BUFFERS = ENCODE_WORKERS + 1
 
 def add_arguments():
     """
@@ -130,6 +174,11 @@ def add_arguments():
                 nargs='+',
                 dest='pixel_format',
                 help='Set pixel format, default is BayerRG12')
+
+    parser.add_argument(
+                '--raw',
+                action='store_true',
+                help='Save the raw Bayer images and debayer them after the pass, also enabled by raw_capture in the config')
     
     return parser.parse_args()
 
@@ -359,44 +408,202 @@ def set_saturation(camera, config: Config, logger: logging.Logger, saturation):
 
 
 # Camera functions ------------------------------------------
+def save_image(frame, data):
+    """
+    Encodes and saves an image, run by the frame pipeline workers. Raw Bayer images are written straight from their
+    buffer and debayered after the pass. Previews of the images are made by the previews task after the pass
+    Parameters:
+        frame (int): number of the image
+        data (tuple): the image array, the raw pixel format (None for a converted RGB image) and the raw image metadata
+    Returns:
+        void
+    """
+    img, pixelFormat, metadata = data
+
+    if pixelFormat is None:
+        im = Image.fromarray(img)
+        im.save(f"basler-{frame}.tiff")
+    else:
+        write_raw(f"basler-{frame}.bayer", img, pixelFormat, metadata)
+    logger.info(f"Image {frame} was saved")
+
+
+def load_transport_cache(logger):
+    """
+    Loads the transport cache: the GigE transport parameters of the last successful pass and the most recent camera
+    enumeration times
+    Parameters:
+        logger (object): Object containing information on how to write logs
+    Returns:
+        cache (dict): "transport" (dict, None if not known yet) and "enumeration_times" (list: float)
+    """
+    try:
+        with open(TRANSPORT_CACHE_PATH) as f:
+            cache = json.load(f)
+        return {"transport": cache.get("transport"), "enumeration_times": cache.get("enumeration_times", [])}
+    except (OSError, ValueError) as e:
+        logger.info(f"No transport cache loaded: {e}")
+        return {"transport": None, "enumeration_times": []}
+
+def save_transport_cache(cache, logger):
+    """
+    Writes the transport cache, replacing the file atomically
+    Parameters:
+        cache (dict): the transport cache
+        logger (object): Object containing information on how to write logs
+    Returns:
+        void
+    """
+    try:
+        with open(TRANSPORT_CACHE_PATH + ".tmp", "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(TRANSPORT_CACHE_PATH + ".tmp", TRANSPORT_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Unable to write the transport cache: {e}")
+
+def apply_transport(camera, transport):
+    """
+    Sets the GigE transport parameters of the camera
+    Parameters:
+        camera (object): the opened camera
+        transport (dict): value of each transport parameter, by its pylon name
+    Returns:
+        void
+    """
+    for name in TRANSPORT_PARAMETERS:
+        getattr(camera, name).SetValue(transport[name])
+
+def remember_transport(camera, logger):
+    """
+    Caches the camera's current GigE transport parameters as known to work, after a successful pass
+    Parameters:
+        camera (object): the opened camera
+        logger (object): Object containing information on how to write logs
+    Returns:
+        void
+    """
+    cache = load_transport_cache(logger)
+    cache["transport"] = {name: getattr(camera, name).GetValue() for name in TRANSPORT_PARAMETERS}
+    save_transport_cache(cache, logger)
+
+def configure_triggering(camera, logger):
+    """
+    Configures the camera to expose one image per software trigger, with the exposure start timestamp attached to each
+    image as chunk data
+    Parameters:
+        camera (object): the opened camera
+        logger (object): Object containing information on how to write logs
+    Returns:
+        void
+    """
+    camera.TriggerSelector.SetValue("FrameStart")
+    camera.TriggerMode.SetValue("On")
+    camera.TriggerSource.SetValue("Software")
+    logger.info("Frame start triggered by software")
+
+    try:
+        camera.ChunkModeActive.SetValue(True)
+        camera.ChunkSelector.SetValue("Timestamp")
+        camera.ChunkEnable.SetValue(True)
+    except Exception as e:
+        # the grab result timestamp is used instead
+        logger.warning(f"Unable to enable the timestamp chunk: {e}")
+
+def latch_camera_clock(camera):
+    """
+    Reads the camera's timestamp counter together with the host clock, to convert image timestamps to host times
+    Parameters:
+        camera (object): the opened camera
+    Returns:
+        cameraClock (tuple): host time (ns since the epoch), camera timestamp (ticks) at that time and the camera's
+        timestamp tick frequency (Hz)
+    """
+    before = time.time_ns()
+    camera.GevTimestampControlLatch.Execute()
+    after = time.time_ns()
+
+    return (before + after) // 2, camera.GevTimestampValue.GetValue(), camera.GevTimestampTickFrequency.GetValue()
+
+def camera_to_host_time(cameraClock, cameraTimestamp):
+    """
+    Converts a camera timestamp to the host clock
+    Parameters:
+        cameraClock (tuple): the clock latched by latch_camera_clock
+        cameraTimestamp (int): camera timestamp (ticks)
+    Returns:
+        hostTime (int): the timestamp in nanoseconds since the epoch
+    """
+    hostTime, latchedTimestamp, tickFrequency = cameraClock
+
+    return hostTime + (cameraTimestamp - latchedTimestamp) * 10 ** 9 // tickFrequency
+
+def frame_timestamp(grabResult):
+    """
+    Returns the camera timestamp of the exposure start of an image, from its timestamp chunk if it has one
+    Parameters:
+        grabResult (object): the grab result of the image
+    Returns:
+        cameraTimestamp (int): camera timestamp (ticks)
+    """
+    try:
+        return grabResult.ChunkTimestamp.Value
+    except Exception:
+        return grabResult.TimeStamp
+
+def find_camera():
+    """
+    Enumerates the cameras, used as the probe while the camera powers up
+    Parameters:
+        void
+    Returns:
+        device (object): device info of the first camera found, None if none was found
+    """
+    devices = pylon.TlFactory.GetInstance().EnumerateDevices()
+
+    return devices[0] if len(devices) > 0 else None
+
 def basler_connect(logger):
     # now power basler
     logger.info("Powering Basler")
     GPIO.setup("P8_8", GPIO.OUT)
     GPIO.output("P8_8", GPIO.HIGH)
 
-    # add delay for powerup time
-    time.sleep(60)
+    cache = load_transport_cache(logger)
+    camera = None
 
     try:
-        camera = pylon.InstantCamera(pylon.TlFactory.GetInstance().CreateFirstDevice())
+        # poll until the camera has powered up instead of waiting for the worst case power up time
+        device, elapsed = poll_with_backoff(find_camera, ENUMERATION_TIMEOUT)
+        if device is None:
+            raise RuntimeError(f"No camera found after {elapsed:.1f} s")
+
+        # the enumeration times are kept to tune the pre-pass initialisation time (pre_pass_init) from
+        cache["enumeration_times"] = (cache["enumeration_times"] + [round(elapsed, 2)])[-ENUMERATION_HISTORY:]
+        save_transport_cache(cache, logger)
+        logger.info(f"Camera found after {elapsed:.1f} s (slowest of the last "
+                    f"{len(cache['enumeration_times'])}: {max(cache['enumeration_times']):.1f} s)")
+
+        camera = pylon.InstantCamera(pylon.TlFactory.GetInstance().CreateDevice(device))
         camera.Open()
         name = camera.GetDeviceInfo().GetModelName()
         logger.info(f"Camera opened, using camera: {name}")
-        time.sleep(2)
-
-        # Need to cycle through a few different network configurations before reaching the correct one
-        # Print the model name of the camera.
-        logger.info("Using device ", str(camera.GetDeviceInfo().GetModelName()))
-        # Packet Size
-        camera.GevSCPSPacketSize.SetValue(16404)
-        # Frame transmission delay
-        camera.GevSCFTD.SetValue(60000)
-        # Inter - Packet Delay
-        camera.GevSCPD.SetValue(12126)
-
-        logger.info("completed network set parameters phase 1")
-        time.sleep(2)
-
-        # Packet Size
-        camera.GevSCPSPacketSize.SetValue(1000)
-        # Frame transmission delay
-        camera.GevSCFTD.SetValue(60000)
-        # Inter - Packet Delay
-        camera.GevSCPD.SetValue(10186)
-
-        logger.info("completed network set parameters phase 2")
-        time.sleep(2)
+
+        transport = cache["transport"]
+        if transport is not None:
+            try:
+                apply_transport(camera, transport)
+                logger.info(f"Applied cached network parameters: {transport}")
+            except Exception as e:
+                logger.warning(f"Cached network parameters failed, cycling through the defaults: {e}")
+                transport = None
+
+        if transport is None:
+            # Need to cycle through a few different network configurations before reaching the correct one
+            for phase, phaseTransport in enumerate(TRANSPORT_PHASES):
+                time.sleep(2)
+                apply_transport(camera, phaseTransport)
+                logger.info(f"completed network set parameters phase {phase+1}")
+
         return camera
     except Exception as e:
         logger.error(f"Error when opening the camera: {e}")
@@ -405,7 +612,8 @@ def basler_connect(logger):
         GPIO.output("P8_8", GPIO.LOW)
         # Cleanup GPIO pins
         GPIO.cleanup()
-        camera.Close()
+        if camera is not None:
+            camera.Close()
         sys.exit(1) # exit with errors
     
 
@@ -416,7 +624,7 @@ def main():
         Parse arguments
         Instantiate logger
         Take pictures
-        Save pictures and thumbnails
+        Save pictures in the background
     """
 
     error_count = 0
@@ -433,6 +641,8 @@ def main():
                 subprocess.Popen("yes | rm -f *.tiff", shell=True)
                 logger.info("Removing previous .jpeg files...")
                 subprocess.Popen("yes | rm -f *.jpeg", shell=True)
+                logger.info("Removing previous .bayer files...")
+                subprocess.Popen("yes | rm -f *.bayer", shell=True)
 
             logger.info("Basler args = " + str(args.times))
 
@@ -440,115 +650,149 @@ def main():
 
             # Set camera configuration
             logger.info("Applying camera configurations.")
-            if args.gain:
-                set_gain(camera, logger, args.gain)
+            # the config is written once, after all the properties are applied
+            with config.batch():
+                if args.gain:
+                    set_gain(camera, config, logger, args.gain)
 
-            if args.trigger_type:
-                set_trigger_type(camera, logger, args.trigger_type)
+                if args.trigger_type:
+                    set_trigger_type(camera, config, logger, args.trigger_type)
 
-            if args.exposure_mode:
-                set_exposure_mode(camera, logger, args.exposure_mode)
+                if args.exposure_mode:
+                    set_exposure_mode(camera, config, logger, args.exposure_mode)
 
-            if args.exposure_auto:
-                set_exposure_auto(camera, logger, args.exposure_auto)
+                if args.exposure_auto:
+                    set_exposure_auto(camera, config, logger, args.exposure_auto)
 
-            if args.exposure_time:
-                set_exposure_time(camera, logger, args.exposure_time)
-                
-            if args.black_level:
-                set_black_level(camera, logger, args.black_level)
+                if args.exposure_time:
+                    set_exposure_time(camera, config, logger, args.exposure_time)
 
-            if args.white_balance:
-                set_white_balance(camera, logger, args.white_balance)
+                if args.black_level:
+                    set_black_level(camera, config, logger, args.black_level)
 
-            if args.pixel_format:
-                set_pixel_format(camera, logger, args.pixel_format)
+                if args.white_balance:
+                    set_white_balance(camera, config, logger, args.white_balance)
 
-            if args.saturation:
-                set_saturation(camera, logger, args.saturation)
+                if args.pixel_format:
+                    set_pixel_format(camera, config, logger, args.pixel_format)
+
+                if args.saturation:
+                    set_saturation(camera, config, logger, args.saturation)
 
             logger.info("Camera configurations done.")
 
+            # raw images are saved as grabbed, the RGB conversion is left to the debayer task after the pass
+            rawFormat = None
+            if args.raw or config.configFull.cameras.basler.raw_capture:
+                pixelFormat = camera.PixelFormat.GetValue()
+                try:
+                    bayer_format(pixelFormat)
+                    rawFormat = pixelFormat
+                    logger.info(f"Capturing raw {pixelFormat} images")
+                except ValueError as e:
+                    logger.warning(f"Unable to capture raw images, converting to RGB instead: {e}")
+
             # init converter
             converter = pylon.ImageFormatConverter()
             # converting to opencv bgr format
             converter.OutputPixelFormat = pylon.PixelType_RGB8packed
             converter.OutputBitAlignment = pylon.OutputBitAlignment_MsbAligned
 
-            # definition of thumbnail variables
-            thumbnailImage = int(len(args.times)/2)
-            thumbnailSaved = False
+            # timing of each image, written to a csv timing table at the end of the pass
+            timingLog = CaptureTimingLog("basler-timings.csv", "Basler")
+            # scheduled time, exposure start time and pipeline metrics (None if the grab failed) of each image
+            captures = {}
+
+            # each image is copied once, from the grab (or converter) buffer into a pooled buffer large enough for a
+            # full frame of RGB pixels, and the buffer is returned to the pool once the image is saved
+            framePool = BufferPool(FRAME_BUFFERS, camera.Width.GetValue() * camera.Height.GetValue() * 3)
+
+            # the camera is triggered at each scheduled time, grabbing stays active for the whole pass
+            scheduledTimes = [int(float(captureTime) * 10 ** 9) for captureTime in args.times]
+            configure_triggering(camera, logger)
+            cameraClock = latch_camera_clock(camera)
+            triggerTimes = {}
+            camera.StartGrabbing(pylon.GrabStrategy_OneByOne)
+            logger.info("Grabbing started")
+
+            # images are encoded and saved by the pipeline workers while the next image is grabbed
+            with FramePipeline(save_image, ENCODE_WORKERS, QUEUE_DEPTH, logger,
+                               lambda data: framePool.release(data[0])) as pipeline:
+                for testNum, scheduledTime in enumerate(scheduledTimes):
+                    camera.WaitForFrameTriggerReady(TRIGGER_READY_TIMEOUT, pylon.TimeoutHandling_ThrowException)
+                    triggerTime = sleep_until(scheduledTime)
+                    camera.ExecuteSoftwareTrigger()
+                    triggerTimes[testNum+1] = triggerTime
+
+                    grabResult = camera.RetrieveResult(GRAB_TIMEOUT, pylon.TimeoutHandling_Return)
+                    if not grabResult.IsValid():
+                        logger.error(f"No image received for the trigger of image {testNum+1}")
+                        continue
 
-            for testNum in range(len(args.times)):            
-                # demonstrate some feature access
-                new_width = camera.Width.GetValue() - camera.Width.GetInc()
-                if new_width >= camera.Width.GetMin():
-                    camera.Width.SetValue(new_width)
-
-                logger.info("New width assigned")
-                
-
-                numberOfImagesToGrab = 1
-                camera.StartGrabbingMax(numberOfImagesToGrab)
-
-                logger.info("StartGrabbingMax done")
+                    if grabResult.GrabSucceeded():
+                        # the camera's timestamp of the exposure start, on the host clock, matches the image to its
+                        # scheduled time
+                        cameraTimestamp = frame_timestamp(grabResult)
+                        captureTime = camera_to_host_time(cameraClock, cameraTimestamp)
+                        frame = nearest_scheduled(scheduledTimes, captureTime) + 1
+                        if frame != testNum+1:
+                            logger.warning(f"Image of trigger {testNum+1} was captured nearest the time of image {frame}")
+                        if frame in captures:
+                            # keep the image already saved for the slot, rather than overwriting it and its timings
+                            logger.error(f"Image of trigger {testNum+1} dropped, image {frame} was already captured")
+                            grabResult.Release()
+                            continue
+
+                        logger.info(f"Grab Succeeded, image {frame}, SizeX: {grabResult.Width}, "
+                                    f"SizeY: {grabResult.Height}, exposure started "
+                                    f"{(captureTime - scheduledTimes[frame-1]) / 1000:.1f} us after schedule")
+
+                        if rawFormat is None:
+                            image = converter.Convert(grabResult)
+                            pixels = image.GetArrayZeroCopy()
+                            metadata = None
+                        else:
+                            pixels = grabResult.GetArrayZeroCopy()
+                            metadata = {"frame": frame, "scheduled_ns": scheduledTimes[frame-1],
+                                        "trigger_ns": triggerTime, "capture_ns": captureTime,
+                                        "camera_timestamp": cameraTimestamp}
+
+                        # the only copy of the pixels, the grab buffer goes straight back to pylon
+                        img = None
+                        try:
+                            with pixels as view:
+                                img = framePool.acquire(view.shape, view.dtype)
+                                np.copyto(img, view)
+                            grabResult.Release()
+
+                            metrics = pipeline.submit(frame, (img, rawFormat, metadata))
+                        except Exception:
+                            # the pipeline only releases the buffers of the frames it was handed, return this one to
+                            # the pool so failed frames can not exhaust it and block the grab loop
+                            if img is not None:
+                                framePool.release(img)
+                            raise
+                        captures[frame] = (scheduledTimes[frame-1], captureTime, metrics)
+                    else:
+                        logger.error(f"Grab Failed: {grabResult.GetErrorDescription()}")
+                        grabResult.Release()
 
-                num = 0
+            camera.StopGrabbing()
 
-                myimagList = []
+            # images never grabbed are recorded at the time they were triggered, without a landing time
+            for testNum, scheduledTime in enumerate(scheduledTimes):
+                if testNum+1 not in captures:
+                    captures[testNum+1] = (scheduledTime, triggerTimes.get(testNum+1, scheduledTime), None)
 
-                while camera.IsGrabbing():
-                    if time.time() < float(args.times[testNum]):
-                        
-                        logger.info("Waiting (s):")
-                        waitTime = float(args.times[testNum]) - time.time()
-                        
-                        logger.info(waitTime)
-                        time.sleep(waitTime)
-                    
-                    grabResult = camera.RetrieveResult(50000, pylon.TimeoutHandling_ThrowException)
+            # the network parameters worked for the whole pass, use them straight away next time
+            remember_transport(camera, logger)
 
-                    if grabResult.GrabSucceeded():
-                        
-                        logger.info("Grab Succeeded")
-                        # Access the image data.
-                        
-                        logger.info("SizeX: " + str(grabResult.Width))
-                        
-                        logger.info("SizeY: " + str(grabResult.Height))
-                        image = converter.Convert(grabResult)
-                        img = image.GetArray()
-                        
-                        logger.info("Colour of first pixel: " + str(img[0, 0]))
-                        myimagList.append( Image.fromarray(img))
-                        # myimagList.append( cv2.fromarray(img))
-
-                        #im.save(f"basler-{num}-{testNum}.png")
-                        #print("AFTER SAVING:-", datetime.datetime.now())
-                    else:
-                        logger.error("Grab Failed")
-                    num=num+1
-                    grabResult.Release()
-
-
-                for i, im in enumerate(myimagList):
-                    # cv2.imwrite("basler-{testNum+1}.tiff", im) 
-                    im.save(f"basler-{testNum+1}.tiff")
-                    logger.info(f"Image {testNum+1} was saved")
-
-                    # saves a thumbnail
-                    if testNum+1 == thumbnailImage:
-                        im.save(f"thumb-{thumbnailImage}.jpeg")
-                        logger.info(f"Thumbnail of img {thumbnailImage} was saved")
-                        thumbnailSaved = True
-                    
-                    # saves a thumbnail if it failed to be saved before
-                    if testNum+1 > thumbnailImage:
-                        if thumbnailSaved is False:
-                            logger.warning(f"Thumbnail FAILED to be saved for image {thumbnailImage}")
-                            im.save(f"thumb-{testNum+1}.jpeg")
-                            logger.info(f"Thumbnail of img {testNum+1} was saved")
-                            thumbnailSaved = True
+            # Write timings to file and log the trigger jitter of the pass. An image lands once the pipeline has
+            # saved it, the whole capture is retried after an error, count the attempts as retries
+            for frame, (scheduledTime, captureTime, metrics) in sorted(captures.items()):
+                landedTime = metrics.finished if metrics is not None else None
+                timingLog.record(frame, scheduledTime, captureTime, landedTime, error_count)
+            timingLog.write(logger)
 
             camera.Close()
             logger.info("Camera closed")
@@ -562,7 +806,8 @@ def main():
         except Exception as e:
             error_count += 1
             logger.error(f"{e}")
-            # try to set up camera connection again
+            # try to set up camera connection again, the camera stays powered so it is found straight away
+            camera.Close()
             camera = basler_connect(logger)
 
     logger.info("Too many errors occured. Quitting program...")
@@ -0,0 +1,125 @@
+'''@file debayer.py
+
+ @brief Defines the debayer task.
+
+ @section description_debayer Description
+ Defines the debayer task that converts the raw Bayer images saved by the basler task in raw capture mode to RGB TIFF
+ images. It is run in idle time, away from the passes, and can be given a time budget: images that already have a
+ TIFF are skipped, so a run that stops at its budget carries on where it left off on the next run.
+ - add_arguments
+ - find_raw_images
+ - debayer_image
+ - main (debayer)
+
+ @section libraries_debayer Libraries/Modules
+ - python argparse library
+ - python os library
+ - python sys library
+ - python time library
+ - python PIL library
+ - shared bayer library
+
+ @section todo_debayer TODO
+ - None.
+'''
+
+import argparse
+import os
+import sys
+import time
+from PIL import Image
+sys.path.append('/home/debian')
+from shared.logging import create_logger
+from shared.bayer import read_raw, debayer
+
+def add_arguments():
+    """
+    Adds command line arguments to a python argument parser
+    Parameters:
+        void
+    Returns:
+        parser.parse_args() (object): arguments object
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+                '--path',
+                default='/media/SD1',
+                help='Directory searched (with its sub-directories) for raw Bayer images')
+
+    parser.add_argument(
+                '--budget',
+                type=float,
+                default=0,
+                help='Seconds to spend debayering before stopping, 0 for no limit')
+
+    return parser.parse_args()
+
+def find_raw_images(path):
+    """
+    Finds the raw Bayer images that have not been debayered yet, oldest first
+    Parameters:
+        path (string): directory searched, with its sub-directories
+    Returns:
+        rawImages (list: string): paths of the raw images
+    """
+    rawImages = []
+
+    for directory, _, files in os.walk(path):
+        for f in files:
+            name, extension = os.path.splitext(f)
+            if extension == ".bayer" and name + ".tiff" not in files:
+                rawImages.append(os.path.join(directory, f))
+
+    return sorted(rawImages, key=os.path.getmtime)
+
+def debayer_image(rawImage):
+    """
+    Debayers a raw Bayer image and saves it as a TIFF next to it. The TIFF is written to a temporary file and renamed,
+    so an interrupted run never leaves a partial TIFF that would be skipped on the next run
+    Parameters:
+        rawImage (string): path of the raw image
+    Returns:
+        tiffImage (string): path of the TIFF image
+    """
+    pixels, metadata = read_raw(rawImage)
+
+    tiffImage = os.path.splitext(rawImage)[0] + ".tiff"
+    tempImage = tiffImage + ".tmp"
+    Image.fromarray(debayer(pixels, metadata["pattern"], metadata["bits"])).save(tempImage, format="TIFF")
+    os.replace(tempImage, tiffImage)
+
+    return tiffImage
+
+def main():
+    """
+    Main code for the debayer task.
+    Steps:
+        Parse arguments
+        Find the raw images not debayered yet
+        Debayer them until the time budget runs out
+    """
+    args = add_arguments()
+    logger = create_logger("Debayer", "/media/SD1/logs.log")
+
+    startTime = time.monotonic()
+    rawImages = find_raw_images(args.path)
+    logger.info(f"{len(rawImages)} raw images to debayer in {args.path}")
+
+    done = 0
+    for i, rawImage in enumerate(rawImages):
+        if args.budget > 0 and time.monotonic() - startTime >= args.budget:
+            logger.info(f"Time budget of {args.budget} s used, {len(rawImages) - i} raw images left")
+            break
+
+        try:
+            tiffImage = debayer_image(rawImage)
+            logger.info(f"Debayered {rawImage} to {tiffImage}")
+            done += 1
+        except Exception as e:
+            logger.error(f"Error when debayering {rawImage}: {type(e).__name__}: {e}")
+
+    logger.info(f"Debayered {done} images in {time.monotonic() - startTime:.1f} s")
+
+if __name__ == "__main__":
+    main()
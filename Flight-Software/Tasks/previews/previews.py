@@ -0,0 +1,179 @@
+'''@file previews.py
+
+ @brief Defines the previews task.
+
+ @section description_previews Description
+ Defines the previews task that is run after the images of a pass have been transferred to the SD card. It writes a
+ small JPEG preview of every frame of the pass (basler TIFF and raw Bayer images, tau frames and arducam images) to
+ the pass' previews directory, so the pass can be triaged from a few kilobytes per frame. Each preview is encoded at
+ the highest JPEG quality that fits the preview size budget, and previews newer than their frame are not regenerated.
+ The space the previews take is added to the pass in the SD card's storage index.
+ - add_arguments
+ - load_preview
+ - encode_preview
+ - main (previews)
+
+ @section libraries_previews Libraries/Modules
+ - python argparse library
+ - python io library
+ - python os library
+ - python sys library
+ - python numpy library
+ - python PIL library
+ - shared previews library
+ - shared bayer library
+ - shared storage library
+
+ @section todo_previews TODO
+ - None.
+'''
+
+import argparse
+import io
+import os
+import sys
+import numpy as np
+from PIL import Image
+sys.path.append('/home/debian')
+from shared.config import Config
+from shared.logging import create_logger
+from shared.bayer import read_raw
+from shared.previews import PREVIEW_DIRECTORY, PREVIEW_SIZE, PREVIEW_BYTES, FRAME_EXTENSIONS, preview_path, \
+    needs_preview, downscale, superpixel, normalize
+from shared.storage import StorageManager
+
+# JPEG qualities tried, highest first, until the preview fits in PREVIEW_BYTES
+PREVIEW_QUALITIES = [85, 70, 55, 40, 25, 10]
+# shape of a tau frame by the size of its .dat file (16 bit pixels)
+TAU_FRAME_SHAPES = {640 * 512 * 2: (512, 640), 336 * 256 * 2: (256, 336)}
+
+def add_arguments():
+    """
+    Adds command line arguments to a python argument parser
+    Parameters:
+        void
+    Returns:
+        parser.parse_args() (object): arguments object
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+                '--path',
+                help='Directory of the frames, the most recent pass directory on the SD card if not given')
+
+    return parser.parse_args()
+
+def load_preview(source):
+    """
+    Loads a frame downscaled to the preview size and converted to 8 bits
+    Parameters:
+        source (string): path of the frame
+    Returns:
+        image (numpy.ndarray): uint8 array of the preview, None if the frame is not an image
+    """
+    extension = os.path.splitext(source)[1]
+
+    if extension == ".bayer":
+        pixels, metadata = read_raw(source)
+        return normalize(downscale(superpixel(pixels, metadata["pattern"])), metadata["bits"])
+
+    if extension == ".dat":
+        size = os.path.getsize(source)
+        if size not in TAU_FRAME_SHAPES:
+            return None
+        pixels = np.fromfile(source, dtype=np.uint16).reshape(TAU_FRAME_SHAPES[size])
+        return normalize(downscale(pixels))
+
+    with Image.open(source) as im:
+        # lets the JPEG decoder downscale while decoding
+        im.draft("RGB", (PREVIEW_SIZE, PREVIEW_SIZE))
+        return normalize(downscale(np.asarray(im.convert("RGB"))), 8)
+
+def encode_preview(image):
+    """
+    Encodes a preview as a JPEG at the highest quality that fits in PREVIEW_BYTES
+    Parameters:
+        image (numpy.ndarray): uint8 array of the preview
+    Returns:
+        jpeg (bytes): the encoded preview, at the lowest quality if none fits
+        quality (int): JPEG quality used
+    """
+    im = Image.fromarray(image)
+
+    for quality in PREVIEW_QUALITIES:
+        buffer = io.BytesIO()
+        im.save(buffer, format="JPEG", quality=quality)
+        if buffer.tell() <= PREVIEW_BYTES:
+            break
+
+    return buffer.getvalue(), quality
+
+def main():
+    """
+    Main code for the previews task.
+    Steps:
+        Parse arguments
+        Find the frames without an up to date preview
+        Write their previews
+    """
+    args = add_arguments()
+    logger = create_logger("Previews", "/media/SD1/logs.log")
+
+    SDpath = "/media/SD1" # mounting point for SD card
+    path = args.path
+    if path is None:
+        path = os.path.join(SDpath, Config().recentpasstimestamp())
+
+    os.makedirs(os.path.join(path, PREVIEW_DIRECTORY), exist_ok=True)
+
+    # one preview per frame name, a raw Bayer image and its debayered TIFF share a preview
+    sources = {}
+    for f in sorted(os.listdir(path)):
+        name, extension = os.path.splitext(f)
+        if extension in FRAME_EXTENSIONS and name not in sources:
+            sources[name] = os.path.join(path, f)
+
+    written = 0
+    totalBytes = 0
+    # space taken on the card by the new previews, less that of the previews they replace
+    addedBytes = 0
+    addedFiles = 0
+    for source in sources.values():
+        if not needs_preview(source):
+            continue
+
+        try:
+            image = load_preview(source)
+            if image is None:
+                logger.warning(f"{source} is not a frame, no preview written")
+                continue
+
+            jpeg, quality = encode_preview(image)
+
+            preview = preview_path(source)
+            if os.path.exists(preview):
+                addedBytes -= os.path.getsize(preview)
+            else:
+                addedFiles += 1
+            with open(preview + ".tmp", "wb") as f:
+                f.write(jpeg)
+            os.replace(preview + ".tmp", preview)
+
+            logger.info(f"Preview of {source} written to {preview} ({len(jpeg)} bytes, quality {quality})")
+            written += 1
+            totalBytes += len(jpeg)
+            addedBytes += len(jpeg)
+        except Exception as e:
+            logger.error(f"Error when writing the preview of {source}: {type(e).__name__}: {e}")
+
+    logger.info(f"{written} previews written ({totalBytes} bytes), {len(sources) - written} frames skipped or failed")
+
+    # keep the size of the pass in the SD card's storage index up to date
+    if written and os.path.dirname(os.path.abspath(path)) == SDpath:
+        try:
+            StorageManager(SDpath).record_pass(os.path.basename(os.path.abspath(path)), addedBytes, addedFiles)
+        except OSError as e:
+            logger.error(f"Unable to record the previews in the storage index: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -9,42 +9,208 @@
 #include <mutex>
 #include <fstream>
 #include <typeinfo>
+#include <vector>
+#include <condition_variable>
+#include <cerrno>
+#include <fcntl.h>
+#include <unistd.h>
+#include <csignal>
 
 using namespace std;
 
-ThermalGrabber* tGr;
-class Test
+// largest tau core resolution, the frame buffers are allocated at this size up front
+const unsigned int MAX_FRAME_WIDTH = 640;
+const unsigned int MAX_FRAME_HEIGHT = 512;
+// frames that can wait to be written, frames arriving while the ring is full are dropped
+const size_t FRAME_RING_SIZE = 16;
+
+// Copies frames from the grabber callback into a ring of preallocated buffers and writes them to file on its own
+// thread, so the callback returns as soon as the frame is copied. Once a frame file is written, a line
+// "<file number> <receive time ns> <pps timestamp ms> <bytes>" is sent to the frame fifo, if one is given, so the
+// python controller knows the frame has landed without polling the file system
+class FrameSink
 {
 public:
-    void test(int cppduration, char* gainMode, char* agcType, char* contrast, char* brightness);
+    FrameSink(size_t ringSize, const char* framePipe);
+    ~FrameSink();
+    bool push(const TauRawBitmap& tauRawBitmap);
+
+private:
+    struct Frame
+    {
+        vector<unsigned short> data;
+        unsigned int width;
+        unsigned int height;
+        int fileNo;
+        long long receiveTime;      // time the frame reached the callback, ns since the epoch
+        unsigned int ppsTimestamp;  // ms since the last pps rising edge, from the camera
+    };
+
+    void writeFrames();
+
+    vector<Frame> ring;
+    size_t head = 0;        // oldest frame waiting to be written
+    size_t count = 0;       // frames waiting to be written
+    int fileNo = 0;         // number of the next frame file
+    int dropped = 0;        // frames dropped because the ring was full
+    int pipeFd = -1;        // write end of the frame fifo, -1 if there is none
+    bool stopping = false;
+    mutex ringMutex;
+    condition_variable frameReady;
+    thread writer;
 };
 
-void callbackTauImage(TauRawBitmap& tauRawBitmap, void* caller)
+FrameSink::FrameSink(size_t ringSize, const char* framePipe) : ring(ringSize)
 {
-    //std::cout << "updateTauRawBitmap -> w/h: " << tauRawBitmap.width << "/" << tauRawBitmap.height << " min/max: " << tauRawBitmap.min << "/" << tauRawBitmap.max << std::endl;
-    
-    static int fileNo = 0;
-    int i = 0;
+    for (Frame& frame : ring)
+    {
+        frame.data.resize(MAX_FRAME_WIDTH * MAX_FRAME_HEIGHT);
+    }
+
+    // the reader opens the fifo before starting this program, non-blocking so a reader that stops reading can not
+    // stall the writer thread
+    if (strlen(framePipe) > 0)
+    {
+        pipeFd = open(framePipe, O_WRONLY | O_NONBLOCK);
+        if (pipeFd < 0)
+        {
+            std::cout << "Unable to open frame fifo {" << framePipe << "}: " << strerror(errno) << std::endl;
+        }
+    }
+    writer = thread(&FrameSink::writeFrames, this);
+}
+
+FrameSink::~FrameSink()
+{
+    // write the frames still in the ring before stopping
+    {
+        lock_guard<mutex> lock(ringMutex);
+        stopping = true;
+    }
+    frameReady.notify_one();
+    writer.join();
+
+    if (dropped > 0)
+    {
+        std::cout << "Frames dropped: " << dropped << std::endl;
+    }
+    if (pipeFd >= 0)
+    {
+        close(pipeFd);
+    }
+}
+
+bool FrameSink::push(const TauRawBitmap& tauRawBitmap)
+{
+    long long receiveTime = chrono::duration_cast<chrono::nanoseconds>(
+        chrono::system_clock::now().time_since_epoch()).count();
+    size_t slot;
+    {
+        lock_guard<mutex> lock(ringMutex);
+        if (count == ring.size())
+        {
+            dropped++;
+            return false;
+        }
+        slot = (head + count) % ring.size();
+    }
+
+    // the grabber calls back from a single thread, so the free slot can be filled outside the lock
+    Frame& frame = ring[slot];
+    size_t pixels = tauRawBitmap.width * tauRawBitmap.height;
+    if (frame.data.size() < pixels)
+    {
+        frame.data.resize(pixels);
+    }
+    memcpy(frame.data.data(), tauRawBitmap.data, pixels * sizeof(unsigned short));
+    frame.width = tauRawBitmap.width;
+    frame.height = tauRawBitmap.height;
+    frame.fileNo = fileNo++;
+    frame.receiveTime = receiveTime;
+    frame.ppsTimestamp = tauRawBitmap.pps_timestamp;
 
-    char myarray[50];
+    {
+        lock_guard<mutex> lock(ringMutex);
+        count++;
+    }
+    frameReady.notify_one();
 
-    int n=sprintf(myarray,"pass-1-file-%d.dat",fileNo);
+    return true;
+}
 
-    printf("%s",myarray);
+void FrameSink::writeFrames()
+{
+    char fileName[50];
+    char message[100];
 
-    ofstream fout(myarray, ios::binary);// open image file
-    // when the headers alone are written to the file, 54 bytes are written which is to be expected
-    while(i < tauRawBitmap.width * tauRawBitmap.height)         {
-            //std::cout << i << "\t"<< tauRawBitmap.data[i] << std::endl; //print pixel value (really slows things down)
-            fout.write((char*)&tauRawBitmap.data[i], sizeof(tauRawBitmap.data[i])); //save pixel value
-            i++;
+    while (true)
+    {
+        Frame* frame;
+        {
+            unique_lock<mutex> lock(ringMutex);
+            frameReady.wait(lock, [this] { return count > 0 || stopping; });
+            if (count == 0)
+            {
+                return;
+            }
+            frame = &ring[head];
         }
-    fileNo ++;
-    fout.close();
+
+        // the frame keeps its slot until it is written, so the callback can not overwrite it
+        sprintf(fileName, "pass-1-file-%d.dat", frame->fileNo);
+        size_t bytes = frame->width * frame->height * sizeof(unsigned short);
+        ofstream fout(fileName, ios::binary);// open image file
+        fout.write((char*)frame->data.data(), bytes); //save all pixel values
+        fout.close();
+        std::cout << fileName << std::endl;
+
+        // signal the frame has landed, a message shorter than PIPE_BUF is written whole or not at all
+        if (pipeFd >= 0 && fout)
+        {
+            int length = snprintf(message, sizeof(message), "%d %lld %u %zu\n", frame->fileNo, frame->receiveTime,
+                                  frame->ppsTimestamp, bytes);
+            if (write(pipeFd, message, length) < 0)
+            {
+                std::cout << "Unable to signal frame " << frame->fileNo << ": " << strerror(errno) << std::endl;
+            }
+        }
+
+        {
+            lock_guard<mutex> lock(ringMutex);
+            head = (head + 1) % ring.size();
+            count--;
+        }
+    }
+}
+
+// set by SIGTERM/SIGINT, the program then closes the camera and writes its remaining frames before exiting
+volatile sig_atomic_t stopRequested = 0;
+
+void handleStop(int signum)
+{
+    stopRequested = 1;
 }
-void Test::test(int cppduration, char* gainMode, char* agcType, char* contrast, char* brightness)
+
+ThermalGrabber* tGr;
+class Test
+{
+public:
+    FrameSink* sink;
+    void test(int cppduration, char* gainMode, char* agcType, char* contrast, char* brightness, char* framePipe);
+};
+
+void callbackTauImage(TauRawBitmap& tauRawBitmap, void* caller)
+{
+    //std::cout << "updateTauRawBitmap -> w/h: " << tauRawBitmap.width << "/" << tauRawBitmap.height << " min/max: " << tauRawBitmap.min << "/" << tauRawBitmap.max << std::endl;
+
+    // copy the frame and return, the frame sink writes it to file
+    static_cast<Test*>(caller)->sink->push(tauRawBitmap);
+}
+void Test::test(int cppduration, char* gainMode, char* agcType, char* contrast, char* brightness, char* framePipe)
 {
     std::cout << "Test" << std::endl;
+    // the sink must exist before the grabber starts calling back
+    sink = new FrameSink(FRAME_RING_SIZE, framePipe);
     tGr = new ThermalGrabber(callbackTauImage, this);
 
     // configurations
@@ -168,19 +334,27 @@ void Test::test(int cppduration, char* gainMode, char* agcType, char* contrast,
     unsigned int mWidth = tGr->getResolutionWidth();
     unsigned int mHeight = tGr->getResolutionHeight();
     std::cout << "Resolution w/h " << mWidth << "/" << mHeight << std::endl;
-    // run demo for length of imaging pass
+    // run demo for length of imaging pass, or until stopped if the duration is 0
     std::cout << "program duration " << cppduration << std::endl;
-    std::this_thread::sleep_for(std::chrono::milliseconds(cppduration));
+    auto endTime = std::chrono::steady_clock::now() + std::chrono::milliseconds(cppduration);
+    while (!stopRequested && (cppduration == 0 || std::chrono::steady_clock::now() < endTime))
+    {
+        std::this_thread::sleep_for(std::chrono::milliseconds(100));
+    }
     std::cout << "program ends " << std::endl;
     delete tGr;
+    // no more frames arrive once the grabber is deleted, write the remaining ones
+    delete sink;
 }
 int main(int argc, char** argv)
 {
     std::cout << "main:" << std::endl;
+    signal(SIGTERM, handleStop);
+    signal(SIGINT, handleStop);
     {
         Test* t = new Test();
 
-        // capture duration is the 1st argument
+        // capture duration is the 1st argument, 0 to run until SIGTERM
         int duration = atoi(argv[1]);
 
         // all other arguments are configuration arguments
@@ -188,6 +362,7 @@ int main(int argc, char** argv)
         char* agcType = "";
         char* contrast = "";
         char* brightness = "";
+        char* framePipe = "";
 
         for (int i = 2; i < argc; i++) {
             std::string argString = argv[i]; 
@@ -201,9 +376,10 @@ int main(int argc, char** argv)
             if (configParamString == "agc_type") agcType = configParamValueChar;
             if (configParamString == "contrast") contrast = configParamValueChar;
             if (configParamString == "brightness") brightness = configParamValueChar;
+            if (configParamString == "frame_fifo") framePipe = configParamValueChar;
         }
 
-        t->test(duration, gainMode, agcType, contrast, brightness); 
+        t->test(duration, gainMode, agcType, contrast, brightness, framePipe); 
         delete t;
     }
     return 0;
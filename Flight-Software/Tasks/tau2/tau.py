@@ -29,11 +29,28 @@ import time
 import typing
 import signal
 import logging
+import json
+import select
+import socket
 # Set system path
 sys.path.append('/home/debian')
 
 from shared.logging import create_logger
 from shared.config import Config
+from shared.timing import sleep_until, set_realtime
+from shared.frames import FrameChannel
+from shared.capture_timing import CaptureTimingLog
+
+# fifo the C++ capture program signals each written frame on
+FRAME_FIFO_PATH = "/tmp/tau-frames.fifo"
+# seconds to wait for a frame to be written after the trigger pulse
+FRAME_TIMEOUT = 0.5
+# socket the tau daemon takes capture requests on
+TAU_SOCKET_PATH = "/tmp/tau.sock"
+# seconds without a capture request after which the daemon powers the camera down
+IDLE_TIMEOUT = 300
+# seconds allowed for the daemon's reply after the last capture time, covers a camera power up
+REPLY_MARGIN = 120
 
 
 
@@ -81,6 +98,29 @@ def add_arguments():
         dest='brightness',
         help='Sets the AGC brightness value used by the manual and auto-bright AGC algorithms: 0-16383')
 
+    parser.add_argument(
+        '--rtpriority',
+        nargs='+',
+        dest='rt_priority',
+        help='Run the capture with SCHED_FIFO real-time priority: 1-99')
+
+    parser.add_argument(
+        '--cpus',
+        nargs='+',
+        dest='cpus',
+        help='Pin the capture to these CPUs, e.g. 0')
+
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Run as the tau daemon, keeping the camera powered between captures requested by other tau.py runs')
+
+    parser.add_argument(
+        '--idletimeout',
+        nargs='+',
+        dest='idle_timeout',
+        help='Seconds without a capture request before the daemon powers the camera down')
+
     return parser.parse_args()
 
 # Camera configuration functions ----------------------------
@@ -173,11 +213,14 @@ def set_brightness(logger: logging.Logger, brightness: str):
     return progArg
 
 
-def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, passNumber: int) :
+def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, passNumber: int, frameChannel: FrameChannel,
+                      firstImageNo: int = 0) :
     """
     Function to control the accurate capture of images using the Tau2.
     Function takes the capture times and performs the oscillatory response
-    required to activate the camera.
+    required to activate the camera. The function sleeps until just before
+    each capture time and spins for the last few milliseconds. The timing of
+    each image is written to a csv timing table at the end of the pass.
 
     Parameters
     ----------
@@ -191,6 +234,11 @@ def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, pas
         Contains the path to file storage location for tau images
     passNumber : int
         The number of this image pass, for labelling purposes
+    frameChannel : FrameChannel
+        Channel the C++ capture program signals each written frame on
+    firstImageNo : int
+        File number of the first image, the C++ program keeps numbering its
+        files across the captures of the tau daemon
     Returns
     -------
     Success : boolean
@@ -210,7 +258,8 @@ def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, pas
 
     maxCaptureRetries = 20
 
-    imagePythonTimes = []
+    # timing of each image, written to a csv timing table at the end of the pass
+    timingLog = CaptureTimingLog(f"{fileLocation}pass-{passNumber}-timings.csv", "Tau")
 
     # Get the number of images to capture. This will start at N images, and be
     # decrimented by 1 for every captured image
@@ -224,71 +273,76 @@ def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, pas
 
     currentImage = captureTimes.pop(0)
     retry = 0
-    imageNo = 0
+    imageNo = firstImageNo
 
     while ImagesToCapture>0 and retry < maxCaptureRetries:
 
-        currentTime = time.time_ns()
+        # sleep until just before the capture time and spin for the rest, rather than polling the clock all pass.
+        # Returns straight away when retrying an image whose capture time has passed
+        sleep_until(int(currentImage))
 
-        if currentTime>=currentImage:
+        preLowPinTime = time.time_ns()
+        GPIO.output(GPIOPin, GPIO.LOW)
+        postLowPinTime = time.time_ns()
+        logger.info(f"P9_41 low")
 
-            preLowPinTime = time.time_ns()
-            GPIO.output(GPIOPin, GPIO.LOW)
-            postLowPinTime = time.time_ns()
-            logger.info(f"P9_41 low")
+        # trigger time of the first attempt at the image
+        if retry == 0:
+            triggerTime = postLowPinTime
 
-            # Hold low to allow image capture
-            time.sleep(pinLowTime)
+        # Hold low to allow image capture
+        time.sleep(pinLowTime)
 
-            preHighPinTime = time.time_ns()
-            GPIO.output(GPIOPin, GPIO.HIGH)
-            postHighPinTime = time.time_ns()
-            logger.info(f"P9_41 high")
+        preHighPinTime = time.time_ns()
+        GPIO.output(GPIOPin, GPIO.HIGH)
+        postHighPinTime = time.time_ns()
+        logger.info(f"P9_41 high")
 
 
-            # Set expected image file name
-            imageFileName = f"{fileLocation}pass-{passNumber}-file-{imageNo}.dat"
-            # Check image was taken
+        # Set expected image file name
+        imageFileName = f"{fileLocation}pass-{passNumber}-file-{imageNo}.dat"
+        # Check image was taken, the C++ program signals the frame once its file is written
+        frameEvent = frameChannel.wait_frame(imageNo, FRAME_TIMEOUT)
 
-            if os.path.exists(imageFileName):
-                logger.info(f"Image {imageFileName} compeletion: {ImagesToCapture}")
+        if frameEvent is not None:
+            logger.info(f"Image {imageFileName} compeletion: {ImagesToCapture}")
+            logger.debug(f"Image {imageNo}: {frameEvent.bytes} bytes, landed "
+                         f"{(frameEvent.arrivalTime - postLowPinTime) / 1000000:.1f} ms after the trigger")
 
-                # Store all pin timings
-                imagePythonTimes.append([preLowPinTime,postLowPinTime,preHighPinTime,postHighPinTime])
-                # Reduce number of images left to capture
-                ImagesToCapture-=1
-                imageNo +=1
-                #Get next image
-                try:
-                    currentImage = captureTimes.pop(0)
-                except IndexError:
-                    logger.info("IndexError - assume no images left to capture")
-                    pass
-                except:
-                    logger.exception("Non-index error exception in image capture")
+            logger.debug(f"Image {imageNo} trigger error: {(triggerTime - int(currentImage)) / 1000:.1f} us")
 
-                    # Soft exit function to handle error
-                    return False
+            # Store the image timings
+            timingLog.record(imageNo, currentImage, triggerTime, frameEvent.arrivalTime, retry)
+            # Reduce number of images left to capture
+            ImagesToCapture-=1
+            imageNo +=1
+            #Get next image
+            try:
+                currentImage = captureTimes.pop(0)
+            except IndexError:
+                logger.info("IndexError - assume no images left to capture")
+                pass
+            except:
+                logger.exception("Non-index error exception in image capture")
 
-                # reset retries
-                retry = 0
+                # Soft exit function to handle error
+                return False
 
-            else:
-                # image capture was unsuccessful
-                # Increment retry variable and reattempt
-                retry +=1
-                logger.critical(f"Retrying {currentImage} : {retry}")
+            # reset retries
+            retry = 0
 
         else:
-            pass
+            # image capture was unsuccessful
+            # Increment retry variable and reattempt
+            retry +=1
+            logger.critical(f"Retrying {currentImage} : {retry}")
 
-    # Write timings to file
+    # an image that was given up on is recorded as never landing
+    if retry >= maxCaptureRetries:
+        timingLog.record(imageNo, currentImage, triggerTime, None, retry)
 
-    timingsFileName = f"{fileLocation}pass-{passNumber}-timings.dat"
-    with open(timingsFileName,"w") as f:
-        logger.debug(f"Writing image timings to file: {timingsFileName}")
-        for index,line in enumerate(imagePythonTimes):
-            f.write(f"{index} {imagePythonTimes}")
+    # Write timings to file and log the trigger jitter of the pass
+    timingLog.write(logger)
 
     # Check if capture ended due to a retry halt
     if retry >= maxCaptureRetries:
@@ -302,22 +356,18 @@ def tau_image_capture(logger, GPIOPin: str, captureTimes, fileLocation: str, pas
 
 
 
-def tau_camera_start(logger, timeNow, endTime, tauConfigArgs, logsPath):
+def tau_power_on(logger):
     """
-    Start a Tau c++ program in the background which waits for a capture trigger
+    Power cycle the Tau and wait for it to boot. The trigger pin is held HIGH
+    to prevent capture
 
     Parameters
     ----------
-    timeNow : int
-        Current timestamp.
-    endTime : int
-        Expected capture end timestamp.
-    tauConfigArgs : str
-        A string of camera configuration arguments to be passed to a c++ program
+    logger : Logger
+        Object containing information on how to write logs
     Returns
     -------
-    process : subprocess
-        A subprocess variable representing the the background c++ program
+    None
 
     """
 
@@ -338,11 +388,49 @@ def tau_camera_start(logger, timeNow, endTime, tauConfigArgs, logsPath):
     # add delay for powerup
     time.sleep(30)
 
-    # Run the C++ capture program
-    # firstly process arguments to hand to the cpp programme
-    # duration the program should run - first two arguments
-    cppduration = int(1000000*(endTime - timeNow + 3)) # 3 extra seconds to account for final time offset TODO consider removing
-    progArgs = str(cppduration) + tauConfigArgs
+def tau_power_is_on():
+    """
+    Check the Tau power pin is still driven HIGH. The scheduler pulls the
+    camera power pins low and releases them each time it starts, so a
+    running daemon cannot rely on its own record of the camera power
+
+    Returns
+    -------
+    powered : boolean
+        True if the Tau power pin is HIGH
+
+    """
+
+    try:
+        return GPIO.input("P8_12") == GPIO.HIGH
+    except (RuntimeError, ValueError, OSError):
+        # the pin is no longer set up, e.g. after GPIO.cleanup() in the scheduler
+        return False
+
+def tau_program_start(logger, cppduration, tauConfigArgs, logsPath, framePipe):
+    """
+    Start the Tau c++ program in the background, which configures the camera
+    and writes a frame file for each capture trigger
+
+    Parameters
+    ----------
+    cppduration : int
+        Time the program should run for in milliseconds, 0 to run until it
+        is sent SIGTERM
+    tauConfigArgs : str
+        A string of camera configuration arguments to be passed to a c++ program
+    logsPath : str
+        Path to the log file the program output is appended to
+    framePipe : str
+        Path of the fifo the c++ program signals each written frame on, it must be open for reading
+    Returns
+    -------
+    process : subprocess
+        A subprocess variable representing the the background c++ program
+
+    """
+
+    progArgs = str(cppduration) + tauConfigArgs + " frame_fifo:" + framePipe
     logger.info(f"Cpp program arguments: {progArgs}")
 
     # Using Popen as allows for non-blocking program run
@@ -364,13 +452,224 @@ def tau_camera_start(logger, timeNow, endTime, tauConfigArgs, logsPath):
 
     return process
 
+def tau_program_stop(logger, process):
+    """
+    Stop the Tau c++ program. The program writes its remaining frames and
+    closes the camera connection on SIGTERM
+
+    Parameters
+    ----------
+    process : subprocess
+        The background c++ program
+    Returns
+    -------
+    None
+
+    """
+
+    GPIO.output("P9_41", GPIO.HIGH)
+
+    if process.poll() is None:
+        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            logger.warning("C++ capture program did not stop, killing it")
+            os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+
+def tau_camera_start(logger, timeNow, endTime, tauConfigArgs, logsPath, framePipe):
+    """
+    Power the Tau and start a Tau c++ program in the background which waits for a capture trigger
+
+    Parameters
+    ----------
+    timeNow : int
+        Current timestamp.
+    endTime : int
+        Expected capture end timestamp.
+    tauConfigArgs : str
+        A string of camera configuration arguments to be passed to a c++ program
+    framePipe : str
+        Path of the fifo the c++ program signals each written frame on, it must be open for reading
+    Returns
+    -------
+    process : subprocess
+        A subprocess variable representing the the background c++ program
+
+    """
+
+    tau_power_on(logger)
+
+    # Run the C++ capture program
+    # firstly process arguments to hand to the cpp programme
+    # duration the program should run - first two arguments
+    # the timestamps are in nanoseconds and the program takes milliseconds
+    cppduration = int((endTime - timeNow) / 10 ** 6 + 3000) # 3 extra seconds to account for final time offset TODO consider removing
+
+    return tau_program_start(logger, cppduration, tauConfigArgs, logsPath, framePipe)
+
+def request_capture(logger, captureTimes, tauConfigArgs):
+    """
+    Hand a capture to the tau daemon, if it is running, and wait for the result
+
+    Parameters
+    ----------
+    captureTimes : list[float]
+        Capture times in nanoseconds
+    tauConfigArgs : str
+        A string of camera configuration arguments to be passed to a c++ program
+    Returns
+    -------
+    success : boolean
+        Result of the capture, None if the daemon is not running
+
+    """
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(TAU_SOCKET_PATH)
+    except OSError:
+        client.close()
+        return None
+
+    logger.info("Handing the capture to the tau daemon")
+
+    with client:
+        request = {"times": captureTimes, "config_args": tauConfigArgs}
+        client.sendall(json.dumps(request).encode() + b"\n")
+
+        # the daemon replies once the last image is captured, allow for a camera power up first. A late or retried
+        # request whose capture times have passed still gets the margin, rather than a negative timeout
+        client.settimeout(max(max(captureTimes) / 10 ** 9 - time.time(), 0) + REPLY_MARGIN)
+        try:
+            response = client.makefile("rb").readline()
+        except socket.timeout:
+            logger.error("No reply from the tau daemon")
+            return False
+
+    if not response:
+        logger.error("The tau daemon closed the connection without a reply")
+        return False
+
+    return json.loads(response)["success"]
+
+def tau_daemon(logger, logsPath, idleTimeout):
+    """
+    Run the tau daemon. The daemon takes capture requests from tau.py on a
+    local socket and keeps the camera powered and the C++ program running
+    between them, so consecutive captures (e.g. a calibration then a primary
+    pass) do not pay the power up and program start up. The camera is
+    powered down once no request has arrived for idleTimeout seconds
+
+    Parameters
+    ----------
+    logsPath : str
+        Path to the log file
+    idleTimeout : float
+        Seconds without a capture request before the camera is powered down
+    Returns
+    -------
+    None
+
+    """
+
+    # stop cleanly on SIGTERM from systemd
+    def handle_sigterm(signum, frame):
+        raise SystemExit
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    if os.path.exists(TAU_SOCKET_PATH):
+        os.remove(TAU_SOCKET_PATH)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(TAU_SOCKET_PATH)
+    server.listen(1)
+
+    frameChannel = FrameChannel(FRAME_FIFO_PATH)
+    process = None
+    runningConfigArgs = None
+    powered = False
+    lastRequest = time.time()
+
+    logger.info("Tau daemon waiting for capture requests")
+
+    try:
+        while True:
+            timeout = max(0, lastRequest + idleTimeout - time.time()) if powered else None
+            ready, _, _ = select.select([server], [], [], timeout)
+
+            if not ready:
+                logger.info(f"No capture request for {idleTimeout} secs, powering Tau down")
+                if process is not None:
+                    tau_program_stop(logger, process)
+                GPIO.output("P8_12", GPIO.LOW)
+                process = None
+                powered = False
+                continue
+
+            connection, _ = server.accept()
+            with connection:
+                try:
+                    request = json.loads(connection.makefile("rb").readline())
+                    captureTimes = [float(captureTime) for captureTime in request["times"]]
+                    tauConfigArgs = request["config_args"]
+                except (ValueError, KeyError, TypeError):
+                    logger.exception("Invalid capture request")
+                    continue
+
+                logger.info(f"Capture request of {len(captureTimes)} images, config args:{tauConfigArgs}")
+
+                # the power pin is checked on every request, the scheduler may have switched the camera off
+                if not powered or not tau_power_is_on():
+                    if powered:
+                        logger.warning("Tau power pin found low, powering the Tau up again")
+                    # a running program has lost its connection to the camera, it is restarted once the camera is up
+                    if process is not None:
+                        tau_program_stop(logger, process)
+                        process = None
+                    tau_power_on(logger)
+                    powered = True
+
+                # the camera configuration is applied when the C++ program starts, restart it if it has changed
+                if process is not None and (process.poll() is not None or tauConfigArgs != runningConfigArgs):
+                    tau_program_stop(logger, process)
+                    process = None
+                if process is None:
+                    process = tau_program_start(logger, 0, tauConfigArgs, logsPath, FRAME_FIFO_PATH)
+                    runningConfigArgs = tauConfigArgs
+                    # the new program numbers its files from 0 again
+                    frameChannel.reset()
+
+                # number the images after the frames the program has already written
+                frameChannel.read_events()
+                success = tau_image_capture(logger, "P9_41", captureTimes, "", 1, frameChannel,
+                                            frameChannel.lastIndex + 1)
+                logger.info("Image pass success" if success else "Image pass failure")
+
+                try:
+                    connection.sendall(json.dumps({"success": success}).encode() + b"\n")
+                except OSError:
+                    logger.warning("Capture requester has gone, result not sent")
+
+            lastRequest = time.time()
+    finally:
+        if process is not None:
+            tau_program_stop(logger, process)
+        if powered:
+            GPIO.output("P8_12", GPIO.LOW)
+        frameChannel.close()
+        server.close()
+        os.remove(TAU_SOCKET_PATH)
+        GPIO.cleanup()
+        logger.info("Tau daemon stopped")
+
 def main():
     """
     Main code for the tau2 camera.
     Steps:
         Parse arguments
         Instantiate logger
-        Take pictures
+        Run as the tau daemon if requested
+        Take pictures, through the tau daemon if it is running
         Save pictures
     """
 
@@ -388,6 +687,16 @@ def main():
     else:
         logger = create_logger("Tau", logsPath)
 
+    if args.daemon:
+        # the daemon runs the trigger loop, so it takes the real-time settings
+        if args.rt_priority or args.cpus:
+            set_realtime(logger,
+                         int(args.rt_priority[0]) if args.rt_priority else None,
+                         [int(cpu) for cpu in args.cpus] if args.cpus else None)
+        idleTimeout = float(args.idle_timeout[0]) if args.idle_timeout else IDLE_TIMEOUT
+        tau_daemon(logger, logsPath, idleTimeout)
+        return
+
     logger.info("Tau capture times = " + str(args.times))
 
     #first covert capture time arguments to nano second ints
@@ -409,29 +718,47 @@ def main():
     # create a string of config args for a tau c++ program
     tauConfigArgs = ""
 
-    if args.gain_mode:
-        gainMode = args.gain_mode[0]
-        tauConfigArgs += set_gain_mode(logger, gainMode)
-    if args.agc_type:
-        agcType = args.agc_type[0]
-        tauConfigArgs += set_agc_type(logger, agcType)
-    if args.contrast:
-        contrast = args.contrast[0]
-        tauConfigArgs += set_contrast(logger, contrast)
-    if args.brightness:
-        brightness = args.brightness[0]
-        tauConfigArgs += set_brightness(logger, brightness)
+    # the config is written once, after all the properties are applied
+    with config.batch():
+        if args.gain_mode:
+            gainMode = args.gain_mode[0]
+            tauConfigArgs += set_gain_mode(logger, gainMode)
+        if args.agc_type:
+            agcType = args.agc_type[0]
+            tauConfigArgs += set_agc_type(logger, agcType)
+        if args.contrast:
+            contrast = args.contrast[0]
+            tauConfigArgs += set_contrast(logger, contrast)
+        if args.brightness:
+            brightness = args.brightness[0]
+            tauConfigArgs += set_brightness(logger, brightness)
 
     logger.info("Tau config args:" + tauConfigArgs)
 
+    # hand the capture to the tau daemon if it is running, it keeps the camera powered between captures
+    success = request_capture(logger, captureTimes, tauConfigArgs)
+    if success is not None:
+        logger.info("Image pass success" if success else "Image pass failure")
+        return
+
+    # open the frame fifo before starting the camera, so the C++ program can open it for writing
+    frameChannel = FrameChannel(FRAME_FIFO_PATH)
+
     # Start the camera
-    process = tau_camera_start(logger, timenow, captureTimes[-1], tauConfigArgs, logsPath)
+    process = tau_camera_start(logger, timenow, captureTimes[-1], tauConfigArgs, logsPath, FRAME_FIFO_PATH)
+
+    # optionally run the trigger loop with real-time priority and on its own CPU, so the trigger is not delayed by
+    # the C++ grabber and the basler capture
+    if args.rt_priority or args.cpus:
+        set_realtime(logger,
+                     int(args.rt_priority[0]) if args.rt_priority else None,
+                     [int(cpu) for cpu in args.cpus] if args.cpus else None)
 
     # Perform capture
     fileLocation=""
     passNumber = 1
 
-    if tau_image_capture(logger, "P9_41",captureTimes,fileLocation, passNumber):
+    if tau_image_capture(logger, "P9_41",captureTimes,fileLocation, passNumber, frameChannel):
         logger.info("Image pass success")
     else:
         logger.info("Image pass failure")
@@ -444,6 +771,7 @@ def main():
     # Ensure program is terminated
 
     os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+    frameChannel.close()
     # Cleanup GPIO pins
     GPIO.cleanup()
 
@@ -0,0 +1,175 @@
+''' @file bayer.py
+
+@brief Defines the raw Bayer image container and the debayering used to turn it into colour images.
+
+@section description_bayer Description
+Defines the container the imaging tasks write raw sensor frames to, so the colour conversion can be done after the
+pass instead of between captures. A file starts with a short header holding the frame's metadata as json (size, pixel
+format, Bayer pattern, bit depth and any capture metadata), followed by the sensor's pixels exactly as grabbed. Files
+are read back memory mapped and debayered with a vectorised bilinear interpolation, in strips of rows so a full
+frame never needs more than a few strips of working memory.
+- bayer_format
+- write_raw
+- read_raw
+- debayer
+
+
+@section libraries_bayer Libraries/Modules
+- python json library
+- python struct library
+- python numpy library
+
+
+@section todo_bayer TODO
+- None.
+'''
+
+import json
+import struct
+import numpy as np
+
+MAGIC = b"PROVEBYR"
+VERSION = 1
+# magic, version, length of the json metadata
+HEADER_PREFIX = struct.Struct("<8sHI")
+
+# colour of the pixels of each 2x2 Bayer cell, in row order, for each pattern
+BAYER_LAYOUTS = {"RG": "RGGB", "BG": "BGGR", "GR": "GRBG", "GB": "GBRG"}
+
+# bilinear interpolation kernels, the green kernel for the green plane and the other for the red and blue planes
+GREEN_KERNEL = np.array([[0, 1, 0], [1, 4, 1], [0, 1, 0]], dtype=np.float32)
+RED_BLUE_KERNEL = np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]], dtype=np.float32)
+
+# rows debayered at a time
+STRIP_ROWS = 256
+
+def bayer_format(pixelFormat):
+    """
+        Returns the Bayer pattern and bit depth of an unpacked pylon Bayer pixel format, e.g. BayerRG12
+
+            Parameters:
+                pixelFormat (string): name of the pixel format
+
+            Returns:
+                pattern (string): colours of the first row of the Bayer cell, e.g. RG
+                bits (int): bits per pixel
+    """
+
+    pattern = pixelFormat[5:7]
+    if not pixelFormat.startswith("Bayer") or pattern not in BAYER_LAYOUTS or not pixelFormat[7:].isdigit():
+        raise ValueError(f"{pixelFormat} is not an unpacked Bayer pixel format")
+
+    return pattern, int(pixelFormat[7:])
+
+def write_raw(filename, pixels, pixelFormat, metadata=None):
+    """
+        Writes a raw Bayer frame to a file
+
+            Parameters:
+                filename (string): path of the file
+                pixels (numpy.ndarray): 2D array of the sensor's pixels
+                pixelFormat (string): pylon pixel format of the pixels, e.g. BayerRG12
+                metadata (dict): capture metadata stored with the frame, e.g. timestamps
+
+            Returns:
+                bytes (int): size of the file
+    """
+
+    pattern, bits = bayer_format(pixelFormat)
+    header = dict(metadata or {}, width=pixels.shape[1], height=pixels.shape[0], dtype=pixels.dtype.str,
+                  pixel_format=pixelFormat, pattern=pattern, bits=bits)
+    header = json.dumps(header).encode()
+
+    with open(filename, "wb") as f:
+        f.write(HEADER_PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        np.ascontiguousarray(pixels).tofile(f)
+
+    return HEADER_PREFIX.size + len(header) + pixels.nbytes
+
+def read_raw(filename):
+    """
+        Reads a raw Bayer frame, the pixels are memory mapped rather than loaded
+
+            Parameters:
+                filename (string): path of the file
+
+            Returns:
+                pixels (numpy.memmap): 2D array of the sensor's pixels
+                metadata (dict): the frame's metadata
+    """
+
+    with open(filename, "rb") as f:
+        magic, version, length = HEADER_PREFIX.unpack(f.read(HEADER_PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a raw Bayer file")
+        metadata = json.loads(f.read(length))
+
+    pixels = np.memmap(filename, dtype=np.dtype(metadata["dtype"]), mode="r", offset=HEADER_PREFIX.size + length,
+                       shape=(metadata["height"], metadata["width"]))
+
+    return pixels, metadata
+
+def convolve3x3(plane, kernel):
+    """
+        Convolves a plane with a 3x3 kernel, treating the pixels outside the plane as 0
+
+            Parameters:
+                plane (numpy.ndarray): 2D array to convolve
+                kernel (numpy.ndarray): 3x3 kernel
+
+            Returns:
+                result (numpy.ndarray): convolved array, the same size as plane
+    """
+
+    height, width = plane.shape
+    padded = np.pad(plane, 1)
+    result = np.zeros_like(plane)
+
+    for dy in range(3):
+        for dx in range(3):
+            if kernel[dy, dx]:
+                result += kernel[dy, dx] * padded[dy:dy + height, dx:dx + width]
+
+    return result
+
+def debayer(pixels, pattern="RG", bits=12, rows=STRIP_ROWS):
+    """
+        Converts a raw Bayer frame to an 8 bit RGB image by bilinear interpolation. Each colour plane is interpolated
+        from its neighbouring pixels of that colour, weighted by the kernels and normalised by the weight of the pixels
+        present, so the frame edges need no special case
+
+            Parameters:
+                pixels (numpy.ndarray): 2D array of the sensor's pixels
+                pattern (string): colours of the first row of the Bayer cell, e.g. RG
+                bits (int): bits per pixel
+                rows (int): rows debayered at a time, bounds the working memory
+
+            Returns:
+                image (numpy.ndarray): height x width x 3 array of 8 bit RGB pixels
+    """
+
+    height, width = pixels.shape
+    layout = BAYER_LAYOUTS[pattern]
+    scale = 255 / (2 ** bits - 1)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+
+    for start in range(0, height, rows):
+        end = min(start + rows, height)
+        # one row of context either side, so the strip interpolates exactly as the whole frame would
+        top = max(start - 1, 0)
+        bottom = min(end + 1, height)
+        strip = pixels[top:bottom].astype(np.float32)
+
+        rowParity = (np.arange(top, bottom) % 2)[:, None]
+        columnParity = (np.arange(width) % 2)[None, :]
+        cell = rowParity * 2 + columnParity
+
+        for channel, colour in enumerate("RGB"):
+            mask = np.isin(cell, [i for i, c in enumerate(layout) if c == colour]).astype(np.float32)
+            kernel = GREEN_KERNEL if colour == "G" else RED_BLUE_KERNEL
+
+            plane = convolve3x3(strip * mask, kernel) / convolve3x3(mask, kernel)
+            image[start:end, :, channel] = np.clip(plane[start - top:end - top] * scale + 0.5, 0, 255)
+
+    return image
@@ -0,0 +1,175 @@
+''' @file capture_timing.py
+
+@brief Defines the capture timing log shared by the imaging tasks.
+
+@section description_capture_timing Description
+Defines the per pass timing table the imaging tasks (tau, basler and arducam) record each frame in: the scheduled
+capture time, the actual trigger time, the time the frame landed in its file and the number of retries. The table is
+written as a csv file at the end of the pass and a summary of the trigger jitter percentiles is logged. Frames
+timestamped by the camera are matched to the scheduled capture time nearest their timestamp.
+- nearest_scheduled
+- CaptureTimingLog (class)
+
+
+@section libraries_capture_timing Libraries/Modules
+- python csv library
+- python numpy library
+
+
+@section todo_capture_timing TODO
+- None.
+'''
+
+import csv
+import numpy as np
+
+# columns of the timing table, times are in nanoseconds since the epoch
+TIMING_HEADER = ["frame", "scheduled_ns", "trigger_ns", "trigger_error_us", "landed_ns", "landing_latency_ms",
+                 "retries"]
+# percentiles of the trigger error logged at the end of the pass
+JITTER_PERCENTILES = [50, 90, 99]
+
+def nearest_scheduled(scheduledTimes, captureTime):
+    """
+        Returns the scheduled capture time nearest a frame's capture time
+
+            Parameters:
+                scheduledTimes (list: int) - scheduled capture times in ascending order, in nanoseconds since the epoch
+                captureTime (int) - time the frame was captured, in nanoseconds since the epoch
+
+            Returns:
+                index (int) - index of the nearest scheduled time
+    """
+
+    scheduledTimes = np.asarray(scheduledTimes, dtype=np.int64)
+    index = int(np.searchsorted(scheduledTimes, captureTime))
+
+    if index == len(scheduledTimes) or (index > 0 and
+                                        captureTime - scheduledTimes[index - 1] <= scheduledTimes[index] - captureTime):
+        index -= 1
+
+    return index
+
+class CaptureTimingLog:
+    """
+    Collects the timing of each frame of a pass and writes it to a csv timing table
+    ...
+
+    Methods
+    -------
+    record(frame, scheduled, trigger, landed, retries):
+        Records the timing of a frame
+    summary():
+        Returns the trigger error percentiles and landing latency of the pass
+    write(logger):
+        Writes the timing table and logs the summary
+    """
+
+    def __init__(self, filename, camera):
+        """
+            Initialises the CaptureTimingLog class with no frames
+
+            Parameters:
+                self (CaptureTimingLog) - default class from the Python convention
+                filename (string) - path of the csv timing table
+                camera (string) - name of the camera, used in the logged summary
+
+            Returns:
+                void
+        """
+
+        self.filename = filename
+        self.camera = camera
+        # frame, scheduled, trigger, landed (None if the frame never landed), retries
+        self.frames = []
+
+    def record(self, frame, scheduled, trigger, landed=None, retries=0):
+        """
+            Records the timing of a frame
+
+            Parameters:
+                self (CaptureTimingLog) - default class from the Python convention
+                frame (int) - number of the frame
+                scheduled (int) - scheduled capture time, in nanoseconds since the epoch
+                trigger (int) - time the capture was triggered, in nanoseconds since the epoch
+                landed (int) - time the frame landed in its file, in nanoseconds since the epoch, None if it did not
+                retries (int) - number of times the capture was retried
+
+            Returns:
+                void
+        """
+
+        self.frames.append((frame, int(scheduled), int(trigger), None if landed is None else int(landed), retries))
+
+    def summary(self):
+        """
+            Returns the trigger error percentiles and landing latency of the pass
+
+            Parameters:
+                self (CaptureTimingLog) - default class from the Python convention
+
+            Returns:
+                summary (dict) - frames, landed, retries, trigger_error_us (percentile: value, plus "max") and
+                landing_latency_ms (percentile: value, plus "max", empty if no frame landed)
+        """
+
+        scheduled = np.array([frame[1] for frame in self.frames], dtype=np.int64)
+        trigger = np.array([frame[2] for frame in self.frames], dtype=np.int64)
+        landed = [(frame[3], frame[2]) for frame in self.frames if frame[3] is not None]
+
+        triggerErrors = (trigger - scheduled) / 1000
+        latencies = np.array([landedTime - triggerTime for landedTime, triggerTime in landed]) / 1000000
+
+        summary = {"frames": len(self.frames),
+                   "landed": len(landed),
+                   "retries": sum(frame[4] for frame in self.frames),
+                   "trigger_error_us": {},
+                   "landing_latency_ms": {}}
+
+        for values, key in [(triggerErrors, "trigger_error_us"), (latencies, "landing_latency_ms")]:
+            if len(values) > 0:
+                summary[key] = dict(zip(JITTER_PERCENTILES, np.percentile(values, JITTER_PERCENTILES)))
+                summary[key]["max"] = values.max()
+
+        return summary
+
+    def write(self, logger=None):
+        """
+            Writes the timing table and logs the summary of the pass
+
+            Parameters:
+                self (CaptureTimingLog) - default class from the Python convention
+                logger (object): Object containing information on how to write logs
+
+            Returns:
+                void
+        """
+
+        with open(self.filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TIMING_HEADER)
+            for frame, scheduled, trigger, landed, retries in self.frames:
+                writer.writerow([frame, scheduled, trigger, f"{(trigger - scheduled) / 1000:.1f}",
+                                 "" if landed is None else landed,
+                                 "" if landed is None else f"{(landed - trigger) / 1000000:.3f}",
+                                 retries])
+
+        if logger is None:
+            return
+
+        logger.debug(f"Capture timings written to {self.filename}")
+
+        summary = self.summary()
+        if summary["frames"] == 0:
+            logger.info(f"{self.camera} capture timing: no frames")
+            return
+
+        def format_percentiles(values):
+            return ", ".join(f"max {value:.1f}" if key == "max" else f"p{key} {value:.1f}" for key, value in values.items())
+
+        message = (f"{self.camera} capture timing: {summary['landed']}/{summary['frames']} frames landed, "
+                   f"{summary['retries']} retries, trigger error (us) {format_percentiles(summary['trigger_error_us'])}")
+        if summary["landing_latency_ms"]:
+            message += f", landing latency (ms) {format_percentiles(summary['landing_latency_ms'])}"
+
+        logger.info(message)
@@ -7,13 +7,24 @@ Defines the class and functions for controlling various parameters relating to t
 operations. The config.json file is used to store this information
 - Config (base class)
 - get_config
+- write_config
+- batch
+- has_changed
+- refresh
 - get_pass_duration
 - write_timestamps
 - recentpasstimestamp
 
+The parsed config is kept in memory. Setters write it back with an atomic replace of config.json, and setters called
+inside a batch() block are written once at the end of the block. Other processes detect a new config with
+has_changed()/refresh(), which only stat the file.
+
 
 @section libraries_logger Libraries/Modules
 - python json library
+- python os library
+- python contextlib library
+- python tempfile library
 
 
 @section todo_logger TODO
@@ -25,7 +36,16 @@ operations. The config.json file is used to store this information
 '''
 
 from email.policy import default
+from contextlib import contextmanager
 import json
+import os
+import tempfile
+
+CONFIG_PATH = "/home/debian/Scheduler/config.json"
+# power on value of each arducam setting, used when the config file has no arducam section
+ARDUCAM_DEFAULTS = {"format": 1, "resolution": 0, "lightmode": 0, "saturation": 4, "brightness": 4, "contrast": 4,
+                    "special_effects": 7, "hue": 6, "exposure": 5, "sharpness": 0, "mirror_flip": 7,
+                    "compress_quality": 1, "test_pattern": -1}
 
 class CameraProperty:
     """ 
@@ -143,7 +163,7 @@ class TauProperties:
 
 class TemperatureSensor:
     """ 
-    Describes the structure of a temperature sensor
+    Describes the structure of a telemetry sensor (temperature or current)
     ...
 
     Methods
@@ -153,14 +173,17 @@ class TemperatureSensor:
 
     """
 
-    def __init__(self, warn_threshold, error_threshold):
+    def __init__(self, warn_threshold, error_threshold, pin=None, conversion=None, mitigation=None):
         """
             Initialises the TemperatureSensor class, defines the variables
 
             Parameters:
                 self (TemperatureSensor) - default class from the Python convention
-                warn_threshold (int) - temperature sensor threshold level that raises a warning
-                error_threshold (int) - temperature sensor threshold level that raises an error
+                warn_threshold (int) - sensor threshold level that raises a warning
+                error_threshold (int) - sensor threshold level that raises an error
+                pin (string) - ID of the ADC pin the sensor is read from, e.g. P9_33
+                conversion (string) - conversion of the raw pin reading to a physical value: temperature or current
+                mitigation (string) - action taken when the reading reaches the error threshold: safe_mode or none
 
             Returns:
                 void
@@ -168,18 +191,112 @@ class TemperatureSensor:
 
         self.warn_threshold = warn_threshold
         self.error_threshold = error_threshold
+        # only written back to the config file when set, so configs without them keep their format
+        if pin is not None:
+            self.pin = pin
+        if conversion is not None:
+            self.conversion = conversion
+        if mitigation is not None:
+            self.mitigation = mitigation
 
     @staticmethod
     def create_from_json(data):
         return TemperatureSensor(**data)
 
+class ArducamProperties:
+    """ 
+    Describes the structure of Arducam properties
+    ...
+
+    Methods
+    -------
+    create_from_json(): 
+        Converts a json dictionary to a class
+
+    """
+
+    def __init__(self, format, resolution, lightmode, saturation, brightness, contrast, special_effects, hue, exposure, sharpness, mirror_flip, compress_quality, test_pattern):
+        """
+            Initialises the ArducamProperties class, defines the variables
+
+            Parameters:
+                self (ArducamProperties) - default class from the Python convention
+                format (CameraProperty) - arducam image format
+                resolution (CameraProperty) - arducam resolution
+                lightmode (CameraProperty) - arducam light mode
+                saturation (CameraProperty) - arducam saturation
+                brightness (CameraProperty) - arducam brightness
+                contrast (CameraProperty) - arducam contrast
+                special_effects (CameraProperty) - arducam special effects
+                hue (CameraProperty) - arducam hue
+                exposure (CameraProperty) - arducam exposure
+                sharpness (CameraProperty) - arducam sharpness
+                mirror_flip (CameraProperty) - arducam mirror flip
+                compress_quality (CameraProperty) - arducam JPEG compression quality
+                test_pattern (CameraProperty) - arducam test pattern, -1 for none
+
+            Returns:
+                void
+        """
+
+        self.format = CameraProperty.create_from_json(format)
+        self.resolution = CameraProperty.create_from_json(resolution)
+        self.lightmode = CameraProperty.create_from_json(lightmode)
+        self.saturation = CameraProperty.create_from_json(saturation)
+        self.brightness = CameraProperty.create_from_json(brightness)
+        self.contrast = CameraProperty.create_from_json(contrast)
+        self.special_effects = CameraProperty.create_from_json(special_effects)
+        self.hue = CameraProperty.create_from_json(hue)
+        self.exposure = CameraProperty.create_from_json(exposure)
+        self.sharpness = CameraProperty.create_from_json(sharpness)
+        self.mirror_flip = CameraProperty.create_from_json(mirror_flip)
+        self.compress_quality = CameraProperty.create_from_json(compress_quality)
+        self.test_pattern = CameraProperty.create_from_json(test_pattern)
+
+    @staticmethod
+    def create_from_json(data):
+        return ArducamProperties(**data)
+
+class ArducamConfig:
+    """ 
+    Arducam configurations class
+    ...
+
+    Methods
+    -------
+    create_from_json(): 
+        Converts a json dictionary to a class
+
+    """
+
+    def __init__(self, properties=None):
+        """
+            Initialises the ArducamConfig class, defines the arducam config variables
+
+            Parameters:
+                self (ArducamConfig) - default class from the Python convention
+                properties (ArducamProperties) - arducam configuration properties, the sensor's power on values if
+                                                 missing
+
+            Returns:
+                void
+        """
+
+        if properties is None:
+            properties = {name: {"value": value, "default": value} for name, value in ARDUCAM_DEFAULTS.items()}
+        self.properties = ArducamProperties.create_from_json(properties)
+
+    @staticmethod
+    def create_from_json(data):
+        return ArducamConfig(**data)
+
 class CamerasStruct:
     """ 
     Cameras structure class describing the structure of a JSON property 'cameras'
     ...
     """
 
-    def __init__(self, basler, tau):
+    def __init__(self, basler, tau, arducam=None):
         """
             Initialises the CamerasStruct class, defines the cameras struct variables
 
@@ -187,6 +304,7 @@ class CamerasStruct:
                 self (CamerasStruct) - default class from the Python convention
                 basler (BaslerConfig) - basler camera config class with all the parameters
                 tau (TauConfig) - tau camera config class with all the parameters
+                arducam (ArducamConfig) - arducam camera config class with all the parameters, defaults if missing
 
             Returns:
                 void
@@ -194,6 +312,7 @@ class CamerasStruct:
 
         self.basler = BaslerConfig.create_from_json(basler)
         self.tau = TauConfig.create_from_json(tau)
+        self.arducam = ArducamConfig.create_from_json(arducam or {})
 
 class ConfigStruct:
     """ 
@@ -206,7 +325,7 @@ class ConfigStruct:
         Converts a json dictionary to a class
     """
 
-    def __init__(self, general, cameras, sensors):
+    def __init__(self, general, cameras, sensors, storage=None):
         """
             Initialises the ConfigStruct class, defines the config variables
 
@@ -215,14 +334,16 @@ class ConfigStruct:
                 general (GeneralConfig) - general config parameters from the JSON file
                 cameras (CamerasStruct) - cameras config and their parameters from the JSON file
                 sensors (SensorsConfig) - sensors config parameters from the JSON file
+                storage (StorageConfig) - storage config parameters from the JSON file, defaults if missing
 
             Returns:
                 void
         """
 
         self.general = GeneralConfig.create_from_json(general)
-        self.cameras = CamerasStruct(cameras["basler"], cameras["tau"])
+        self.cameras = CamerasStruct(cameras["basler"], cameras["tau"], cameras.get("arducam"))
         self.sensors = SensorsConfig.create_from_json(sensors)
+        self.storage = StorageConfig.create_from_json(storage or {})
 
     @staticmethod
     def create_from_json(data):
@@ -284,7 +405,7 @@ class BaslerConfig:
 
     """
 
-    def __init__(self, imgs_per_pass, finaltimeoffset, properties):
+    def __init__(self, imgs_per_pass, finaltimeoffset, properties, raw_capture=False):
         """
             Initialises the BaslerConfig class, defines the basler config variables
 
@@ -293,6 +414,7 @@ class BaslerConfig:
                 imgs_per_pass (int) - number of basler images to be taken
                 finaltimeoffset (float) - time offset for final basler image
                 properties (BaslerProperties) - basler configuration properties
+                raw_capture (bool) - save the raw Bayer images and debayer them after the pass
 
             Returns:
                 void
@@ -301,6 +423,7 @@ class BaslerConfig:
         self.imgs_per_pass = imgs_per_pass
         self.finaltimeoffset = finaltimeoffset
         self.properties = BaslerProperties.create_from_json(properties)
+        self.raw_capture = raw_capture
 
     @staticmethod
     def create_from_json(data):
@@ -344,49 +467,88 @@ class TauConfig:
 
 class SensorsConfig:
     """ 
-    Sensor configurations class
+    Sensor configurations class. Each telemetry sensor is an attribute named after the sensor, in the order they are
+    declared in the config file
     ...
 
     Methods
     -------
     create_from_json(): 
         Converts a json dictionary to a class
+    sensor_items():
+        Returns the names and configs of the sensors
 
     """
 
-    def __init__(self, collection_cadence, T_TEMP, B_TEMP, A_TEMP, CPU_TEMP, T_CUR, B_CUR, A_CUR):
+    def __init__(self, collection_cadence, **sensors):
         """
             Initialises the SensorsConfig class, defines the sensors config variables
 
             Parameters:
                 self (SensorsConfig) - default class from the Python convention
                 collection_cadence (int) - telemetry cadence for the sensor data
-                T_TEMP (TemperatureSensor) - T_TEMP
-                B_TEMP (TemperatureSensor) - B_TEMP
-                A_TEMP (TemperatureSensor) - A_TEMP
-                CPU_TEMP (TemperatureSensor) - CPU_TEMP
-                T_CUR (TemperatureSensor) - T_CUR
-                B_CUR (TemperatureSensor) - B_CUR
-                A_CUR (TemperatureSensor) - A_CUR
+                sensors (TemperatureSensor) - config of each sensor by name, e.g. T_TEMP
 
             Returns:
                 void
         """
 
         self.collection_cadence = collection_cadence
-        self.T_TEMP = TemperatureSensor.create_from_json(T_TEMP)
-        self.B_TEMP = TemperatureSensor.create_from_json(B_TEMP)
-        self.A_TEMP = TemperatureSensor.create_from_json(A_TEMP)
-        self.CPU_TEMP = TemperatureSensor.create_from_json(CPU_TEMP)
-        self.T_CUR = TemperatureSensor.create_from_json(T_CUR)
-        self.B_CUR = TemperatureSensor.create_from_json(B_CUR)
-        self.A_CUR = TemperatureSensor.create_from_json(A_CUR)
+        for name, sensor in sensors.items():
+            setattr(self, name, TemperatureSensor.create_from_json(sensor))
+
+    def sensor_items(self):
+        """
+            Returns the names and configs of the sensors, in the order they are declared in the config file
+
+            Parameters:
+                self (SensorsConfig) - default class from the Python convention
+
+            Returns:
+                sensors (list: tuple) - (name, TemperatureSensor) of each sensor
+        """
+
+        return [(name, value) for name, value in vars(self).items() if isinstance(value, TemperatureSensor)]
 
     @staticmethod
     def create_from_json(data):
         return SensorsConfig(**data)
 
 
+class StorageConfig:
+    """ 
+    Storage configurations class
+    ...
+
+    Methods
+    -------
+    create_from_json(): 
+        Converts a json dictionary to a class
+
+    """
+
+    def __init__(self, transfer_workers=None, high_water_mark=0.9):
+        """
+            Initialises the StorageConfig class, defines the storage config variables
+
+            Parameters:
+                self (StorageConfig) - default class from the Python convention
+                transfer_workers (dict) - number of files transferred at once to each storage device, by mount point,
+                                          with the "default" entry used for any other device
+                high_water_mark (float) - fraction of a storage device's capacity that may be used once a pass is
+                                          stored, the oldest passes are deleted to stay below it
+
+            Returns:
+                void
+        """
+
+        self.transfer_workers = transfer_workers if transfer_workers is not None else {"default": 2}
+        self.high_water_mark = high_water_mark
+
+    @staticmethod
+    def create_from_json(data):
+        return StorageConfig(**data)
+
 class Config:
     """ 
     The Config base class
@@ -400,6 +562,12 @@ class Config:
         Reads the config.json file and returns its content in a json object
     write_config():
         Writes the config.json file with the new content
+    batch():
+        Context manager that defers config writes until the end of the block
+    has_changed():
+        Checks whether the config.json file has been replaced since it was read
+    refresh():
+        Re-reads the config.json file if it has changed
     get_pass_duration():
         Returns a pass duration
     write_timestamps():
@@ -415,17 +583,21 @@ class Config:
 
     """
 
-    def __init__(self):
+    def __init__(self, path=CONFIG_PATH):
         """
             Initialises the Config class, reads the config.json file and stores its content; defines the config variables
 
             Parameters:
                 self (Config) - default class from the Python convention
+                path (string) - path to the config.json file
 
             Returns:
                 void
         """
 
+        self.path = path
+        self.batchDepth = 0
+        self.pendingWrite = False
         self.configFull = self.get_config()
     
     def get_config(self):
@@ -439,16 +611,22 @@ class Config:
                 data_obj (ConfigStruct) - JSON config converted into a ConfigStruct class
         """
 
-        f = open("/home/debian/Scheduler/config.json", "r")
-        data_json = json.load(f)  
+        with open(self.path, "r") as f:
+            # stat the open file, so the signature belongs to the version of the file that is parsed
+            signature = self.file_signature(os.fstat(f.fileno()))
+            data_json = json.load(f)
         data_obj = ConfigStruct.create_from_json(data_json)
-        f.close()
+
+        # only recorded once the file has parsed, so a file caught mid-edit is read again by the next refresh
+        self.fileSignature = signature
 
         return data_obj
 
     def write_config(self, config: ConfigStruct):
         """
-            Writes the config.json file with the new content
+            Writes the config.json file with the new content. The file is replaced atomically (temporary file, fsync,
+            rename) so readers never see a partially written config. Inside a batch() block the write is deferred
+            until the end of the block
 
             Parameters:
                 self (Config) - default class from the Python convention
@@ -458,12 +636,114 @@ class Config:
                 void
         """
 
-        f = open("/home/debian/Scheduler/config.json", "w")
-        f.write(json.dumps(config, default=lambda o: o.__dict__, indent=4))
-        f.close()
+        self.configFull = config
+
+        if self.batchDepth > 0:
+            self.pendingWrite = True
+            return
+
+        # a temporary file unique to this process, so processes writing the config at the same time never replace
+        # each other's partial write
+        descriptor, tempPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        try:
+            # mkstemp creates the file readable by its owner only, keep the permissions of the config it replaces
+            os.fchmod(descriptor, os.stat(self.path).st_mode & 0o777 if os.path.exists(self.path) else 0o644)
+            with os.fdopen(descriptor, "w") as f:
+                f.write(json.dumps(config, default=lambda o: o.__dict__, indent=4) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                signature = self.file_signature(os.fstat(f.fileno()))
+
+            os.replace(tempPath, self.path)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        self.fileSignature = signature
+
+        # fsync the directory so the rename itself survives a power loss
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+        self.pendingWrite = False
+
+    @contextmanager
+    def batch(self):
+        """
+            Context manager that defers config writes until the end of the block, so several setters only rewrite
+            config.json once, e.g.
+
+                with config.batch():
+                    config.set_telemetry_cadence(60)
+                    config.set_operation_type("PRIMARY")
+
+            Parameters:
+                self (Config) - default class from the Python convention
+
+            Returns:
+                void
+        """
 
-        # reinitialize the class to update the config to the latest
-        self.reset()
+        self.batchDepth += 1
+        try:
+            yield self
+        finally:
+            self.batchDepth -= 1
+            if self.batchDepth == 0 and self.pendingWrite:
+                self.write_config(self.configFull)
+
+    @staticmethod
+    def file_signature(stat):
+        """
+            Returns the values of a file's stat that change whenever config.json is rewritten
+
+            Parameters:
+                stat (os.stat_result) - stat of the config.json file
+
+            Returns:
+                signature (tuple) - inode, modification time and size of the file
+        """
+
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def has_changed(self):
+        """
+            Checks whether the config.json file has been replaced since it was last read or written by this object.
+            Every write replaces the file, giving it a new inode, so a single stat is enough to detect a change
+
+            Parameters:
+                self (Config) - default class from the Python convention
+
+            Returns:
+                changed (boolean) - True if the file on disk differs from the one in memory
+        """
+
+        try:
+            return self.file_signature(os.stat(self.path)) != self.fileSignature
+        except FileNotFoundError:
+            return False
+
+    def refresh(self):
+        """
+            Re-reads the config.json file, only if it has changed since it was last read. If the new file can not be
+            parsed the config in memory is kept, the error is raised and the file is read again on the next refresh
+
+            Parameters:
+                self (Config) - default class from the Python convention
+
+            Returns:
+                changed (boolean) - True if the config was re-read
+        """
+
+        if not self.has_changed():
+            return False
+
+        self.configFull = self.get_config()
+
+        return True
     
     def get_pass_duration(self):
         """
@@ -543,7 +823,7 @@ class Config:
 
     def set_telemetry_cadence(self, cadence):
         """
-            Sets the telemetry cadence for the sensor data
+            Sets the telemetry cadence for the sensor data, config.json is not rewritten if the cadence is unchanged
 
             Parameters:
                 self (Config) - default class from the Python convention
@@ -553,6 +833,9 @@ class Config:
                 void
         """
 
+        if self.configFull.sensors.collection_cadence == cadence:
+            return
+
         self.configFull.sensors.collection_cadence = cadence
 
         self.write_config(self.configFull)
@@ -568,7 +851,7 @@ class Config:
                 void
         """
 
-        self.__init__()
+        self.__init__(self.path)
 
 
     def set_operation_type(self, optype):
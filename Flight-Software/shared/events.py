@@ -0,0 +1,256 @@
+''' @file events.py
+
+@brief Defines the timer heap and child process watcher used by the event-driven scheduler service.
+
+@section description_events Description
+Defines the classes used by the scheduler service to sleep until the next thing it has to do, rather than waking on a
+fixed tick. Deadlines (pass boundaries, task delays, task timeouts) are kept in a heap and the scheduler blocks on a
+wakeup pipe that is written to whenever a child process exits (SIGCHLD).
+- TimerHeap (class)
+- ChildWatcher (class)
+
+
+@section libraries_events Libraries/Modules
+- python heapq library
+- python itertools library
+- python os library
+- python select library
+- python signal library
+
+
+@section todo_events TODO
+- None.
+'''
+
+import heapq
+import itertools
+import os
+import select
+import signal
+
+class Timer:
+    """
+    Describes a single deadline held in the TimerHeap
+    ...
+
+    Attributes
+    ----------
+    deadline : float
+        timestamp at which the timer is due
+    name : string
+        name used to identify (and cancel) the timer
+    data : object
+        optional data handed back to the caller when the timer is due
+    cancelled : bool
+        True if the timer has been cancelled and should be ignored
+    """
+
+    def __init__(self, deadline, name, data=None):
+        """
+            Initialises the Timer class, defines the variables
+
+            Parameters:
+                self (Timer) - default class from the Python convention
+                deadline (float) - timestamp at which the timer is due
+                name (string) - name used to identify the timer
+                data (object) - optional data handed back when the timer is due
+
+            Returns:
+                void
+        """
+
+        self.deadline = deadline
+        self.name = name
+        self.data = data
+        self.cancelled = False
+
+class TimerHeap:
+    """
+    A min-heap of Timer objects ordered by deadline
+    ...
+
+    Methods
+    -------
+    schedule(deadline, name, data):
+        Adds a timer to the heap
+    cancel(name):
+        Cancels all pending timers with the given name
+    next_deadline():
+        Returns the deadline of the earliest pending timer
+    pop_due(currentTime):
+        Removes and returns all timers that are due
+    """
+
+    def __init__(self):
+        """
+            Initialises the TimerHeap class with an empty heap
+
+            Parameters:
+                self (TimerHeap) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len([entry for entry in self.heap if not entry[2].cancelled])
+
+    def schedule(self, deadline, name, data=None):
+        """
+            Adds a timer to the heap
+
+            Parameters:
+                self (TimerHeap) - default class from the Python convention
+                deadline (float) - timestamp at which the timer is due
+                name (string) - name used to identify the timer
+                data (object) - optional data handed back when the timer is due
+
+            Returns:
+                timer (Timer) - the scheduled timer
+        """
+
+        timer = Timer(deadline, name, data)
+        # the counter keeps timers with equal deadlines in the order they were scheduled
+        heapq.heappush(self.heap, (deadline, next(self.counter), timer))
+
+        return timer
+
+    def cancel(self, name):
+        """
+            Cancels all pending timers with the given name. Cancelled timers are dropped lazily when they reach the
+            top of the heap
+
+            Parameters:
+                self (TimerHeap) - default class from the Python convention
+                name (string) - name of the timers to cancel
+
+            Returns:
+                void
+        """
+
+        for deadline, count, timer in self.heap:
+            if timer.name == name:
+                timer.cancelled = True
+
+    def next_deadline(self):
+        """
+            Returns the deadline of the earliest pending timer
+
+            Parameters:
+                self (TimerHeap) - default class from the Python convention
+
+            Returns:
+                deadline (float) - earliest deadline, None if no timers are pending
+        """
+
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+        if self.heap:
+            return self.heap[0][0]
+
+        return None
+
+    def pop_due(self, currentTime):
+        """
+            Removes and returns all timers that are due
+
+            Parameters:
+                self (TimerHeap) - default class from the Python convention
+                currentTime (float): Current timestamp at time of function call
+
+            Returns:
+                due (list: Timer) - timers with a deadline at or before currentTime, in deadline order
+        """
+
+        due = []
+        while self.heap and self.heap[0][0] <= currentTime:
+            deadline, count, timer = heapq.heappop(self.heap)
+            if not timer.cancelled:
+                due.append(timer)
+
+        return due
+
+class ChildWatcher:
+    """
+    Blocks until a timeout expires or a child process exits
+
+    A SIGCHLD handler is installed and python's signal wakeup fd is pointed at a non-blocking pipe, so a select() on
+    the read end of the pipe returns as soon as any subprocess started by the scheduler terminates
+    ...
+
+    Methods
+    -------
+    wait(timeout):
+        Blocks until a child exits or the timeout expires
+    close():
+        Restores the previous signal handling and closes the pipe
+    """
+
+    def __init__(self):
+        """
+            Initialises the ChildWatcher class, creates the wakeup pipe and installs the SIGCHLD handler
+
+            Parameters:
+                self (ChildWatcher) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.readFd, self.writeFd = os.pipe()
+        os.set_blocking(self.readFd, False)
+        os.set_blocking(self.writeFd, False)
+
+        # the handler itself does nothing, the wakeup fd does the work. It must not be SIG_IGN, otherwise children
+        # are reaped automatically and Popen.poll() can no longer read their return codes
+        self.previousHandler = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        self.previousWakeupFd = signal.set_wakeup_fd(self.writeFd)
+
+    def wait(self, timeout):
+        """
+            Blocks until a child exits or the timeout expires
+
+            Parameters:
+                self (ChildWatcher) - default class from the Python convention
+                timeout (float) - maximum time to block in seconds, None to block until a child exits
+
+            Returns:
+                woken (bool) - True if a child process exited, False if the timeout expired
+        """
+
+        if timeout is not None and timeout < 0:
+            timeout = 0
+
+        readable, writable, exceptional = select.select([self.readFd], [], [], timeout)
+
+        if not readable:
+            return False
+
+        # drain the pipe so the next wait blocks again
+        try:
+            while os.read(self.readFd, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+        return True
+
+    def close(self):
+        """
+            Restores the previous signal handling and closes the pipe
+
+            Parameters:
+                self (ChildWatcher) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        signal.set_wakeup_fd(self.previousWakeupFd)
+        signal.signal(signal.SIGCHLD, self.previousHandler)
+        os.close(self.readFd)
+        os.close(self.writeFd)
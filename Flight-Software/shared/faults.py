@@ -0,0 +1,106 @@
+''' @file faults.py
+
+@brief Defines the fault manager used by the telemetry service to decide when to enter safe mode.
+
+@section description_faults Description
+Defines the state machine that turns the per tick sensor checks into faults. A sensor trips once it has been at error
+level for a number of consecutive ticks and only clears once it has been back at info level for a number of
+consecutive ticks, so a reading hovering around a threshold neither trips nor clears repeatedly. The manager reports
+the sensors that trip on each tick, so safe mode is entered once on the transition instead of on every tick the fault
+persists.
+- FaultManager (class)
+
+
+@section libraries_faults Libraries/Modules
+- python time library
+- python numpy library
+
+
+@section todo_faults TODO
+- None.
+'''
+
+import time
+import numpy as np
+
+class FaultManager:
+    """
+    Keeps the consecutive violation counters and the fault state of a set of monitored inputs (sensors)
+    ...
+
+    Methods
+    -------
+    update(errors, clear, currentTime):
+        Updates the counters with one tick of checks and returns the inputs that tripped on this tick
+    active():
+        Returns the names of the inputs currently in fault
+    """
+
+    def __init__(self, names, trip_counts=3, clear_count=3):
+        """
+            Initialises the FaultManager class with no input in fault
+
+            Parameters:
+                self (FaultManager) - default class from the Python convention
+                names (list: string) - names of the monitored inputs
+                trip_counts (int/list: int) - consecutive error ticks before an input trips, one value for all the
+                inputs or one per input
+                clear_count (int) - consecutive clear ticks before a tripped input clears
+
+            Returns:
+                void
+        """
+
+        self.names = list(names)
+        self.tripCounts = np.broadcast_to(np.asarray(trip_counts, dtype=int), (len(self.names),)).copy()
+        self.clearCount = clear_count
+
+        self.violations = np.zeros(len(self.names), dtype=int)
+        self.clears = np.zeros(len(self.names), dtype=int)
+        self.tripped = np.zeros(len(self.names), dtype=bool)
+
+        # time and names of the inputs of the last tick that tripped an input
+        self.lastTrip = None
+
+    def update(self, errors, clear, currentTime=None):
+        """
+            Updates the counters with one tick of checks. An input that is neither in error nor clear (e.g. at
+            warning level or not read) resets both its counters
+
+            Parameters:
+                self (FaultManager) - default class from the Python convention
+                errors (numpy.ndarray) - True for each input at error level on this tick
+                clear (numpy.ndarray) - True for each input back at normal level on this tick
+                currentTime (float) - time of the tick, now if not given
+
+            Returns:
+                tripped (list: string) - names of the inputs that tripped on this tick, empty if none did
+        """
+
+        errors = np.asarray(errors, dtype=bool)
+        clear = np.asarray(clear, dtype=bool)
+
+        self.violations = np.where(errors, self.violations + 1, 0)
+        self.clears = np.where(clear, self.clears + 1, 0)
+
+        newlyTripped = ~self.tripped & (self.violations >= self.tripCounts)
+        self.tripped = (self.tripped | newlyTripped) & (self.clears < self.clearCount)
+
+        tripped = [self.names[i] for i in np.flatnonzero(newlyTripped)]
+        if tripped:
+            self.lastTrip = (currentTime if currentTime is not None else time.time(), tripped)
+
+        return tripped
+
+    def active(self):
+        """
+            Returns the names of the inputs currently in fault
+
+            Parameters:
+                self (FaultManager) - default class from the Python convention
+
+            Returns:
+                names (list: string) - names of the tripped inputs
+        """
+
+        return [self.names[i] for i in np.flatnonzero(self.tripped)]
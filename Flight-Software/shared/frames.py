@@ -0,0 +1,191 @@
+''' @file frames.py
+
+@brief Defines the frame completion channel between the camera capture programs and the imaging tasks.
+
+@section description_frames Description
+Defines the named pipe (fifo) a capture program uses to tell its python controller that a frame has been written.
+The capture program writes one line per frame, "<index> <timestamp ns> <pps timestamp ms> <bytes>", once the frame
+file is complete. The controller waits on the fifo with select, so it learns a frame has landed as soon as it is
+written, without polling the file system.
+- FrameEvent (class)
+- FrameChannel (class)
+
+
+@section libraries_frames Libraries/Modules
+- python os library
+- python select library
+- python time library
+
+
+@section todo_frames TODO
+- None.
+'''
+
+import os
+import select
+import time
+
+class FrameEvent:
+    """
+    A frame written by a capture program
+    ...
+
+    Attributes
+    ----------
+    index : int
+        number of the frame file
+    timestamp : int
+        time the capture program received the frame, in nanoseconds since the epoch
+    ppsTimestamp : int
+        camera timestamp of the frame, milliseconds since the last pps rising edge
+    bytes : int
+        size of the frame file
+    arrivalTime : int
+        time the controller read the event, in nanoseconds since the epoch
+    """
+
+    def __init__(self, index, timestamp, ppsTimestamp, bytes, arrivalTime):
+        self.index = index
+        self.timestamp = timestamp
+        self.ppsTimestamp = ppsTimestamp
+        self.bytes = bytes
+        self.arrivalTime = arrivalTime
+
+class FrameChannel:
+    """
+    The read end of a frame completion fifo
+    ...
+
+    Methods
+    -------
+    read_events():
+        Reads the events waiting in the fifo
+    wait_frame(index, timeout):
+        Waits for the event of a frame
+    reset():
+        Discards the events read so far, for a restarted capture program
+    close():
+        Closes and removes the fifo
+    """
+
+    def __init__(self, path):
+        """
+            Initialises the FrameChannel class, creates the fifo and opens it for reading. The fifo must be created
+            before the capture program is started, so the program can open it for writing
+
+            Parameters:
+                self (FrameChannel) - default class from the Python convention
+                path (string) - path of the fifo
+
+            Returns:
+                void
+        """
+
+        self.path = path
+        self.buffer = b""
+        self.events = {}
+        # highest frame index read so far, -1 before the first frame
+        self.lastIndex = -1
+
+        if os.path.exists(path):
+            os.remove(path)
+        os.mkfifo(path)
+
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        # hold a write end open as well, so the fifo never reads as closed (and select never spins) before the
+        # capture program opens it or after it exits
+        self.keepaliveFd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+    def read_events(self):
+        """
+            Reads the events waiting in the fifo and stores them by frame index
+
+            Parameters:
+                self (FrameChannel) - default class from the Python convention
+
+            Returns:
+                count (int) - number of events read
+        """
+
+        try:
+            self.buffer += os.read(self.fd, 65536)
+        except BlockingIOError:
+            return 0
+
+        arrivalTime = time.time_ns()
+        *lines, self.buffer = self.buffer.split(b"\n")
+
+        for line in lines:
+            index, timestamp, ppsTimestamp, bytes = (int(field) for field in line.split())
+            self.events[index] = FrameEvent(index, timestamp, ppsTimestamp, bytes, arrivalTime)
+            self.lastIndex = max(self.lastIndex, index)
+
+        return len(lines)
+
+    def wait_frame(self, index, timeout):
+        """
+            Waits for the event of a frame. Events of earlier frames that were never waited for are discarded
+
+            Parameters:
+                self (FrameChannel) - default class from the Python convention
+                index (int) - number of the frame file
+                timeout (float) - seconds to wait for the frame
+
+            Returns:
+                event (FrameEvent) - the frame's event, None if it did not arrive in time
+        """
+
+        deadline = time.monotonic() + timeout
+
+        while index not in self.events:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if ready:
+                self.read_events()
+
+        for earlier in [earlier for earlier in self.events if earlier < index]:
+            del self.events[earlier]
+
+        return self.events.pop(index)
+
+    def reset(self):
+        """
+            Discards the events read so far, for a capture program that has been restarted and numbers its frames from
+            0 again
+
+            Parameters:
+                self (FrameChannel) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.read_events()
+        self.buffer = b""
+        self.events = {}
+        self.lastIndex = -1
+
+    def close(self):
+        """
+            Closes and removes the fifo
+
+            Parameters:
+                self (FrameChannel) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        os.close(self.fd)
+        os.close(self.keepaliveFd)
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,14 +1,23 @@
 ''' @file logging.py
 
- @brief Defines the create_logger function.
+ @brief Defines the create_logger function and the csv data loggers.
 
  @section description_logger Description
- Defines the create_logger function for creating custom loggers for each process.
+ Defines the create_logger function for creating custom loggers for each process, and the classes used to log data
+ (e.g. telemetry) to csv files.
  - create_logger
+ - log_it (class)
+ - RotatingLogWriter (class)
+ - StreamingCSVWriter (class)
 
 
  @section libraries_logger Libraries/Modules
  - python logging library
+ - python abc library
+ - python csv library
+ - python os library
+ - python time library
+ - python datetime library
 
 
  @section todo_logger TODO
@@ -51,7 +60,11 @@ def create_logger(name, filepath):
 
 
 """For creating a CSV file that will log all values for the device """
+import abc
 import csv
+import os
+import time
+import datetime
 
 
 class log_it():
@@ -78,23 +91,14 @@ class log_it():
             #    raise Exception("List is 2D")
             #else:
             #    pass
-        # Open the csv file and uses the csv enviroment to read data
-        with open(self.filename, "r", newline="\n") as f:
-            reader = csv.reader(f, delimiter=",")
-            self.OG_data = list(reader)
-            # If there is no data in file raise error
-            if self.OG_data == []:
-                raise Exception("No data found please delete file and use create_log")
-            f.close()
-        # set original data to original data and new data
-        self.OG_data.append(self.Data)
+        # If there is no data in file raise error
+        if os.path.getsize(self.filename) == 0:
+            raise Exception("No data found please delete file and use create_log")
 
-        # write the data to the file
-        with open(self.filename, "w", newline="\n") as f:
+        # append the new row, rather than reading and rewriting the whole file
+        with open(self.filename, "a", newline="\n") as f:
             writer = csv.writer(f)
-            for i in self.OG_data:
-                writer.writerow(i)
-            f.close()
+            writer.writerow(self.Data)
 
     def iter_log_append(self):  # Use with large sum of data
         """This will be used to bulk add data so if there is large amounts of data to add as log_append
@@ -104,25 +108,14 @@ class log_it():
             self.Data[0][0] != None
         except:
             raise Exception("Please enter a use append for 1D arrays")
-        # Open file
-        with open(self.filename, "r", newline="\n") as f:
-            reader = csv.reader(f, delimiter=",")
-            self.OG_data = list(reader)
-            # Check there is data already in file and if not raise error
-            if self.OG_data == []:
-                raise Exception("No data found please delete file and use create_log")
-            f.close()
+        # Check there is data already in file and if not raise error
+        if os.path.getsize(self.filename) == 0:
+            raise Exception("No data found please delete file and use create_log")
 
-        # set old data to old data and new data
-        for i in self.Data:
-            self.OG_data.append(i)
-
-        # write the data to the file
-        with open(self.filename, "w", newline="\n") as f:
+        # append the new rows, rather than reading and rewriting the whole file
+        with open(self.filename, "a", newline="\n") as f:
             writer = csv.writer(f)
-            for i in self.OG_data:
-                writer.writerow(i)
-            f.close()
+            writer.writerows(self.Data)
 
     def create_log(self):
         # Check that data is 1D
@@ -165,3 +158,287 @@ class log_it():
             for i in self.OG_data:
                 writer.writerow(i)
             f.close()
+
+
+class RotatingLogWriter(abc.ABC):
+    """
+    Base class for data logs that are appended to a file kept open for the life of the writer
+
+    Rows are buffered in memory and written when flush_rows rows are waiting or flush_interval seconds have passed
+    since the last flush, so the cost of each row does not depend on the size of the file. The file is rotated
+    (renamed with a timestamp suffix and a new file started) when it grows past max_bytes or the day changes. Every
+    file the writer appends to starts with the header: an existing file with a different header is rotated away.
+    Subclasses define the file format with the abstract methods header_matches, write_header and write_rows, and
+    prepare_append if an existing file needs preparing before rows are appended
+    ...
+
+    Methods
+    -------
+    append(row):
+        Buffers a row and flushes the buffer if required
+    flush():
+        Writes the buffered rows to the file
+    rotate():
+        Starts a new file, renaming the current one
+    close():
+        Flushes the buffer and closes the file
+    """
+
+    mode = "a"  # mode the file is opened in, "ab" for binary logs
+    newline = None  # newline argument the file is opened with
+
+    def __init__(self, filename, flush_rows=10, flush_interval=60, max_bytes=None, rotate_daily=False, fsync=True):
+        """
+            Initialises the RotatingLogWriter class and opens the file for appending
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+                filename (string) - path to the log file
+                flush_rows (int) - number of buffered rows that triggers a flush
+                flush_interval (float) - seconds after the last flush that trigger a flush
+                max_bytes (int) - size at which the file is rotated, None to never rotate on size
+                rotate_daily (boolean) - True to rotate the file when the date changes
+                fsync (boolean) - True to fsync the file after each flush
+
+            Returns:
+                void
+        """
+
+        self.filename = filename
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.fsync = fsync
+
+        self.buffer = []
+        self.file = None
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abc.abstractmethod
+    def header_matches(self):
+        """
+            Checks whether the existing, non-empty file starts with the header of this writer
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                matches (boolean) - True if new rows can be appended to the existing file
+        """
+
+    @abc.abstractmethod
+    def write_header(self):
+        """
+            Writes the header at the start of a new file
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+    def prepare_append(self):
+        """
+            Prepares an existing file for new rows to be appended, e.g. terminating a partial last line
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        pass
+
+    @abc.abstractmethod
+    def write_rows(self, rows):
+        """
+            Writes rows to the open file
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+                rows (list) - rows to write
+
+            Returns:
+                void
+        """
+
+    def open(self):
+        """
+            Opens the file for appending, writing the header if the file is new. An existing file with a different
+            header is rotated first
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        if os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
+            if not self.header_matches():
+                self.rename_current()
+
+        self.file = open(self.filename, self.mode, newline=self.newline)
+
+        if self.file.tell() == 0:
+            self.write_header()
+            self.file.flush()
+        else:
+            self.prepare_append()
+
+        self.opened_date = datetime.date.today()
+        self.last_flush = time.monotonic()
+
+    def rename_current(self):
+        """
+            Renames the current file with a timestamp suffix, e.g. telemetry-20211108-120000.csv
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        root, extension = os.path.splitext(self.filename)
+        suffix = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotatedName = f"{root}-{suffix}{extension}"
+        count = 1
+        while os.path.exists(rotatedName):
+            rotatedName = f"{root}-{suffix}-{count}{extension}"
+            count += 1
+
+        os.rename(self.filename, rotatedName)
+
+    def rotate(self):
+        """
+            Starts a new file, renaming the current one
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.file.close()
+        self.rename_current()
+        self.open()
+
+    def append(self, row):
+        """
+            Buffers a row and flushes the buffer if enough rows are waiting or the flush interval has passed
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+                row (list) - values of the row, in the order of the header
+
+            Returns:
+                void
+        """
+
+        self.buffer.append(row)
+
+        if len(self.buffer) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+            Writes the buffered rows to the file, rotating it first if it is too big or the day has changed
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        if self.buffer:
+            if self.max_bytes is not None and self.file.tell() >= self.max_bytes:
+                self.rotate()
+            elif self.rotate_daily and datetime.date.today() != self.opened_date:
+                self.rotate()
+
+            self.write_rows(self.buffer)
+            self.buffer = []
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """
+            Flushes the buffer and closes the file
+
+            Parameters:
+                self (RotatingLogWriter) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        if self.file is not None and not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class StreamingCSVWriter(RotatingLogWriter):
+    """
+    Appends rows to a csv file that is kept open for the life of the writer, see RotatingLogWriter for the buffering
+    and rotation. The telemetry service logs through the binary BinaryTelemetryWriter, this writer is kept for data
+    logs that are read as text on the ground, e.g. bench test logs
+    ...
+    """
+
+    newline = ""  # the csv module writes its own line terminators
+
+    def __init__(self, filename, header, flush_rows=10, flush_interval=60, max_bytes=None, rotate_daily=False,
+                 fsync=True):
+        """
+            Initialises the StreamingCSVWriter class and opens the csv file for appending
+
+            Parameters:
+                self (StreamingCSVWriter) - default class from the Python convention
+                filename (string) - path to the csv file
+                header (list: string) - column names written at the top of each file
+                flush_rows (int) - number of buffered rows that triggers a flush
+                flush_interval (float) - seconds after the last flush that trigger a flush
+                max_bytes (int) - size at which the file is rotated, None to never rotate on size
+                rotate_daily (boolean) - True to rotate the file when the date changes
+                fsync (boolean) - True to fsync the file after each flush
+
+            Returns:
+                void
+        """
+
+        self.header = [str(column) for column in header]
+        super().__init__(filename, flush_rows, flush_interval, max_bytes, rotate_daily, fsync)
+
+    def header_matches(self):
+        with open(self.filename, "r", newline="") as f:
+            existingHeader = next(csv.reader(f), [])
+
+        return existingHeader == self.header
+
+    def write_header(self):
+        csv.writer(self.file).writerow(self.header)
+
+    def prepare_append(self):
+        # make sure the first new row is not joined onto an unterminated last line
+        with open(self.filename, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                self.file.write("\n")
+
+    def write_rows(self, rows):
+        csv.writer(self.file).writerows(rows)
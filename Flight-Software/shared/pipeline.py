@@ -0,0 +1,273 @@
+''' @file pipeline.py
+
+@brief Defines the producer/consumer pipeline used to encode and write frames off the capture path.
+
+@section description_pipeline Description
+Defines the bounded frame queue and pool of worker threads the imaging tasks hand captured frames to. The capture
+loop submits each frame and goes straight back to waiting for the next capture, while the workers encode and write
+the frames in the background. The queue is bounded, so when the workers fall behind the capture loop blocks on submit
+(back-pressure) instead of holding an unbounded number of frames in memory. The time each frame spends waiting for a
+queue slot, queued and being handled is recorded, so the pass timings show whether the pipeline kept up. Frames can be
+copied into a pool of preallocated buffers that are reused once written, so a pass never holds more frames in memory
+than the pool has buffers.
+- FrameMetrics (class)
+- FramePipeline (class)
+- BufferPool (class)
+
+
+@section libraries_pipeline Libraries/Modules
+- python queue library
+- python threading library
+- python time library
+- python numpy library
+
+
+@section todo_pipeline TODO
+- None.
+'''
+
+import queue
+import threading
+import time
+import numpy as np
+
+class FrameMetrics:
+    """
+    The timing of a frame through the pipeline, all times are in nanoseconds since the epoch
+    ...
+
+    Attributes
+    ----------
+    frame : int
+        number of the frame
+    submitted : int
+        time the frame was handed to the pipeline
+    blocked : int
+        nanoseconds the capture loop waited for a free queue slot
+    started : int
+        time a worker started handling the frame, None if it never started
+    finished : int
+        time the worker finished handling the frame, None if it never finished
+    error : string
+        error raised by the handler, None if the frame was handled
+    """
+
+    def __init__(self, frame, submitted, blocked):
+        self.frame = frame
+        self.submitted = submitted
+        self.blocked = blocked
+        self.started = None
+        self.finished = None
+        self.error = None
+
+class FramePipeline:
+    """
+    A bounded queue of frames handled by a pool of worker threads
+    ...
+
+    Methods
+    -------
+    submit(frame, data):
+        Hands a frame to the workers, blocking while the queue is full
+    close():
+        Waits for the queued frames to be handled and stops the workers
+    """
+
+    def __init__(self, handler, workers=2, depth=4, logger=None, release=None):
+        """
+            Initialises the FramePipeline class and starts the worker threads
+
+            Parameters:
+                self (FramePipeline) - default class from the Python convention
+                handler (function) - called by a worker as handler(frame, data) for each frame
+                workers (int) - number of worker threads
+                depth (int) - number of frames that can be queued before submit blocks
+                logger (object): Object containing information on how to write logs
+                release (function) - called as release(data) once a frame has been handled, whether or not the handler
+                succeeded, e.g. to return the frame's buffer to a BufferPool
+
+            Returns:
+                void
+        """
+
+        self.handler = handler
+        self.release = release
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=depth)
+        self.metrics = []
+
+        self.threads = [threading.Thread(target=self.worker, name=f"frame-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+    def submit(self, frame, data):
+        """
+            Hands a frame to the workers. Blocks while the queue is full, until a worker takes a frame
+
+            Parameters:
+                self (FramePipeline) - default class from the Python convention
+                frame (int) - number of the frame
+                data (object) - the frame, passed to the handler
+
+            Returns:
+                metrics (FrameMetrics) - the frame's metrics, filled in by the worker as it is handled
+        """
+
+        submitted = time.time_ns()
+        metrics = FrameMetrics(frame, submitted, 0)
+
+        self.queue.put((metrics, data))
+        metrics.blocked = time.time_ns() - submitted
+        self.metrics.append(metrics)
+
+        if self.logger is not None and metrics.blocked > 1000000:
+            self.logger.warning(f"Frame {frame} waited {metrics.blocked / 1000000:.1f} ms for the frame pipeline")
+
+        return metrics
+
+    def worker(self):
+        """
+            Handles the queued frames until the pipeline is closed. An error in the handler is recorded in the frame's
+            metrics and logged, the worker carries on with the next frame
+
+            Parameters:
+                self (FramePipeline) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+
+            metrics, data = item
+            metrics.started = time.time_ns()
+            try:
+                self.handler(metrics.frame, data)
+                metrics.finished = time.time_ns()
+            except Exception as e:
+                metrics.error = f"{type(e).__name__}: {e}"
+                if self.logger is not None:
+                    self.logger.error(f"Frame {metrics.frame} failed in the frame pipeline: {metrics.error}")
+            finally:
+                if self.release is not None:
+                    self.release(data)
+                self.queue.task_done()
+
+    def close(self):
+        """
+            Waits for the queued frames to be handled and stops the workers. Logs a summary of the pipeline timings
+
+            Parameters:
+                self (FramePipeline) - default class from the Python convention
+
+            Returns:
+                metrics (list: FrameMetrics) - the metrics of every frame submitted, in submission order
+        """
+
+        if not self.threads:
+            return self.metrics
+
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+        handled = [metrics for metrics in self.metrics if metrics.finished is not None]
+        if self.logger is not None and self.metrics:
+            blocked = max(metrics.blocked for metrics in self.metrics) / 1000000
+            message = f"Frame pipeline: {len(handled)}/{len(self.metrics)} frames handled, max blocked {blocked:.1f} ms"
+            if handled:
+                handling = max(metrics.finished - metrics.started for metrics in handled) / 1000000
+                queued = max(metrics.started - metrics.submitted for metrics in handled) / 1000000
+                message += f", max queued {queued:.1f} ms, max handling {handling:.1f} ms"
+            self.logger.info(message)
+
+        return self.metrics
+
+class BufferPool:
+    """
+    A fixed set of preallocated frame buffers, reused once each frame is written
+    ...
+
+    Methods
+    -------
+    acquire(shape, dtype):
+        Returns a free buffer as an array of the frame's shape, blocking while every buffer is in use
+    release(array):
+        Returns a buffer to the pool
+    """
+
+    def __init__(self, count, nbytes):
+        """
+            Initialises the BufferPool class and allocates the buffers
+
+            Parameters:
+                self (BufferPool) - default class from the Python convention
+                count (int) - number of buffers
+                nbytes (int) - size of each buffer, the largest frame that will be stored in it
+
+            Returns:
+                void
+        """
+
+        self.nbytes = nbytes
+        self.free = [np.empty(nbytes, dtype=np.uint8) for _ in range(count)]
+        # buffers in use, by the id of the array handed out
+        self.inUse = {}
+        self.condition = threading.Condition()
+
+    def acquire(self, shape, dtype):
+        """
+            Returns a free buffer as a contiguous array of the frame's shape and type, blocking while every buffer is
+            in use
+
+            Parameters:
+                self (BufferPool) - default class from the Python convention
+                shape (tuple: int) - shape of the frame
+                dtype (numpy.dtype) - type of the frame's pixels
+
+            Returns:
+                array (numpy.ndarray) - uninitialised array backed by the buffer
+        """
+
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.nbytes:
+            raise ValueError(f"A {shape} {dtype} frame does not fit in a {self.nbytes} byte buffer")
+
+        with self.condition:
+            while not self.free:
+                self.condition.wait()
+            buffer = self.free.pop()
+            array = buffer[:nbytes].view(dtype).reshape(shape)
+            self.inUse[id(array)] = buffer
+
+        return array
+
+    def release(self, array):
+        """
+            Returns a buffer to the pool, the array must not be used afterwards
+
+            Parameters:
+                self (BufferPool) - default class from the Python convention
+                array (numpy.ndarray) - an array returned by acquire
+
+            Returns:
+                void
+        """
+
+        with self.condition:
+            self.free.append(self.inUse.pop(id(array)))
+            self.condition.notify()
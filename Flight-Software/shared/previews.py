@@ -0,0 +1,138 @@
+''' @file previews.py
+
+@brief Defines the downscaling and normalisation used to make small previews of the captured frames.
+
+@section description_previews Description
+Defines the functions the previews task uses to turn a full resolution frame from any camera into a preview of a few
+kilobytes that the ground can triage a pass from. Frames are downscaled by averaging blocks of pixels, raw Bayer
+frames are first reduced to one RGB pixel per Bayer cell and 16 bit thermal frames are stretched to 8 bits between
+percentiles of their values, all as whole array NumPy operations. A preview is only regenerated when its frame is
+newer than it.
+- preview_path
+- needs_preview
+- downscale
+- superpixel
+- normalize
+
+
+@section libraries_previews Libraries/Modules
+- python os library
+- python numpy library
+- shared bayer library
+
+
+@section todo_previews TODO
+- None.
+'''
+
+import os
+import numpy as np
+from shared.bayer import BAYER_LAYOUTS
+
+# directory, next to the frames, the previews are written to
+PREVIEW_DIRECTORY = "previews"
+# longest side of a preview in pixels
+PREVIEW_SIZE = 160
+# percentiles a thermal frame is stretched between
+STRETCH_PERCENTILES = (1, 99)
+# largest size of a preview in bytes
+PREVIEW_BYTES = 8000
+# extensions of the frames previews are made of
+FRAME_EXTENSIONS = [".tiff", ".jpg", ".jpeg", ".bayer", ".dat"]
+
+def preview_path(source):
+    """
+        Returns the path of the preview of a frame
+
+            Parameters:
+                source (string): path of the frame
+
+            Returns:
+                preview (string): path of the frame's preview
+    """
+
+    directory, name = os.path.split(source)
+
+    return os.path.join(directory, PREVIEW_DIRECTORY, os.path.splitext(name)[0] + ".jpg")
+
+def needs_preview(source):
+    """
+        Checks if a frame's preview needs to be generated, i.e. it does not exist or is older than the frame
+
+            Parameters:
+                source (string): path of the frame
+
+            Returns:
+                needed (boolean): True if the preview needs to be generated
+    """
+
+    preview = preview_path(source)
+
+    return not os.path.exists(preview) or os.path.getmtime(preview) < os.path.getmtime(source)
+
+def downscale(image, maxSize=PREVIEW_SIZE):
+    """
+        Downscales an image by an integer factor, averaging each block of pixels, so its longest side is at most
+        maxSize. The edge rows and columns that do not fill a block are dropped
+
+            Parameters:
+                image (numpy.ndarray): height x width or height x width x channels array
+                maxSize (int): longest side of the downscaled image in pixels
+
+            Returns:
+                image (numpy.ndarray): float32 array of the downscaled image
+    """
+
+    height, width = image.shape[:2]
+    factor = max(1, -(-max(height, width) // maxSize))
+    height, width = height // factor, width // factor
+
+    blocks = image[:height * factor, :width * factor].reshape(height, factor, width, factor, *image.shape[2:])
+
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+def superpixel(pixels, pattern="RG"):
+    """
+        Reduces a raw Bayer frame to a half resolution RGB image, one pixel per 2x2 Bayer cell with the cell's red,
+        mean green and blue values
+
+            Parameters:
+                pixels (numpy.ndarray): 2D array of the sensor's pixels
+                pattern (string): colours of the first row of the Bayer cell, e.g. RG
+
+            Returns:
+                image (numpy.ndarray): float32 half height x half width x 3 array
+    """
+
+    height, width = pixels.shape[0] // 2 * 2, pixels.shape[1] // 2 * 2
+    layout = BAYER_LAYOUTS[pattern]
+    cells = [pixels[dy:height:2, dx:width:2].astype(np.float32) for dy in range(2) for dx in range(2)]
+
+    red = cells[layout.index("R")]
+    blue = cells[layout.index("B")]
+    green = (cells[layout.index("G")] + cells[layout.rindex("G")]) / 2
+
+    return np.stack([red, green, blue], axis=-1)
+
+def normalize(image, bits=None, percentiles=STRETCH_PERCENTILES):
+    """
+        Converts an image to 8 bits. With a bit depth the full range is scaled to 8 bits, otherwise the values are
+        stretched between two percentiles, so a thermal frame using a small part of its range keeps its contrast
+
+            Parameters:
+                image (numpy.ndarray): image to convert
+                bits (int): bit depth of the image, None to stretch between the percentiles
+                percentiles (tuple: float): low and high percentiles mapped to 0 and 255
+
+            Returns:
+                image (numpy.ndarray): uint8 array of the image
+    """
+
+    if bits is not None:
+        low, high = 0, 2 ** bits - 1
+    else:
+        low, high = np.percentile(image, percentiles)
+
+    scale = 255 / max(high - low, 1e-6)
+
+    return np.clip((image - low) * scale + 0.5, 0, 255).astype(np.uint8)
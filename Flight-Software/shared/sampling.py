@@ -0,0 +1,393 @@
+''' @file sampling.py
+
+@brief Defines the ADC sampling engine used by the telemetry service.
+
+@section description_sampling Description
+Defines the classes and functions used to read all the telemetry sensors in one pass. Each pin is read several times
+per sample (oversampling), the raw readings are converted to physical values as NumPy arrays and each sample reports
+the mean, min, max and standard deviation of every sensor. The ADC backend can be replaced by MockADC to run without
+the BeagleBone hardware. The sensors are declared in the sensors section of config.json and loaded into a
+SensorTable, which holds their settings as arrays so a sample is checked against every threshold in one go.
+- temp_conversion
+- curr_conversion
+- MockADC (class)
+- SensorSample (class)
+- ADCSampler (class)
+- SensorTable (class)
+
+
+@section libraries_sampling Libraries/Modules
+- python numpy library
+- Adafruit_BBIO ADC library (optional, imported when no backend is given)
+
+
+@section todo_sampling TODO
+- None.
+'''
+
+import numpy as np
+
+def temp_conversion(pinvalue):
+    """
+        converts the raw pin reading to a physical temp sensor value
+
+        Parameters:
+            pinvalue (float/numpy.ndarray) - raw pin value(s) from sensor
+
+        Returns:
+            sensorValue (float/numpy.ndarray) - temp sensor reading, NaN if no reading successfully read
+
+    """
+    tempsensorvoltage = pinvalue * 1.8
+
+    resistance25c = 100000
+    T1 = 273 + 25  # test temperature from spec
+    controlresistor = 10000
+    betaValue = 3976
+
+    #sensorvalue = betaValue * T1 / (betaValue - T1 * numpy.log(resistance25c) - numpy.log(
+    #    (1.8 * controlresistor / tempsensorvoltage) - controlresistor))
+    sensorvalue = (betaValue*T1) / (T1*np.log(((1.8*controlresistor)/(tempsensorvoltage))-controlresistor) - T1*np.log(resistance25c) + betaValue)
+    return sensorvalue
+
+
+def curr_conversion(pinvalue):
+    """
+        converts the raw pin reading to a physical current sensor value
+
+        Parameters:
+            pinvalue (float/numpy.ndarray) - raw pin value(s) from sensor
+
+        Returns:
+            sensorValue (float/numpy.ndarray) - current sensor reading, NaN if no reading successfully read
+
+    """
+    currsensorvoltage = pinvalue * 1.8
+
+    zeroamps = 0.493
+    ampscale = 0.4
+
+    sensorvalue = currsensorvoltage * ampscale + zeroamps
+    return sensorvalue
+
+# conversion functions by conversion type
+CONVERSIONS = {"temperature": temp_conversion,
+               "current": curr_conversion}
+
+class MockADC:
+    """
+    ADC backend with the same interface as Adafruit_BBIO.ADC, for running the telemetry service without the hardware
+    ...
+
+    Methods
+    -------
+    setup():
+        Does nothing, as ADC.setup
+    read(pinID):
+        Returns the configured pin value plus optional gaussian noise
+    """
+
+    def __init__(self, values=None, noise=0.0, seed=None):
+        """
+            Initialises the MockADC class
+
+            Parameters:
+                self (MockADC) - default class from the Python convention
+                values (dict) - pin ID: normalised pin value (0-1) returned by read, 0.5 for pins not given
+                noise (float) - standard deviation of the noise added to each reading
+                seed (int) - seed of the noise generator
+
+            Returns:
+                void
+        """
+
+        self.values = values if values is not None else {}
+        self.noise = noise
+        self.random = np.random.default_rng(seed)
+        self.reads = 0
+
+    def setup(self):
+        pass
+
+    def read(self, pinID):
+        self.reads += 1
+        value = self.values.get(pinID, 0.5)
+        if isinstance(value, Exception):
+            raise value
+
+        return float(np.clip(value + self.random.normal(0.0, self.noise), 0.0, 1.0)) if self.noise else value
+
+class SensorSample:
+    """
+    The result of sampling all the sensors once. Each attribute is an array with one entry per sensor, NaN for sensors
+    that could not be read
+    ...
+
+    Attributes
+    ----------
+    raw : numpy.ndarray
+        mean raw pin value
+    mean : numpy.ndarray
+        mean physical value
+    min : numpy.ndarray
+        minimum physical value in the burst
+    max : numpy.ndarray
+        maximum physical value in the burst
+    std : numpy.ndarray
+        standard deviation of the physical values in the burst
+    """
+
+    def __init__(self, raw, values):
+        """
+            Initialises the SensorSample class from the readings of a burst
+
+            Parameters:
+                self (SensorSample) - default class from the Python convention
+                raw (numpy.ndarray) - raw pin values, shape (sensors, oversample)
+                values (numpy.ndarray) - physical values, shape (sensors, oversample)
+
+            Returns:
+                void
+        """
+
+        # a sensor with no valid reading in the burst gives NaN, without numpy's empty slice warnings
+        valid = np.any(~np.isnan(values), axis=1)
+        rawValid = np.any(~np.isnan(raw), axis=1)
+
+        self.raw = np.full(len(raw), np.nan)
+        self.mean = np.full(len(values), np.nan)
+        self.min = np.full(len(values), np.nan)
+        self.max = np.full(len(values), np.nan)
+        self.std = np.full(len(values), np.nan)
+
+        self.raw[rawValid] = np.nanmean(raw[rawValid], axis=1)
+        self.mean[valid] = np.nanmean(values[valid], axis=1)
+        self.min[valid] = np.nanmin(values[valid], axis=1)
+        self.max[valid] = np.nanmax(values[valid], axis=1)
+        self.std[valid] = np.nanstd(values[valid], axis=1)
+
+class ADCSampler:
+    """
+    Reads a set of ADC pins in one pass, oversampling each pin and converting the readings to physical values
+    ...
+
+    Methods
+    -------
+    read_burst():
+        Reads every pin oversample times
+    sample():
+        Reads and converts a burst, returning its statistics
+    """
+
+    def __init__(self, pins, conversions, oversample=8, backend=None, logger=None):
+        """
+            Initialises the ADCSampler class and sets up the ADC
+
+            Parameters:
+                self (ADCSampler) - default class from the Python convention
+                pins (list: string) - IDs of the pins to read, e.g. P9_33
+                conversions (list: string) - conversion type of each pin, a key of CONVERSIONS
+                oversample (int) - number of readings of each pin per sample
+                backend (object) - ADC backend, Adafruit_BBIO.ADC if not given
+                logger (object): Object containing information on how to write logs
+
+            Returns:
+                void
+        """
+
+        if backend is None:
+            import Adafruit_BBIO.ADC as backend
+
+        self.pins = list(pins)
+        self.conversions = list(conversions)
+        self.oversample = oversample
+        self.backend = backend
+        self.logger = logger
+
+        for conversion in self.conversions:
+            if conversion not in CONVERSIONS:
+                raise ValueError(f"sensor conversion {conversion} has no conversion to physical reading implemented")
+
+        # rows of the pins that use each conversion, so each conversion runs once per sample on all its pins
+        self.conversionRows = {conversion: np.array([row for row, rowConversion in enumerate(self.conversions)
+                                                     if rowConversion == conversion])
+                               for conversion in set(self.conversions)}
+
+        self.backend.setup()
+
+    def read_burst(self):
+        """
+            Reads every pin oversample times. The pins are read in turn on each round, so each pin's readings are
+            spread over the whole burst
+
+            Parameters:
+                self (ADCSampler) - default class from the Python convention
+
+            Returns:
+                raw (numpy.ndarray) - raw pin values, shape (pins, oversample), NaN for failed readings
+        """
+
+        raw = np.full((len(self.pins), self.oversample), np.nan)
+        failed = set()
+
+        for column in range(self.oversample):
+            for row, pinID in enumerate(self.pins):
+                if row in failed:
+                    continue
+                try:
+                    raw[row, column] = self.backend.read(pinID)
+                except Exception as e:
+                    # stop reading a pin that fails, rather than retrying it for the rest of the burst
+                    failed.add(row)
+                    if self.logger is not None:
+                        self.logger.error(f"Unable to read sensor data from {pinID}: {e}")
+
+        return raw
+
+    def sample(self):
+        """
+            Reads a burst and converts it to physical values
+
+            Parameters:
+                self (ADCSampler) - default class from the Python convention
+
+            Returns:
+                sample (SensorSample) - mean raw value and mean/min/max/std physical value of every pin
+        """
+
+        raw = self.read_burst()
+        values = np.full(raw.shape, np.nan)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for conversion, rows in self.conversionRows.items():
+                values[rows] = CONVERSIONS[conversion](raw[rows])
+
+        return SensorSample(raw, values)
+
+class SensorTable:
+    """
+    The telemetry sensors declared in the config, with their settings held in arrays in the order of the config file
+    ...
+
+    Methods
+    -------
+    from_config(sensorsConfig):
+        Creates the table from the sensors section of the config
+    update_thresholds(sensorsConfig):
+        Reloads the thresholds and mitigations of the sensors from the config
+    log_flags(raw):
+        Returns the log level flag of each sensor for a sample
+    create_sampler(oversample, backend, logger):
+        Creates an ADCSampler reading the pins of the table
+    """
+
+    # log level flags following standard practise, 0 for sensors that could not be read
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+    def __init__(self, names, pins, conversions, thresholds, mitigations):
+        """
+            Initialises the SensorTable class
+
+            Parameters:
+                self (SensorTable) - default class from the Python convention
+                names (list: string) - names of the sensors
+                pins (list: string) - ID of the ADC pin of each sensor
+                conversions (list: string) - conversion type of each sensor, a key of CONVERSIONS
+                thresholds (list) - [warning threshold, error threshold] of each sensor
+                mitigations (list: string) - action taken when each sensor reaches its error threshold
+
+            Returns:
+                void
+        """
+
+        self.names = list(names)
+        self.pins = list(pins)
+        self.conversions = list(conversions)
+        self.thresholds = np.array(thresholds, dtype=float).reshape(len(self.names), 2)
+        self.mitigations = list(mitigations)
+        self.safeMode = np.array([mitigation == "safe_mode" for mitigation in self.mitigations], dtype=bool)
+
+    @staticmethod
+    def from_config(sensorsConfig):
+        """
+            Creates the table from the sensors section of the config
+
+            Parameters:
+                sensorsConfig (SensorsConfig) - sensors config parameters from the JSON file
+
+            Returns:
+                table (SensorTable) - table of the sensors in the config
+        """
+
+        names, pins, conversions, thresholds, mitigations = [], [], [], [], []
+        for name, sensor in sensorsConfig.sensor_items():
+            if getattr(sensor, "pin", None) is None or getattr(sensor, "conversion", None) is None:
+                raise ValueError(f"sensor {name} has no pin or conversion in the config")
+
+            names.append(name)
+            pins.append(sensor.pin)
+            conversions.append(sensor.conversion)
+            thresholds.append([sensor.warn_threshold, sensor.error_threshold])
+            # sensors without a mitigation enter safe mode, as they always have
+            mitigations.append(getattr(sensor, "mitigation", "safe_mode"))
+
+        return SensorTable(names, pins, conversions, thresholds, mitigations)
+
+    def update_thresholds(self, sensorsConfig):
+        """
+            Reloads the thresholds and mitigations of the sensors from the config. The sensors and their pins are kept,
+            a sensor removed from the config keeps its previous settings
+
+            Parameters:
+                self (SensorTable) - default class from the Python convention
+                sensorsConfig (SensorsConfig) - sensors config parameters from the JSON file
+
+            Returns:
+                void
+        """
+
+        for row, name in enumerate(self.names):
+            sensor = getattr(sensorsConfig, name, None)
+            if sensor is None:
+                continue
+
+            self.thresholds[row] = [sensor.warn_threshold, sensor.error_threshold]
+            self.mitigations[row] = getattr(sensor, "mitigation", "safe_mode")
+            self.safeMode[row] = self.mitigations[row] == "safe_mode"
+
+    def log_flags(self, raw):
+        """
+            Returns the log level flag of each sensor, comparing the raw readings with all the thresholds in one go
+
+            Parameters:
+                self (SensorTable) - default class from the Python convention
+                raw (numpy.ndarray) - raw reading of each sensor, NaN for sensors that could not be read
+
+            Returns:
+                flags (numpy.ndarray) - INFO below the warning threshold, WARNING below the error threshold, ERROR
+                otherwise and 0 for NaN readings
+        """
+
+        flags = np.where(raw < self.thresholds[:, 0], self.INFO,
+                         np.where(raw < self.thresholds[:, 1], self.WARNING, self.ERROR))
+        flags[np.isnan(raw)] = 0
+
+        return flags
+
+    def create_sampler(self, oversample=8, backend=None, logger=None):
+        """
+            Creates an ADCSampler reading the pins of the table, in table order
+
+            Parameters:
+                self (SensorTable) - default class from the Python convention
+                oversample (int) - number of readings of each pin per sample
+                backend (object) - ADC backend, Adafruit_BBIO.ADC if not given
+                logger (object): Object containing information on how to write logs
+
+            Returns:
+                sampler (ADCSampler) - sampler of the sensors
+        """
+
+        return ADCSampler(self.pins, self.conversions, oversample, backend, logger)
@@ -0,0 +1,261 @@
+''' @file storage.py
+
+@brief Defines the storage manager that keeps room on the SD card for the next pass.
+
+@section description_storage Description
+Defines the class the transfer task uses to manage the space on a storage device. Each pass is stored in a directory
+named after its start timestamp. The manager keeps an index of the pass directories with their sizes and timestamps
+in a file on the device, updated as passes are transferred and evicted, so the device is only scanned to build the
+index when it is missing. Before a pass is transferred the oldest passes are removed, with everything in them, until
+the device's usage after the next pass is below the high-water mark.
+- StorageManager (class)
+
+
+@section libraries_storage Libraries/Modules
+- python json library
+- python os library
+- python shutil library
+- python tempfile library
+- python time library
+
+
+@section todo_storage TODO
+- None.
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# name of the index in the root of the storage device
+INDEX_NAME = ".storage-index.json"
+# fraction of the device's capacity that may be used once the next pass is stored
+HIGH_WATER_MARK = 0.9
+# space assumed for the next pass until a pass has been recorded
+DEFAULT_PASS_BYTES = 700000000
+# number of recent passes the space needed for the next pass is estimated from
+PASS_HISTORY = 3
+
+class StorageManager:
+    """
+    The index of the passes stored on a device and the eviction of the oldest ones
+    ...
+
+    Methods
+    -------
+    passes():
+        Returns the names of the indexed passes, oldest first
+    record_pass(name, nbytes, files):
+        Adds the files transferred to a pass to the index
+    space_needed():
+        Returns the space the next pass is expected to need
+    evict(needed, keep, logger):
+        Removes the oldest passes until the next pass fits below the high-water mark
+    """
+
+    def __init__(self, path, highWaterMark=HIGH_WATER_MARK):
+        """
+            Initialises the StorageManager class and loads the device's index, scanning the device to build it if it
+            is missing or unreadable
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+                path (string) - mount point of the storage device
+                highWaterMark (float) - fraction of the device's capacity that may be used once the next pass is stored
+
+            Returns:
+                void
+        """
+
+        self.path = path
+        self.highWaterMark = highWaterMark
+        self.indexPath = os.path.join(path, INDEX_NAME)
+
+        try:
+            with open(self.indexPath) as f:
+                # size, number of files and timestamp of each pass, by directory name
+                self.index = json.load(f)["passes"]
+        except (OSError, ValueError, KeyError):
+            self.index = self.scan()
+            self.write_index()
+
+    @staticmethod
+    def pass_timestamp(name):
+        """
+            Returns the start timestamp of a pass from the name of its directory
+
+            Parameters:
+                name (string) - name of the directory
+
+            Returns:
+                timestamp (float) - start timestamp of the pass, None if the directory is not a pass
+        """
+
+        try:
+            return float(name)
+        except ValueError:
+            return None
+
+    def scan(self):
+        """
+            Builds the index from the pass directories on the device, only used when there is no index
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+
+            Returns:
+                index (dict) - size, number of files and timestamp of each pass, by directory name
+        """
+
+        index = {}
+        for entry in os.scandir(self.path):
+            timestamp = self.pass_timestamp(entry.name)
+            if timestamp is None or not entry.is_dir(follow_symlinks=False):
+                continue
+
+            nbytes, files = 0, 0
+            for root, _, names in os.walk(entry.path):
+                for name in names:
+                    nbytes += os.lstat(os.path.join(root, name)).st_size
+                    files += 1
+            index[entry.name] = {"bytes": nbytes, "files": files, "timestamp": timestamp}
+
+        return index
+
+    def write_index(self):
+        """
+            Writes the index to the device atomically (temporary file, fsync, rename)
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        # a temporary file unique to this process, the transfer and previews tasks both update the index
+        descriptor, tempPath = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w") as f:
+                json.dump({"passes": self.index, "updated": time.time()}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tempPath, self.indexPath)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+
+        directory = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def passes(self):
+        """
+            Returns the names of the indexed passes, oldest first
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+
+            Returns:
+                passes (list: string) - names of the pass directories
+        """
+
+        return sorted(self.index, key=lambda name: self.index[name]["timestamp"])
+
+    def record_pass(self, name, nbytes, files):
+        """
+            Adds the files transferred to a pass to the index, creating the pass' entry if needed
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+                name (string) - name of the pass directory
+                nbytes (int) - bytes transferred
+                files (int) - number of files transferred
+
+            Returns:
+                void
+        """
+
+        timestamp = self.pass_timestamp(name)
+        entry = self.index.setdefault(name, {"bytes": 0, "files": 0,
+                                             "timestamp": timestamp if timestamp is not None else time.time()})
+        entry["bytes"] += nbytes
+        entry["files"] += files
+
+        self.write_index()
+
+    def space_needed(self):
+        """
+            Returns the space the next pass is expected to need, the size of the largest of the recent passes
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+
+            Returns:
+                nbytes (int) - expected size of the next pass
+        """
+
+        recent = [self.index[name]["bytes"] for name in self.passes()[-PASS_HISTORY:] if self.index[name]["bytes"]]
+
+        return max(recent) if recent else DEFAULT_PASS_BYTES
+
+    def evict(self, needed=None, keep=(), logger=None):
+        """
+            Removes the oldest passes, directory and content, until the device's usage with the next pass stored is
+            below the high-water mark. A pass that can not be deleted is logged and kept in the index
+
+            Parameters:
+                self (StorageManager) - default class from the Python convention
+                needed (int) - space the next pass needs, estimated from the recent passes if None
+                keep (list: string) - names of the passes that must not be removed, e.g. the one being transferred
+                logger (object): Object containing information on how to write logs
+
+            Returns:
+                evicted (list: string) - names of the passes removed
+        """
+
+        if needed is None:
+            needed = self.space_needed()
+
+        total, used, free = shutil.disk_usage(self.path)
+        limit = total * self.highWaterMark
+        if logger is not None:
+            logger.info(f"Storage {self.path}: {used} of {total} bytes used, {needed} bytes needed for the next pass")
+
+        evicted = []
+        for name in self.passes():
+            if used + needed <= limit and needed <= free:
+                break
+            if name in keep:
+                continue
+
+            if logger is not None:
+                logger.info(f"Deleting pass {name} ({self.index[name]['bytes']} bytes)")
+            try:
+                shutil.rmtree(os.path.join(self.path, name))
+            except FileNotFoundError:
+                # already deleted, only the index entry is left
+                pass
+            except OSError as e:
+                # the pass stays indexed, so its deletion is retried on the next eviction
+                if logger is not None:
+                    logger.error(f"Unable to delete pass {name}: {e}")
+                continue
+
+            self.index.pop(name)
+            evicted.append(name)
+            # the usage is read again rather than reduced by the indexed size, which may not match what was freed
+            total, used, free = shutil.disk_usage(self.path)
+
+        if evicted:
+            self.write_index()
+        if logger is not None and (used + needed > limit or needed > free):
+            logger.warning(f"Storage {self.path} is still above the high-water mark with no more passes to delete")
+
+        return evicted
@@ -12,6 +12,9 @@
  - capture_timings
  - array_to_string
  - post_pass_capture_timings
+ - task_finished
+ - dependency
+ - ready_time
  - start_task
 
 
@@ -52,6 +55,16 @@ class Tasks:
         list of tasks from the tasks.json file
     tasks_total : ing
         total number of tasks defined in the tasks.json file
+    tasks_in_progress : list
+        (process, task) of each task running
+    tasks_done : list
+        ids of the tasks finished in the current pass
+    tasks_started : dict
+        timestamp each task was started, by task id
+    tasks_finished : dict
+        timestamp each task of the current pass finished or was stopped, by task id
+    hold_until : float
+        timestamp before which no new task is started (delay of the last finished task)
 
     Methods
     -------
@@ -59,33 +72,66 @@ class Tasks:
         Reads the tasks.json file and returns its content in a json object
     get_tasks_total():
         Calculates the total number of both pass and post-pass tasks
+    new_pass():
+        Forgets the tasks run in the previous pass
     pass_tasks_ids():
         Creates an array of pass tasks IDs
     capture_timings(n, orbitalAltitude,passStartTime,passEndTime, camera):
         Calculates the capture times of a set of images with equal angles between each capture
     array_to_string(array):
         Converts a list of string to a single string
+    task_finished(task, currentTime):
+        Records that a task has finished and holds off the next task for the task's delay
+    dependency(task, taskList):
+        Returns the task that must finish before the given task can start
+    ready_time(task, taskList):
+        Returns the time at which a task may be started
     start_task(pass_started, task, config, logger):
         Starts a pass or post-pass task as a background subprocess
 
+    Each task in tasks.json has an "id", "name", "file_path" and "delay". The delay is the time in seconds that must
+    pass after the task finishes before the next task is started. A task can also declare that it starts a number of
+    seconds after another task finishes, with "after": {"id": <task id>, "delay": <seconds>}
+
     """
-    tasks_done = []
-    tasks_in_progress = []
     arguments = " "
 
-    def __init__(self):
+    def __init__(self, path="/home/debian/Scheduler/tasks.json"):
         """
             Initialises the Tasks class, reads the tasks.json file and stores its content
 
             Parameters:
                 self (Tasks) - default class from the Python convention
+                path (string) - path to the tasks.json file
 
             Returns:
                 void
         """
-        
+
+        self.path = path
         self.tasks = self.get_tasks()
         self.tasks_total = self.get_tasks_total()
+        self.tasks_in_progress = []
+        self.new_pass()
+
+    def new_pass(self):
+        """
+            Forgets the tasks run in the previous pass, so a delay or finished task left over from it does not hold
+            back the tasks of the new pass. The tasks still in progress are kept
+
+            Parameters:
+                self (Tasks) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.tasks_done = []
+        # task id: timestamp the task was started, kept for the tasks still running so they can still time out
+        self.tasks_started = {task["id"]: self.tasks_started[task["id"]] for _, task in self.tasks_in_progress
+                              if task["id"] in getattr(self, "tasks_started", {})}
+        self.tasks_finished = {}  # task id: timestamp the task finished or was stopped
+        self.hold_until = 0  # timestamp before which no new task is started (delay of the last finished task)
     
     def get_tasks(self):
         """
@@ -98,7 +144,7 @@ class Tasks:
                 data_json (object) - tasks and their parameters in a json object
         """
 
-        f = open("/home/debian/Scheduler/tasks.json", "r")
+        f = open(self.path, "r")
         data_json = json.load(f)    
         f.close()
 
@@ -233,6 +279,77 @@ class Tasks:
         return timingsStr
         
 
+    def task_finished(self, task, currentTime):
+        """
+            Records that a task has finished (or was stopped) and holds off the next task for the task's delay. The
+            delay is applied by ready_time, so the caller is never blocked while it runs
+
+            Parameters:
+                self (Tasks): default class from the Python convention
+                task (object): a task object with its parameters
+                currentTime (float): Current timestamp at time of function call
+
+            Returns:
+                void
+        """
+
+        task_id = task["id"]
+
+        # Append the process to an array so that it wasnt repeated
+        self.tasks_done.append(task_id)
+        self.tasks_finished[task_id] = currentTime
+        self.hold_until = max(self.hold_until, currentTime + task["delay"])
+
+    def dependency(self, task, taskList=None):
+        """
+            Returns the task that must finish before the given task can start. This is the task declared by the
+            "after" property or, for tasks run one after another (taskList given), the previous task in the list
+
+            Parameters:
+                self (Tasks): default class from the Python convention
+                task (object): a task object with its parameters
+                taskList (list: object): tasks run one after another that the task belongs to, None if the tasks
+                are run simultaneously
+
+            Returns:
+                dependency (tuple) - (task id, delay in seconds) of the dependency, None if the task has none
+        """
+
+        if "after" in task:
+            return task["after"]["id"], task["after"].get("delay", 0)
+
+        if taskList is not None:
+            index = taskList.index(task)
+            if index > 0:
+                return taskList[index-1]["id"], 0
+
+        return None
+
+    def ready_time(self, task, taskList=None):
+        """
+            Returns the time at which a task may be started
+
+            Parameters:
+                self (Tasks): default class from the Python convention
+                task (object): a task object with its parameters
+                taskList (list: object): tasks run one after another that the task belongs to, None if the tasks
+                are run simultaneously
+
+            Returns:
+                readyTime (float) - timestamp after which the task may start, None if its dependency has not finished
+        """
+
+        readyTime = self.hold_until
+
+        dependency = self.dependency(task, taskList)
+        if dependency is not None:
+            dependency_id, dependency_delay = dependency
+            if dependency_id not in self.tasks_finished:
+                return None
+            readyTime = max(readyTime, self.tasks_finished[dependency_id] + dependency_delay)
+
+        return readyTime
+
     def start_task(self,currentTime, pass_started, task, config: Config, logger,passtype):
         """
             Starts a pass or post-pass task as a background subprocess
@@ -314,6 +431,7 @@ class Tasks:
                 logger.info("Process {id: "+str(task_id)+"} has started...")
 
                 self.tasks_in_progress.append((process, task))
+                self.tasks_started[task_id] = currentTime
                 
                 logger.info("Tasks in progress:")
                 for proc, task_ in self.tasks_in_progress:
@@ -0,0 +1,229 @@
+''' @file telemetry.py
+
+@brief Defines the binary telemetry record format, its writer and its readers.
+
+@section description_telemetry Description
+Defines the fixed width binary format the telemetry service logs sensor samples in. Each file starts with a short
+header describing the record layout, followed by packed records of an int64 timestamp (nanoseconds since the epoch)
+and, for each sensor, a float32 reading and a uint8 log level flag. A 7 sensor record is 43 bytes. Files are read
+back into NumPy structured arrays (memory mapped, so a day of telemetry loads without parsing) and can be exported
+to csv.
+- record_dtype
+- encode_header
+- read_header
+- read_telemetry
+- export_csv
+- BinaryTelemetryWriter (class)
+
+
+@section libraries_telemetry Libraries/Modules
+- python json library
+- python struct library
+- python csv library
+- python os library
+- python numpy library
+- shared logging library
+
+
+@section todo_telemetry TODO
+- None.
+'''
+
+import json
+import struct
+import csv
+import os
+import numpy as np
+from shared.logging import RotatingLogWriter
+
+MAGIC = b"PROVETLM"
+VERSION = 1
+# magic, version, length of the json field description
+HEADER_PREFIX = struct.Struct("<8sHH")
+
+def record_dtype(sensorNames):
+    """
+        Creates the packed record type for a list of sensors
+
+            Parameters:
+                sensorNames (list: string): names of the sensors in the record, in column order
+
+            Returns:
+                dtype (numpy.dtype): structured type with a timestamp field then a value and flag field per sensor
+    """
+
+    fields = [("timestamp", "<i8")]
+    for name in sensorNames:
+        fields.append((name, "<f4"))
+        fields.append((name + "_FLAG", "u1"))
+
+    return np.dtype(fields)
+
+def encode_header(dtype):
+    """
+        Encodes the file header describing a record type
+
+            Parameters:
+                dtype (numpy.dtype): record type of the file
+
+            Returns:
+                header (bytes): the file header
+    """
+
+    fields = json.dumps([[name, dtype.fields[name][0].str] for name in dtype.names]).encode()
+
+    return HEADER_PREFIX.pack(MAGIC, VERSION, len(fields)) + fields
+
+def read_header(filename):
+    """
+        Reads the header of a binary telemetry file
+
+            Parameters:
+                filename (string): path to the telemetry file
+
+            Returns:
+                dtype (numpy.dtype): record type of the file
+                offset (int): position of the first record in the file
+    """
+
+    with open(filename, "rb") as f:
+        prefix = f.read(HEADER_PREFIX.size)
+        if len(prefix) < HEADER_PREFIX.size:
+            raise ValueError(f"{filename} is not a telemetry file")
+
+        magic, version, fieldsLength = HEADER_PREFIX.unpack(prefix)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} telemetry file")
+
+        fields = json.loads(f.read(fieldsLength).decode())
+
+    dtype = np.dtype([(name, typeStr) for name, typeStr in fields])
+
+    return dtype, HEADER_PREFIX.size + fieldsLength
+
+def read_telemetry(filename, mmap=True):
+    """
+        Reads all the complete records of a binary telemetry file. A partially written last record is ignored
+
+            Parameters:
+                filename (string): path to the telemetry file
+                mmap (boolean): True to memory map the file rather than reading it into memory
+
+            Returns:
+                records (numpy.ndarray): structured array of the records, fields are accessed by name, e.g.
+                records["T_TEMP"]
+    """
+
+    dtype, offset = read_header(filename)
+    count = (os.path.getsize(filename) - offset) // dtype.itemsize
+
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+
+    if mmap:
+        return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+    return np.fromfile(filename, dtype=dtype, count=count, offset=offset)
+
+def export_csv(binaryFilename, csvFilename):
+    """
+        Exports a binary telemetry file to csv, with the same columns as the csv telemetry log. Dates are written in
+        ISO format (UTC)
+
+            Parameters:
+                binaryFilename (string): path to the telemetry file
+                csvFilename (string): path to the csv file to create
+
+            Returns:
+                count (int): number of records exported
+    """
+
+    records = read_telemetry(binaryFilename)
+    names = records.dtype.names[1:]
+
+    # convert each column to text in one go rather than formatting each value separately
+    columns = [records["timestamp"].astype("datetime64[ns]").astype(str)]
+    columns += [records[name].astype(str) for name in names]
+
+    with open(csvFilename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date"] + list(names))
+        writer.writerows(zip(*columns))
+
+    return len(records)
+
+class BinaryTelemetryWriter(RotatingLogWriter):
+    """
+    Appends telemetry samples to a binary telemetry file, see RotatingLogWriter for the buffering and rotation
+    ...
+
+    Methods
+    -------
+    append_sample(timestamp, values, flags):
+        Buffers a sample of all the sensors
+    """
+
+    mode = "ab"
+
+    def __init__(self, filename, sensorNames, flush_rows=10, flush_interval=60, max_bytes=None, rotate_daily=False,
+                 fsync=True):
+        """
+            Initialises the BinaryTelemetryWriter class and opens the telemetry file for appending
+
+            Parameters:
+                self (BinaryTelemetryWriter) - default class from the Python convention
+                filename (string) - path to the telemetry file
+                sensorNames (list: string) - names of the sensors in each sample
+                flush_rows (int) - number of buffered samples that triggers a flush
+                flush_interval (float) - seconds after the last flush that trigger a flush
+                max_bytes (int) - size at which the file is rotated, None to never rotate on size
+                rotate_daily (boolean) - True to rotate the file when the date changes
+                fsync (boolean) - True to fsync the file after each flush
+
+            Returns:
+                void
+        """
+
+        self.sensorNames = list(sensorNames)
+        self.dtype = record_dtype(self.sensorNames)
+        self.header = encode_header(self.dtype)
+        super().__init__(filename, flush_rows, flush_interval, max_bytes, rotate_daily, fsync)
+
+    def header_matches(self):
+        with open(self.filename, "rb") as f:
+            return f.read(len(self.header)) == self.header
+
+    def write_header(self):
+        self.file.write(self.header)
+
+    def prepare_append(self):
+        # drop a partially written last record (e.g. after a power loss) so the records stay aligned
+        size = self.file.tell()
+        validSize = size - (size - len(self.header)) % self.dtype.itemsize
+        if validSize != size:
+            self.file.truncate(validSize)
+            self.file.seek(validSize)
+
+    def write_rows(self, rows):
+        self.file.write(np.array(rows, dtype=self.dtype).tobytes())
+
+    def append_sample(self, timestamp, values, flags):
+        """
+            Buffers a sample of all the sensors
+
+            Parameters:
+                self (BinaryTelemetryWriter) - default class from the Python convention
+                timestamp (int) - time of the sample in nanoseconds since the epoch
+                values (list: float) - sensor readings, in the order of sensorNames
+                flags (list: int) - log level flags of the readings, in the order of sensorNames
+
+            Returns:
+                void
+        """
+
+        row = [timestamp]
+        for value, flag in zip(values, flags):
+            row.append(value)
+            row.append(flag)
+
+        self.append(tuple(row))
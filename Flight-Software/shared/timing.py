@@ -0,0 +1,117 @@
+''' @file timing.py
+
+@brief Defines the functions used to time camera triggers precisely without busy-waiting.
+
+@section description_timing Description
+Defines the functions used by the imaging tasks to wait for capture deadlines. The process sleeps until a few
+milliseconds before the deadline and only spins for the remainder, so the deadline is met to well under a
+millisecond while the CPU is free for image I/O the rest of the time. The process can optionally be given real-time
+(SCHED_FIFO) priority and pinned to a set of CPUs, so the wake-up is not delayed by the other tasks. Hardware that
+takes an unknown time to come up is polled with an exponential backoff instead of waiting a fixed worst case time.
+- sleep_until
+- set_realtime
+- poll_with_backoff
+
+
+@section libraries_timing Libraries/Modules
+- python os library
+- python time library
+
+
+@section todo_timing TODO
+- None.
+'''
+
+import os
+import time
+
+# time before a deadline at which sleeping stops and spinning starts, covers the scheduler wake-up latency
+SPIN_NS = 2000000
+
+def sleep_until(deadline, spin=SPIN_NS):
+    """
+        Waits until a deadline: sleeps until spin nanoseconds before it, then spins on the clock for the remainder.
+        Returns straight away if the deadline has passed
+
+            Parameters:
+                deadline (int) - deadline in nanoseconds since the epoch (time.time_ns)
+                spin (int) - nanoseconds before the deadline to stop sleeping and start spinning
+
+            Returns:
+                currentTime (int) - time the wait ended, in nanoseconds since the epoch
+    """
+
+    currentTime = time.time_ns()
+
+    remaining = deadline - currentTime - spin
+    if remaining > 0:
+        time.sleep(remaining / 1e9)
+
+    currentTime = time.time_ns()
+    while currentTime < deadline:
+        currentTime = time.time_ns()
+
+    return currentTime
+
+def set_realtime(logger, priority=None, cpus=None):
+    """
+        Gives the current process real-time (SCHED_FIFO) priority and/or pins it to a set of CPUs. Failures (e.g. no
+        permission) are logged and the process carries on with its normal scheduling
+
+            Parameters:
+                logger (object): Object containing information on how to write logs
+                priority (int) - SCHED_FIFO priority (1-99), None to keep the normal scheduling
+                cpus (list: int) - CPUs the process may run on, None to keep the current affinity
+
+            Returns:
+                success (boolean) - True if every requested setting was applied
+    """
+
+    success = True
+
+    if priority is not None:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            logger.info(f"Running with SCHED_FIFO priority {priority}")
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Unable to set SCHED_FIFO priority {priority}: {e}")
+            success = False
+
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(0, cpus)
+            logger.info(f"Running on CPUs {sorted(cpus)}")
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Unable to set CPU affinity {cpus}: {e}")
+            success = False
+
+    return success
+
+def poll_with_backoff(probe, timeout, initial=0.5, maximum=8.0, factor=2):
+    """
+        Calls probe until it returns something other than None or the timeout passes, sleeping between the calls for
+        a time that starts at initial and grows by factor up to maximum
+
+            Parameters:
+                probe (function) - called with no arguments, returns None while the polled condition is not met
+                timeout (float) - seconds after which polling stops
+                initial (float) - seconds slept after the first unsuccessful call
+                maximum (float) - longest sleep between calls, in seconds
+                factor (float) - growth of the sleep after each unsuccessful call
+
+            Returns:
+                result (object) - the first result of probe other than None, None if the timeout passed
+                elapsed (float) - seconds from the first call to the result or the timeout
+    """
+
+    startTime = time.monotonic()
+    delay = initial
+
+    while True:
+        result = probe()
+        elapsed = time.monotonic() - startTime
+        if result is not None or elapsed >= timeout:
+            return result, elapsed
+
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * factor, maximum)
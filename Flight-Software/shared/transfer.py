@@ -0,0 +1,371 @@
+''' @file transfer.py
+
+@brief Defines the crash safe file transfer used to move the pass files to storage.
+
+@section description_transfer Description
+Defines the functions used by the transfer task to move files from the BBB emmc to the SD card without ever losing a
+file to a power loss. A file on the same filesystem as its destination is renamed. Otherwise it is copied by the
+kernel (copy_file_range, or sendfile) to a temporary file next to the destination, its CRC32 is checked against the
+source, the copy and its directory are fsynced and only then is it renamed into place and the source removed. Each
+verified copy is recorded in a journal on the destination, so a transfer interrupted after the copy but before the
+source was removed only removes the source when it is resumed, without copying the file again.
+- file_crc32
+- fsync_directory
+- copy_file
+- TransferJournal (class)
+- move_file
+- transfer_priority
+- transfer_workers
+- transfer_files
+
+A pass is transferred by a fixed pool of threads, as many as configured for the destination's storage device, so the
+copies of several files overlap. Files are started in priority order: capture timings first, then the compressed
+images, with the raw frames last, so the most valuable data is on the SD card first if the transfer is cut short by
+the post pass timeout.
+
+
+@section libraries_transfer Libraries/Modules
+- python concurrent.futures library
+- python json library
+- python os library
+- python shutil library
+- python threading library
+- python time library
+- python zlib library
+
+
+@section todo_transfer TODO
+- None.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+
+# bytes copied or checksummed per call
+CHUNK_SIZE = 8 * 1024 * 1024
+# suffix of a copy that has not been verified yet
+PARTIAL_SUFFIX = ".part"
+# name of the journal in the destination directory
+JOURNAL_NAME = ".transfer-journal"
+# transfer order of each file extension, lowest first: timings, compressed images, lossless images, raw frames
+TRANSFER_PRIORITIES = {".csv": 1, ".jpg": 2, ".jpeg": 2, ".tiff": 3, ".dat": 4, ".bayer": 4}
+
+def file_crc32(path):
+    """
+        Returns the CRC32 of a file
+
+            Parameters:
+                path (string) - path of the file
+
+            Returns:
+                crc (int) - CRC32 of the file's content
+    """
+
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+
+    return crc
+
+def fsync_directory(path):
+    """
+        Fsyncs a directory, so the files created, renamed or removed in it survive a power loss
+
+            Parameters:
+                path (string) - path of the directory
+
+            Returns:
+                void
+    """
+
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+def copy_file(source, destination):
+    """
+        Copies a file in the kernel, with copy_file_range or sendfile where available, and fsyncs the copy
+
+            Parameters:
+                source (string) - path of the file to copy
+                destination (string) - path of the copy, replaced if it exists
+
+            Returns:
+                bytes (int) - size of the copy
+    """
+
+    with open(source, "rb") as fin, open(destination, "wb") as fout:
+        size = os.fstat(fin.fileno()).st_size
+        copied = 0
+
+        for copy in [getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)]:
+            if copy is None:
+                continue
+            # copy_file_range writes at an explicit offset and leaves the file position alone, sendfile writes at the
+            # file position, so it is moved to where the previous method stopped
+            fout.seek(copied)
+            try:
+                while copied < size:
+                    if copy is os.sendfile:
+                        count = copy(fout.fileno(), fin.fileno(), copied, CHUNK_SIZE)
+                    else:
+                        count = copy(fin.fileno(), fout.fileno(), CHUNK_SIZE, copied, copied)
+                    if count == 0:
+                        break
+                    copied += count
+                break
+            except OSError:
+                # not supported between these filesystems, fall back to the next method from where it stopped
+                continue
+
+        if copied < size:
+            fin.seek(copied)
+            fout.seek(copied)
+            shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+
+        fout.flush()
+        os.fsync(fout.fileno())
+
+        return os.fstat(fout.fileno()).st_size
+
+class TransferJournal:
+    """
+    The record of the files copied and verified, kept next to the destination files
+    ...
+
+    Methods
+    -------
+    verified(source, destination, size, crc):
+        Checks if a file has already been copied and verified
+    record(source, destination, size, crc):
+        Records that a file has been copied and verified
+    clear():
+        Removes the journal once every file has been transferred
+    """
+
+    def __init__(self, directory):
+        """
+            Initialises the TransferJournal class and loads the journal of an interrupted transfer, if any. A line
+            left incomplete by a power loss is ignored
+
+            Parameters:
+                self (TransferJournal) - default class from the Python convention
+                directory (string) - destination directory the journal is kept in
+
+            Returns:
+                void
+        """
+
+        self.path = os.path.join(directory, JOURNAL_NAME)
+        # size and CRC32 of each verified copy, by source path
+        self.entries = {}
+        # the journal is shared by the transfer threads
+        self.lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry["source"]] = entry
+                    except (ValueError, KeyError):
+                        continue
+
+    def verified(self, source, destination, size, crc):
+        """
+            Checks if a file has already been copied and verified, with the source unchanged since
+
+            Parameters:
+                self (TransferJournal) - default class from the Python convention
+                source (string) - path of the file
+                destination (string) - path of its copy
+                size (int) - size of the source
+                crc (int) - CRC32 of the source
+
+            Returns:
+                verified (boolean) - True if the copy does not need to be made again
+        """
+
+        entry = self.entries.get(source)
+
+        return (entry is not None and entry["destination"] == destination and entry["size"] == size and
+                entry["crc"] == crc and os.path.exists(destination) and os.path.getsize(destination) == size)
+
+    def record(self, source, destination, size, crc):
+        """
+            Records that a file has been copied and verified, the record is fsynced before it returns
+
+            Parameters:
+                self (TransferJournal) - default class from the Python convention
+                source (string) - path of the file
+                destination (string) - path of its copy
+                size (int) - size of the file
+                crc (int) - CRC32 of the file
+
+            Returns:
+                void
+        """
+
+        entry = {"source": source, "destination": destination, "size": size, "crc": crc}
+
+        with self.lock:
+            self.entries[source] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """
+            Removes the journal once every file has been transferred
+
+            Parameters:
+                self (TransferJournal) - default class from the Python convention
+
+            Returns:
+                void
+        """
+
+        self.entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def move_file(source, destination, journal, allowRename=True):
+    """
+        Moves a file so that at every point of the move at least one complete copy of it exists. The file is renamed
+        if it is on the same filesystem as the destination, otherwise it is copied, verified and fsynced before the
+        source is removed
+
+            Parameters:
+                source (string) - path of the file to move
+                destination (string) - path to move it to
+                journal (TransferJournal) - journal of the verified copies in the destination directory
+                allowRename (boolean) - False to always copy, even on the same filesystem
+
+            Returns:
+                bytes (int) - size of the file
+                method (string) - "rename", "copy" or "resumed" (the copy had been verified before an interruption)
+    """
+
+    sourceDirectory = os.path.dirname(os.path.abspath(source))
+    destinationDirectory = os.path.dirname(os.path.abspath(destination))
+    size = os.path.getsize(source)
+
+    if allowRename and os.stat(sourceDirectory).st_dev == os.stat(destinationDirectory).st_dev:
+        os.replace(source, destination)
+        fsync_directory(destinationDirectory)
+        if sourceDirectory != destinationDirectory:
+            fsync_directory(sourceDirectory)
+        return size, "rename"
+
+    crc = file_crc32(source)
+
+    if journal.verified(source, destination, size, crc):
+        method = "resumed"
+    else:
+        partial = destination + PARTIAL_SUFFIX
+        copied = copy_file(source, partial)
+        copyCrc = file_crc32(partial)
+        if copied != size or copyCrc != crc:
+            os.remove(partial)
+            raise IOError(f"Copy of {source} failed verification: {copied} bytes with CRC32 {copyCrc:08x}, expected "
+                          f"{size} bytes with CRC32 {crc:08x}")
+
+        os.replace(partial, destination)
+        fsync_directory(destinationDirectory)
+        journal.record(source, destination, size, crc)
+        method = "copy"
+
+    os.remove(source)
+    fsync_directory(sourceDirectory)
+
+    return size, method
+
+def transfer_priority(path):
+    """
+        Returns the transfer order of a file, timings first and raw frames last
+
+            Parameters:
+                path (string) - path of the file
+
+            Returns:
+                priority (int) - the file's priority, lowest transferred first
+    """
+
+    return TRANSFER_PRIORITIES.get(os.path.splitext(path)[1].lower(), max(TRANSFER_PRIORITIES.values()) + 1)
+
+def transfer_workers(destination, workers):
+    """
+        Returns the number of files to transfer at once to a destination, from the number configured for the storage
+        device it is on
+
+            Parameters:
+                destination (string) - destination directory
+                workers (dict) - number of files transferred at once by mount point, "default" for any other device
+
+            Returns:
+                workers (int) - number of transfer threads
+    """
+
+    device = os.stat(destination).st_dev
+
+    for mount, count in workers.items():
+        if mount != "default" and os.path.exists(mount) and os.stat(mount).st_dev == device:
+            return max(1, count)
+
+    return max(1, workers.get("default", 1))
+
+def transfer_files(transfers, journal, workers=1, logger=None, allowRename=True):
+    """
+        Moves files in priority order with a pool of threads. A file that fails to transfer is logged and left where it
+        is, the other files carry on. Logs the throughput of the transfer
+
+            Parameters:
+                transfers (list: tuple) - (source, destination) path of each file
+                journal (TransferJournal) - journal of the verified copies in the destination directory
+                workers (int) - number of files transferred at once
+                logger (object): Object containing information on how to write logs
+                allowRename (boolean) - False to always copy, even on the same filesystem
+
+            Returns:
+                transferred (int) - number of bytes transferred
+                failed (list: string) - sources of the files that could not be transferred
+    """
+
+    transfers = sorted(transfers, key=lambda item: transfer_priority(item[0]))
+    start = time.monotonic()
+    failed = []
+
+    def transfer(source, destination):
+        # logged as each file completes, so the log shows what reached the SD card if the task is killed
+        try:
+            size, method = move_file(source, destination, journal, allowRename)
+        except OSError as e:
+            failed.append(source)
+            if logger is not None:
+                logger.error(f"Failed to transfer {source}: {e}")
+            return 0
+
+        if logger is not None:
+            logger.info(f"Saved {os.path.basename(source)} to {destination} ({size} bytes, {method})")
+        return size
+
+    # the executor starts the files in the order they are submitted, so the priority order holds across the threads
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transfer") as executor:
+        transferred = sum(executor.map(transfer, *zip(*transfers))) if transfers else 0
+
+    elapsed = time.monotonic() - start
+    if logger is not None:
+        rate = transferred / 1000000 / max(elapsed, 1e-6)
+        logger.info(f"Transferred {len(transfers) - len(failed)}/{len(transfers)} files, {transferred} bytes in "
+                    f"{elapsed:.1f} s ({rate:.1f} MB/s) with {workers} threads")
+
+    return transferred, failed
@@ -0,0 +1,69 @@
+'''@file telemetry-export.py
+
+ @brief Defines the telemetry export tool.
+
+ @section description_telemetry_export Description
+ Converts binary telemetry files written by the telemetry service to csv, for downlinked files that need to be read
+ with tools that expect the csv telemetry log.
+ - add_arguments
+ - main (telemetry export)
+
+ @section libraries_telemetry_export Libraries/Modules
+ - python argparse library
+ - python os library
+ - python sys library
+ - shared telemetry library
+
+
+ @section todo_telemetry_export TODO
+ - None.
+'''
+
+import argparse
+import os
+import sys
+sys.path.append('/home/debian')
+from shared.telemetry import export_csv
+
+def add_arguments():
+    """
+    Adds command line arguments to a python argument parser
+    Parameters:
+        void
+    Returns:
+        parser.parse_args() (object): arguments object
+    """
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        'files',
+        nargs='+',
+        help='Binary telemetry files to convert, each is written to a .csv file of the same name')
+
+    parser.add_argument(
+        '--output',
+        dest='output',
+        help='Directory to write the csv files to, defaults to the directory of each input file')
+
+    return parser.parse_args()
+
+def main():
+    """
+    Main code for the telemetry export tool.
+    Steps:
+        Parse arguments
+        Export each binary telemetry file to csv
+    """
+
+    args = add_arguments()
+
+    for binaryFilename in args.files:
+        csvFilename = os.path.splitext(binaryFilename)[0] + ".csv"
+        if args.output:
+            csvFilename = os.path.join(args.output, os.path.basename(csvFilename))
+
+        count = export_csv(binaryFilename, csvFilename)
+        print(f"Exported {count} records from {binaryFilename} to {csvFilename}")
+
+if __name__ == "__main__":
+    main()
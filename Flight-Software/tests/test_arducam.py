@@ -0,0 +1,170 @@
+''' @file test_arducam.py
+
+@brief Defines test for the arducam camera profile.
+
+@section description_test_arducam Description
+Defines the unit tests for the arducam camera profile, run against a config file copied from the flight config. The
+library calls that write the sensor's registers are replaced by a stub pyBBBCAM module, so the tests do not need the
+camera or the built library
+- arducam (fixture)
+- test_profile_apply
+- test_profile_reapplied_after_setup
+
+@section libraries_test_arducam Libraries/Modules
+- python pytest library
+- python json library
+- python logging library
+- python os library
+- python shutil library
+- python sys library
+- python types library
+
+@section todo_test_arducam TODO
+- None.
+'''
+import pytest
+import json
+import logging
+import os
+import shutil
+import sys
+import types
+sys.path.append('/home/debian')
+from shared.config import Config
+
+# flight config.json in the repository, copied by the tests
+REPO_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scheduler", "config.json")
+# library calls of the settings changed by the tests
+SETTER_CALLS = ["py_set_format", "py_set_JPEG_size", "py_set_RAW_size", "py_set_Brightness", "py_set_Contrast"]
+
+@pytest.fixture
+def arducam(monkeypatch):
+    """
+        Imports the arducam task with a stub pyBBBCAM module in place of the hardware library
+
+            Parameters:
+                monkeypatch (fixture): a fixture provided by pytest to replace the library
+
+            Returns:
+                arducam (module) - the arducam task, its pyBBBCAM attribute is the stub
+    """
+
+    stub = types.ModuleType("pyBBBCAM")
+    monkeypatch.setitem(sys.modules, "pyBBBCAM", stub)
+    from Tasks.arducam import arducam
+    # the task may have been imported by an earlier test, with an earlier stub
+    monkeypatch.setattr(arducam, "pyBBBCAM", stub)
+
+    return arducam
+
+def record_setters(arducam, monkeypatch, calls):
+    """
+        Replaces the library's setters with calls that succeed and are recorded
+
+            Parameters:
+                arducam (module) - the arducam task
+                monkeypatch (fixture): a fixture provided by pytest to replace the library calls
+                calls (list: tuple) - receives the name and argument of each call
+
+            Returns:
+                void
+    """
+
+    for name in SETTER_CALLS:
+        monkeypatch.setattr(arducam.pyBBBCAM, name, lambda arg, name=name: calls.append((name, arg)) or 1,
+                            raising=False)
+
+def test_profile_apply(arducam, tmp_path, monkeypatch):
+    """
+        Tests only the changed settings are written to the sensor, the config file is written once with their values
+        and a second run with the same settings writes nothing
+
+            Parameters:
+                arducam (fixture): the arducam task with a stub pyBBBCAM module
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+                monkeypatch (fixture): a fixture provided by pytest to replace the library calls
+
+            Returns:
+                void
+    """
+
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(REPO_CONFIG_PATH, configPath)
+    config = Config(configPath)
+
+    calls = []
+    record_setters(arducam, monkeypatch, calls)
+
+    # config objects written to the file, the writes deferred inside a batch are not counted
+    writes = []
+    writeConfig = config.write_config
+    def record_write(configFull):
+        if config.batchDepth == 0:
+            writes.append(configFull)
+        writeConfig(configFull)
+    monkeypatch.setattr(config, "write_config", record_write)
+
+    properties = config.configFull.cameras.arducam.properties
+    defaults = {name: getattr(properties, name).default for name in arducam.PROFILE_SETTINGS}
+    desired = dict(defaults, brightness=2, contrast=6)
+    profilePath = str(tmp_path / "profile.json")
+    logger = logging.getLogger("Test_Arducam")
+
+    changes = arducam.CameraProfile(defaults, profilePath).apply(desired, config, logger)
+
+    assert changes == {"brightness": 2, "contrast": 6}
+    assert calls == [("py_set_Brightness", 2), ("py_set_Contrast", 6)]
+    # the setters write the config once, at the end of the batch
+    assert len(writes) == 1 and writes[0] is config.configFull
+
+    written = json.load(open(configPath))["cameras"]["arducam"]["properties"]
+    assert written["brightness"] == {"value": 2, "default": defaults["brightness"]}
+    assert written["contrast"] == {"value": 6, "default": defaults["contrast"]}
+    assert json.load(open(profilePath))["settings"]["brightness"] == 2
+    assert sorted(os.listdir(tmp_path)) == ["config.json", "profile.json"]
+
+    calls.clear()
+    assert arducam.CameraProfile(defaults, profilePath).apply(desired, Config(configPath), logger) == {}
+    assert calls == []
+
+def test_profile_reapplied_after_setup(arducam, tmp_path, monkeypatch):
+    """
+        Tests a run of the task in the same boot as an earlier one writes its settings again after the camera setup
+        has put the sensor back at its defaults, rather than trusting the cache
+
+            Parameters:
+                arducam (fixture): the arducam task with a stub pyBBBCAM module
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+                monkeypatch (fixture): a fixture provided by pytest to replace the library calls
+
+            Returns:
+                void
+    """
+
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(REPO_CONFIG_PATH, configPath)
+    profilePath = str(tmp_path / "profile.json")
+    logger = logging.getLogger("Test_Arducam")
+
+    calls = []
+    record_setters(arducam, monkeypatch, calls)
+    def setup():
+        calls.append(("py_setup",))
+        return types.SimpleNamespace(status=1, error="")
+    monkeypatch.setattr(arducam.pyBBBCAM, "py_setup", setup, raising=False)
+    # the task captures nothing in these runs
+    monkeypatch.setattr(arducam, "capture_burst", lambda times, img_type, logger: [])
+    monkeypatch.setattr(arducam.CaptureTimingLog, "write", lambda self, logger: None)
+    monkeypatch.setattr(arducam.subprocess, "Popen", lambda *args, **kwargs: None)
+    monkeypatch.setattr(arducam, "create_logger", lambda name, path: logger)
+    monkeypatch.setattr(arducam, "Config", lambda: Config(configPath))
+    monkeypatch.setattr(arducam, "PROFILE_PATH", profilePath)
+    monkeypatch.setattr(sys, "argv", ["arducam.py", "-br", "2", "-c", "6"])
+
+    arducam.main()
+    first = list(calls)
+    calls.clear()
+    arducam.main()
+
+    # each run sets the camera up, then writes the settings that differ from the sensor's defaults
+    assert first == calls == [("py_setup",), ("py_set_Brightness", 2), ("py_set_Contrast", 6)]
@@ -0,0 +1,75 @@
+''' @file test_bayer.py
+
+@brief Defines test for the raw Bayer container and debayering.
+
+@section description_test_bayer Description
+Defines the unit tests for the raw Bayer container and debayering
+- test_raw_round_trip
+- test_debayer
+
+@section libraries_test_bayer Libraries/Modules
+- python pytest library
+- python sys library
+- python numpy library
+
+@section todo_test_bayer TODO
+- None.
+'''
+import pytest
+import numpy as np
+import sys
+sys.path.append('/home/debian')
+from shared.bayer import bayer_format, write_raw, read_raw, debayer
+
+def test_raw_round_trip(tmp_path):
+    """
+        Tests a raw frame and its metadata are read back as written, and that non Bayer formats are refused
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    filename = str(tmp_path / "basler-1.bayer")
+    pixels = np.arange(6 * 8, dtype=np.uint16).reshape(6, 8) * 80
+
+    size = write_raw(filename, pixels, "BayerRG12", {"frame": 1, "trigger_ns": 1636329600000000000})
+    readPixels, metadata = read_raw(filename)
+
+    assert np.array_equal(readPixels, pixels)
+    assert metadata["frame"] == 1 and metadata["trigger_ns"] == 1636329600000000000
+    assert (metadata["pattern"], metadata["bits"], metadata["width"], metadata["height"]) == ("RG", 12, 8, 6)
+    assert size == (tmp_path / "basler-1.bayer").stat().st_size
+
+    assert bayer_format("BayerGB8") == ("GB", 8)
+    for pixelFormat in ["RGB8packed", "BayerRG12Packed", "Mono8"]:
+        with pytest.raises(ValueError):
+            write_raw(filename, pixels, pixelFormat)
+
+def test_debayer():
+    """
+        Tests a uniformly coloured scene is debayered to that colour everywhere, including the frame edges, and that
+        debayering in strips gives the same image as the whole frame at once
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    # RGGB mosaic of a uniform (red, green, blue) = (4095, 2048, 0) scene
+    pixels = np.zeros((10, 12), dtype=np.uint16)
+    pixels[0::2, 0::2] = 4095
+    pixels[0::2, 1::2] = 2048
+    pixels[1::2, 0::2] = 2048
+
+    image = debayer(pixels, "RG", 12)
+
+    assert image.shape == (10, 12, 3) and image.dtype == np.uint8
+    assert np.all(image == [255, 128, 0])
+
+    noise = np.random.default_rng(1).integers(0, 4096, size=(37, 20), dtype=np.uint16)
+    assert np.array_equal(debayer(noise, "GB", 12, rows=4), debayer(noise, "GB", 12, rows=64))
@@ -0,0 +1,105 @@
+''' @file test_capture_timing.py
+
+@brief Defines test for the capture timing log.
+
+@section description_test_capture_timing Description
+Defines the unit tests for the capture timing log
+- test_timing_table
+- test_timing_summary
+- test_nearest_scheduled
+
+@section libraries_test_capture_timing Libraries/Modules
+- python pytest library
+- python sys library
+- python csv library
+- python logging library
+
+@section todo_test_capture_timing TODO
+- None.
+'''
+import pytest
+import csv
+import logging
+import sys
+sys.path.append('/home/debian')
+from shared.capture_timing import CaptureTimingLog, TIMING_HEADER, nearest_scheduled
+
+START = 1636329600000000000
+
+def test_timing_table(tmp_path):
+    """
+        Tests the timing table has one row per recorded frame, with the trigger error and landing latency, and an empty
+        landing time for a frame that never landed
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    filename = str(tmp_path / "pass-1-timings.csv")
+    timingLog = CaptureTimingLog(filename, "Tau")
+    timingLog.record(0, START, START + 150000, START + 2500000000)
+    timingLog.record(1, START + 10 ** 9, START + 10 ** 9 + 80000, None, 20)
+    timingLog.write()
+
+    with open(filename, newline="") as f:
+        rows = list(csv.reader(f))
+
+    assert rows[0] == TIMING_HEADER
+    assert rows[1] == ["0", str(START), str(START + 150000), "150.0", str(START + 2500000000), "2499.850", "0"]
+    assert rows[2][3:] == ["80.0", "", "", "20"]
+    assert len(rows) == 3
+
+def test_timing_summary(tmp_path, caplog):
+    """
+        Tests the summary gives the trigger error percentiles and is logged once the table is written
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+                caplog (fixture): a fixture provided by pytest capturing the logs
+
+            Returns:
+                void
+    """
+
+    timingLog = CaptureTimingLog(str(tmp_path / "basler-timings.csv"), "Basler")
+    for frame in range(100):
+        # trigger errors of 1 to 100 us, each frame landing 1 ms after its trigger
+        trigger = START + frame * 10 ** 9 + (frame + 1) * 1000
+        timingLog.record(frame, START + frame * 10 ** 9, trigger, trigger + 1000000, frame % 2)
+
+    summary = timingLog.summary()
+
+    assert summary["frames"] == 100 and summary["landed"] == 100 and summary["retries"] == 50
+    assert summary["trigger_error_us"][50] == pytest.approx(50.5)
+    assert summary["trigger_error_us"][99] == pytest.approx(99.01)
+    assert summary["trigger_error_us"]["max"] == 100
+    assert summary["landing_latency_ms"]["max"] == pytest.approx(1)
+
+    logger = logging.getLogger("Test_Capture_Timing")
+    with caplog.at_level(logging.INFO, logger="Test_Capture_Timing"):
+        timingLog.write(logger)
+
+    assert "Basler capture timing: 100/100 frames landed, 50 retries, trigger error (us) p50 50.5" in caplog.text
+
+def test_nearest_scheduled():
+    """
+        Tests frames are matched to the scheduled time nearest their capture time, including frames captured before
+        the first or after the last scheduled time
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    scheduledTimes = [START, START + 10 ** 9, START + 3 * 10 ** 9]
+
+    assert nearest_scheduled(scheduledTimes, START - 5000) == 0
+    assert nearest_scheduled(scheduledTimes, START + 120000) == 0
+    assert nearest_scheduled(scheduledTimes, START + 10 ** 9 - 120000) == 1
+    assert nearest_scheduled(scheduledTimes, START + 2 * 10 ** 9 + 1) == 2
+    assert nearest_scheduled(scheduledTimes, START + 9 * 10 ** 9) == 2
@@ -8,6 +8,9 @@ Defines the unit tests for the config class methods
 - test_get_pass_duration
 - test_write_timestamps
 - test_recentpasstimestamp
+- test_batch
+- test_refresh
+- test_concurrent_writes
 
 
 @section libraries_config Libraries/Modules
@@ -15,6 +18,7 @@ Defines the unit tests for the config class methods
 - python sys library
 - python json library
 - python datetime library
+- python threading library
 
 
 
@@ -29,9 +33,14 @@ import json
 import datetime
 import os
 import sys
+import shutil
+import threading
 sys.path.append('/home/debian')
 from shared.config import Config
 
+# flight config.json in the repository, copied by the tests that use a temporary config file
+REPO_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scheduler", "config.json")
+
 def test_get_config():
     """
            Tests the initialisation of the config object, i.e. the get_config function, by checking the contents of the
@@ -777,6 +786,123 @@ def test_set_operation_type():
 
     assert "UPDATEDVALUE" == retrievedvalue
 
+def test_batch(tmp_path):
+    """
+           Tests the batch function by calling several setters inside a batch block and checking config.json is only
+           rewritten at the end of the block, with all the changes
+           Parameters:
+               tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+           Returns:
+               void
+    """
+
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(REPO_CONFIG_PATH, configPath)
+    config = Config(configPath)
+
+    with config.batch():
+        config.set_telemetry_cadence(30)
+        config.set_operation_type("CALIBRATION")
+        config.write_timestamps(100, 200)
 
+        # nothing has been written yet
+        assert Config(configPath).configFull.general.next_pass_type == "PRIMARY"
+        assert config.has_changed() is False
 
+    retrieved = Config(configPath).configFull
+    assert retrieved.sensors.collection_cadence == 30
+    assert retrieved.general.next_pass_type == "CALIBRATION"
+    assert retrieved.general.pass_start_timestamp == 100
+    assert retrieved.general.pass_end_timestamp == 200
+    assert [name for name, sensor in retrieved.sensors.sensor_items()][0] == "T_TEMP"
+    assert retrieved.sensors.T_TEMP.pin == "P9_33"
+    assert retrieved.sensors.T_CUR.conversion == "current"
+
+    # the write was atomic, no temporary file is left behind
+    assert os.listdir(tmp_path) == ["config.json"]
+
+def test_refresh(tmp_path):
+    """
+           Tests the has_changed and refresh functions by changing the config from a second Config object, as another
+           process would, and checking the first object only re-reads the file once it has changed
+           Parameters:
+               tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+           Returns:
+               void
+    """
+
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(REPO_CONFIG_PATH, configPath)
+    reader = Config(configPath)
+    writer = Config(configPath)
+
+    assert reader.has_changed() is False
+    assert reader.refresh() is False
+
+    writer.enter_safe_mode()
+
+    assert writer.has_changed() is False  # the writer already holds the new config
+    assert reader.has_changed() is True
+    assert reader.refresh() is True
+    assert reader.configFull.general.safe_mode is True
+    assert reader.has_changed() is False
+
+    # a file caught mid-edit keeps the config in memory and is read again on the next refresh
+    with open(configPath, "r") as f:
+        content = f.read()
+    with open(configPath, "w") as f:
+        f.write(content[:100])
+
+    with pytest.raises(ValueError):
+        reader.refresh()
+    assert reader.configFull.general.safe_mode is True
+    assert reader.has_changed() is True
+
+    with open(configPath, "w") as f:
+        f.write(content.replace('"collection_cadence": 10', '"collection_cadence": 300'))
+
+    assert reader.refresh() is True
+    assert reader.configFull.sensors.collection_cadence == 300
+
+    # setting the cadence it already has does not rewrite the file
+    signature = reader.fileSignature
+    reader.set_telemetry_cadence(300)
+    assert reader.fileSignature == signature
+
+def test_concurrent_writes(tmp_path):
+    """
+           Tests config objects writing the same config.json at the same time, as the services and the imaging tasks
+           do, always leave a complete file with the permissions of the original and no temporary file behind
+           Parameters:
+               tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+           Returns:
+               void
+    """
 
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(REPO_CONFIG_PATH, configPath)
+    os.chmod(configPath, 0o644)
+    errors = []
+
+    def write(cadence):
+        config = Config(configPath)
+        try:
+            for i in range(20):
+                config.set_telemetry_cadence(cadence * 100 + i)
+                Config(configPath)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert Config(configPath).configFull.sensors.collection_cadence % 100 == 19
+    assert os.listdir(tmp_path) == ["config.json"]
+    assert os.stat(configPath).st_mode & 0o777 == 0o644
@@ -0,0 +1,99 @@
+''' @file test_events.py
+
+@brief Defines test for the timer heap and child watcher used by the scheduler service.
+
+@section description_test_events Description
+Defines the unit tests for the event classes
+- test_timer_heap_order
+- test_timer_heap_cancel
+- test_child_watcher
+
+@section libraries_test_events Libraries/Modules
+- python pytest library
+- python sys library
+- python subprocess library
+- python time library
+
+@section todo_test_events TODO
+- None.
+'''
+import pytest
+import subprocess
+import time
+import sys
+sys.path.append('/home/debian')
+from shared.events import TimerHeap, ChildWatcher
+
+def test_timer_heap_order():
+    """
+        Tests that timers are returned in deadline order and only once they are due
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    timers = TimerHeap()
+    timers.schedule(30, "third")
+    timers.schedule(10, "first")
+    timers.schedule(20, "second")
+
+    assert timers.next_deadline() == 10
+    assert timers.pop_due(5) == []
+
+    due = timers.pop_due(20)
+    assert [timer.name for timer in due] == ["first", "second"]
+    assert timers.next_deadline() == 30
+    assert len(timers) == 1
+
+def test_timer_heap_cancel():
+    """
+        Tests that cancelled timers are never returned and do not count towards the next deadline
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    timers = TimerHeap()
+    timers.schedule(10, "pass boundary")
+    timers.schedule(15, "task delay", data=4)
+    timers.schedule(20, "pass boundary")
+
+    timers.cancel("pass boundary")
+
+    assert timers.next_deadline() == 15
+    due = timers.pop_due(100)
+    assert len(due) == 1
+    assert due[0].data == 4
+    assert timers.next_deadline() is None
+
+def test_child_watcher():
+    """
+        Tests that the child watcher times out when nothing happens and wakes early when a child process exits
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    watcher = ChildWatcher()
+
+    try:
+        assert watcher.wait(0.1) is False
+
+        process = subprocess.Popen(["sleep", "0.2"])
+        startTime = time.time()
+        woken = watcher.wait(10)
+
+        assert woken is True
+        assert time.time() - startTime < 5
+        assert process.wait(timeout=1) == 0
+    finally:
+        watcher.close()
@@ -0,0 +1,77 @@
+''' @file test_faults.py
+
+@brief Defines test for the fault manager used by the telemetry service.
+
+@section description_test_faults Description
+Defines the unit tests for the fault manager
+- test_trip_once
+- test_hysteresis
+
+@section libraries_test_faults Libraries/Modules
+- python pytest library
+- python sys library
+
+@section todo_test_faults TODO
+- None.
+'''
+import pytest
+import sys
+sys.path.append('/home/debian')
+from shared.faults import FaultManager
+
+def test_trip_once():
+    """
+        Tests an input trips after the configured number of consecutive error ticks, and is only reported on the tick
+        it trips however long the error persists
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    faults = FaultManager(["T_TEMP", "B_CUR", "LATCHUP"], [3, 3, 1], clear_count=2)
+
+    assert faults.update([True, False, False], [False, True, True], 10) == []
+    assert faults.update([True, False, False], [False, True, True], 20) == []
+    # an interrupted run of errors starts counting again
+    assert faults.update([False, False, False], [False, True, True], 30) == []
+    assert faults.update([True, True, False], [False, False, True], 40) == []
+    assert faults.update([True, True, True], [False, False, False], 50) == ["LATCHUP"]
+    assert faults.update([True, True, True], [False, False, False], 60) == ["T_TEMP", "B_CUR"]
+
+    for i in range(10):
+        assert faults.update([True, True, True], [False, False, False]) == []
+
+    assert faults.active() == ["T_TEMP", "B_CUR", "LATCHUP"]
+    assert faults.lastTrip == (60, ["T_TEMP", "B_CUR"])
+
+def test_hysteresis():
+    """
+        Tests a tripped input only clears after the configured number of consecutive clear ticks, and can then trip
+        again
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    faults = FaultManager(["T_TEMP"], trip_counts=1, clear_count=3)
+
+    assert faults.update([True], [False]) == ["T_TEMP"]
+
+    # warning level readings neither trip nor clear the fault
+    faults.update([False], [True])
+    faults.update([False], [True])
+    faults.update([False], [False])
+    assert faults.active() == ["T_TEMP"]
+
+    faults.update([False], [True])
+    faults.update([False], [True])
+    faults.update([False], [True])
+    assert faults.active() == []
+
+    assert faults.update([True], [False]) == ["T_TEMP"]
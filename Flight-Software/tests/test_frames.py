@@ -0,0 +1,93 @@
+''' @file test_frames.py
+
+@brief Defines test for the frame completion channel.
+
+@section description_test_frames Description
+Defines the unit tests for the frame completion channel, writing to the fifo as the capture program would
+- test_wait_frame
+- test_wait_frame_timeout
+
+@section libraries_test_frames Libraries/Modules
+- python pytest library
+- python sys library
+- python os library
+- python threading library
+- python time library
+
+@section todo_test_frames TODO
+- None.
+'''
+import pytest
+import os
+import threading
+import time
+import sys
+sys.path.append('/home/debian')
+from shared.frames import FrameChannel
+
+def test_wait_frame(tmp_path):
+    """
+        Tests frames signalled on the fifo are returned by wait_frame, including a frame whose line arrives in two
+        writes and a frame signalled while the controller is waiting
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    path = str(tmp_path / "frames.fifo")
+
+    with FrameChannel(path) as channel:
+        writer = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        os.write(writer, b"0 1636329600000000000 12 163840\n1 16363296")
+        os.write(writer, b"10000000000 512 163840\n")
+
+        event = channel.wait_frame(1, 1)
+        assert event.index == 1
+        assert event.timestamp == 1636329610000000000
+        assert event.ppsTimestamp == 512
+        assert event.bytes == 163840
+        # the event of frame 0 was never waited for and is discarded
+        assert channel.events == {}
+
+        timer = threading.Timer(0.1, os.write, [writer, b"2 1636329620000000000 3 163840\n"])
+        timer.start()
+        startTime = time.time()
+        event = channel.wait_frame(2, 5)
+        timer.join()
+
+        assert event.index == 2
+        assert time.time() - startTime < 1
+
+        os.close(writer)
+
+    assert not os.path.exists(path)
+
+def test_wait_frame_timeout(tmp_path):
+    """
+        Tests wait_frame returns None once the timeout passes, including after the capture program has closed the
+        fifo
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    path = str(tmp_path / "frames.fifo")
+
+    with FrameChannel(path) as channel:
+        assert channel.wait_frame(0, 0.1) is None
+
+        writer = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        os.write(writer, b"0 1636329600000000000 0 163840\n")
+        os.close(writer)
+
+        assert channel.wait_frame(0, 0.1).index == 0
+
+        startTime = time.time()
+        assert channel.wait_frame(1, 0.2) is None
+        assert time.time() - startTime >= 0.2
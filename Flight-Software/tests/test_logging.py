@@ -5,6 +5,9 @@
 @section description_test_logging Description
 Defines the unit test for the create_logger function and checks its enabled logging levels and creates a test log
 - test_create_logger
+- test_streaming_csv_writer
+- test_streaming_csv_writer_rotation
+- test_rotating_log_writer_abstract
 
 
 @section libraries_logger Libraries/Modules
@@ -24,8 +27,9 @@ import pytest
 import logging
 import sys
 import os
+import csv
 sys.path.append('/home/debian')
-from shared.logging import create_logger
+from shared.logging import create_logger, StreamingCSVWriter, RotatingLogWriter
 
 def test_create_logger(caplog):
     """
@@ -58,4 +62,90 @@ def test_create_logger(caplog):
     logger.info("testing logger") # create a log
     assert caplog.records[0].message == "testing logger"
 
-    os.remove("testlog.log")
\ No newline at end of file
+    os.remove("testlog.log")
+
+def test_streaming_csv_writer(tmp_path):
+    """
+        Tests the StreamingCSVWriter buffers rows until flush_rows are waiting, appends them after the header and
+        repairs an existing file with an unterminated last line
+
+        Parameters:
+            tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+        Returns:
+            void
+    """
+
+    filename = str(tmp_path / "telemetry.csv")
+    header = ["Date", "T_TEMP", "T_TEMP_FLAG"]
+
+    # existing file written without a trailing newline
+    with open(filename, "w") as f:
+        f.write("Date,T_TEMP,T_TEMP_FLAG")
+
+    writer = StreamingCSVWriter(filename, header, flush_rows=2, flush_interval=1000)
+    writer.append(["2021-11-08", 25.0, 20])
+
+    with open(filename, newline="") as f:
+        assert list(csv.reader(f)) == [header]  # still buffered
+
+    writer.append(["2021-11-09", 26.0, 30])
+    writer.append(["2021-11-10", 27.0, 40])
+    writer.close()
+
+    with open(filename, newline="") as f:
+        rows = list(csv.reader(f))
+
+    assert rows == [header, ["2021-11-08", "25.0", "20"], ["2021-11-09", "26.0", "30"], ["2021-11-10", "27.0", "40"]]
+
+def test_streaming_csv_writer_rotation(tmp_path):
+    """
+        Tests the StreamingCSVWriter rotates the file when it reaches max_bytes or has a different header, and that
+        each new file starts with the header
+
+        Parameters:
+            tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+        Returns:
+            void
+    """
+
+    filename = str(tmp_path / "telemetry.csv")
+    header = ["Date", "T_TEMP", "T_TEMP_FLAG"]
+
+    # existing file with an out of date header is rotated away
+    with open(filename, "w") as f:
+        f.write("Date,T_TEMP\n")
+
+    with StreamingCSVWriter(filename, header, flush_rows=1, max_bytes=50) as writer:
+        for i in range(6):
+            writer.append(["2021-11-08", i, 20])
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) > 2
+    assert "telemetry.csv" in files
+
+    rowCount = 0
+    for name in files:
+        with open(tmp_path / name, newline="") as f:
+            rows = list(csv.reader(f))
+        if rows[0] == ["Date", "T_TEMP"]:
+            continue
+        assert rows[0] == header
+        rowCount += len(rows) - 1
+
+    assert rowCount == 6
+
+def test_rotating_log_writer_abstract(tmp_path):
+    """
+        Tests that the RotatingLogWriter base class can not be used without a format's header and row hooks
+
+        Parameters:
+            tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+        Returns:
+            void
+    """
+
+    with pytest.raises(TypeError):
+        RotatingLogWriter(str(tmp_path / "log"))
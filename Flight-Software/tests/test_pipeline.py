@@ -0,0 +1,129 @@
+''' @file test_pipeline.py
+
+@brief Defines test for the frame pipeline.
+
+@section description_test_pipeline Description
+Defines the unit tests for the frame pipeline
+- test_pipeline_handles_frames
+- test_pipeline_back_pressure
+- test_buffer_pool
+
+@section libraries_test_pipeline Libraries/Modules
+- python pytest library
+- python sys library
+- python threading library
+- python numpy library
+
+@section todo_test_pipeline TODO
+- None.
+'''
+import pytest
+import threading
+import numpy as np
+import sys
+sys.path.append('/home/debian')
+from shared.pipeline import FramePipeline, BufferPool
+
+def test_pipeline_handles_frames():
+    """
+        Tests every submitted frame is handled once the pipeline is closed, and a frame whose handler fails is recorded
+        without stopping the workers
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    handled = {}
+
+    def handler(frame, data):
+        if frame == 3:
+            raise OSError("disk full")
+        handled[frame] = data
+
+    with FramePipeline(handler, workers=3, depth=2) as pipeline:
+        for frame in range(1, 7):
+            pipeline.submit(frame, frame * 10)
+
+    metrics = pipeline.close()
+
+    assert handled == {1: 10, 2: 20, 4: 40, 5: 50, 6: 60}
+    assert [m.frame for m in metrics] == [1, 2, 3, 4, 5, 6]
+    assert metrics[2].error == "OSError: disk full" and metrics[2].finished is None
+    assert all(m.submitted <= m.started <= m.finished for m in metrics if m.frame != 3)
+
+def test_pipeline_back_pressure():
+    """
+        Tests submit blocks once the queue is full and carries on once a worker frees a slot
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    release = threading.Event()
+    pipeline = FramePipeline(lambda frame, data: release.wait(), workers=1, depth=1)
+
+    # the worker takes the first frame and blocks on it, the second fills the queue
+    pipeline.submit(1, None)
+    pipeline.submit(2, None)
+
+    blocked = threading.Thread(target=pipeline.submit, args=(3, None))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join(1)
+    assert not blocked.is_alive()
+
+    metrics = pipeline.close()
+    assert metrics[2].blocked >= 150000000
+    assert all(m.finished is not None for m in metrics)
+
+def test_buffer_pool():
+    """
+        Tests frames handed to the pipeline in pooled buffers are written from those buffers, each buffer is reused
+        once its frame is handled and acquire blocks while every buffer is in use
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    pool = BufferPool(2, 4 * 6 * 3)
+    written = {}
+
+    with pytest.raises(ValueError):
+        pool.acquire((5, 6, 3), np.uint8)
+
+    with FramePipeline(lambda frame, data: written.update({frame: data.copy()}), workers=1, depth=1,
+                       release=pool.release) as pipeline:
+        for frame in range(5):
+            # 12 bit raw frames and 8 bit RGB frames share the same buffers
+            shape, dtype = ((4, 6), np.uint16) if frame % 2 else ((4, 6, 3), np.uint8)
+            img = pool.acquire(shape, dtype)
+            np.copyto(img, np.full(shape, frame, dtype=dtype))
+            pipeline.submit(frame, img)
+
+    assert [written[frame].flat[0] for frame in range(5)] == [0, 1, 2, 3, 4]
+    assert written[1].dtype == np.uint16 and written[2].shape == (4, 6, 3)
+    assert len(pool.free) == 2
+
+    first = pool.acquire((4, 6), np.uint16)
+    pool.acquire((4, 6), np.uint16)
+
+    blocked = threading.Thread(target=pool.acquire, args=((4, 6), np.uint16))
+    blocked.start()
+    blocked.join(0.1)
+    assert blocked.is_alive()
+
+    pool.release(first)
+    blocked.join(1)
+    assert not blocked.is_alive()
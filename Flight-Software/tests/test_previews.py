@@ -0,0 +1,105 @@
+''' @file test_previews.py
+
+@brief Defines test for the preview functions.
+
+@section description_test_previews Description
+Defines the unit tests for the downscaling and normalisation of the previews
+- test_downscale
+- test_normalize
+- test_needs_preview
+
+@section libraries_test_previews Libraries/Modules
+- python pytest library
+- python sys library
+- python os library
+- python numpy library
+
+@section todo_test_previews TODO
+- None.
+'''
+import pytest
+import os
+import numpy as np
+import sys
+sys.path.append('/home/debian')
+from shared.previews import preview_path, needs_preview, downscale, superpixel, normalize
+
+def test_downscale():
+    """
+        Tests images are downscaled by block averages to fit the preview size, and raw Bayer frames are reduced to one
+        RGB pixel per cell
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    image = np.arange(512 * 640, dtype=np.uint16).reshape(512, 640)
+    small = downscale(image, 160)
+
+    assert small.shape == (128, 160)
+    assert small[0, 0] == pytest.approx(image[:4, :4].mean())
+
+    # an odd sized RGB image, the last row and column that do not fill a block are dropped
+    rgb = np.ones((21, 31, 3), dtype=np.uint8)
+    assert downscale(rgb, 10).shape == (5, 7, 3)
+    assert downscale(rgb, 40).shape == (21, 31, 3)
+
+    # BGGR mosaic of a (red, green, blue) = (300, 200, 100) scene, with the two greens different
+    pixels = np.zeros((4, 6), dtype=np.uint16)
+    pixels[0::2, 0::2] = 100
+    pixels[0::2, 1::2] = 190
+    pixels[1::2, 0::2] = 210
+    pixels[1::2, 1::2] = 300
+    assert np.all(superpixel(pixels, "BG") == [300, 200, 100])
+
+def test_normalize():
+    """
+        Tests images are scaled to 8 bits by their bit depth, or stretched between percentiles without one
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    assert np.array_equal(normalize(np.array([0, 2048, 4095]), 12), [0, 128, 255])
+
+    # a thermal frame using a narrow band of its range is stretched to the full 8 bits
+    frame = np.linspace(8000, 8100, 101)
+    stretched = normalize(frame, percentiles=(0, 100))
+    assert stretched.dtype == np.uint8
+    assert stretched[0] == 0 and stretched[-1] == 255 and stretched[50] in (127, 128)
+
+    # a uniform frame does not divide by zero
+    assert np.all(normalize(np.full((4, 4), 8000.0)) == 0)
+
+def test_needs_preview(tmp_path):
+    """
+        Tests a preview is only needed when it does not exist or is older than its frame
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    source = tmp_path / "pass-1-file-3.dat"
+    source.write_bytes(b"frame")
+    preview = preview_path(str(source))
+
+    assert preview == str(tmp_path / "previews" / "pass-1-file-3.jpg")
+    assert needs_preview(str(source))
+
+    os.makedirs(os.path.dirname(preview))
+    with open(preview, "wb") as f:
+        f.write(b"jpeg")
+    os.utime(source, (1000, 1000))
+    assert not needs_preview(str(source))
+
+    os.utime(source, (os.path.getmtime(preview) + 10,) * 2)
+    assert needs_preview(str(source))
@@ -0,0 +1,139 @@
+''' @file test_sampling.py
+
+@brief Defines test for the ADC sampling engine.
+
+@section description_test_sampling Description
+Defines the unit tests for the ADC sampler, using the mock ADC backend
+- test_conversions
+- test_sample_statistics
+- test_failed_pin
+- test_sensor_table
+
+@section libraries_test_sampling Libraries/Modules
+- python pytest library
+- python sys library
+- python numpy library
+
+@section todo_test_sampling TODO
+- None.
+'''
+import pytest
+import numpy as np
+import sys
+sys.path.append('/home/debian')
+from shared.sampling import ADCSampler, MockADC, SensorTable, temp_conversion, curr_conversion
+from shared.config import SensorsConfig
+
+PINS = ["P9_33", "P9_36", "P9_39"]
+CONVERSIONS = ["temperature", "temperature", "current"]
+
+def test_conversions():
+    """
+        Tests the conversions give the same result on arrays as on single readings
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    pinValues = np.array([0.2, 0.5, 0.8])
+
+    assert np.allclose(temp_conversion(pinValues), [temp_conversion(value) for value in pinValues])
+    assert np.allclose(curr_conversion(pinValues), [curr_conversion(value) for value in pinValues])
+    assert curr_conversion(0.5) == pytest.approx(0.5 * 1.8 * 0.4 + 0.493)
+
+def test_sample_statistics():
+    """
+        Tests a sample reads every pin oversample times and reports the statistics of the physical readings
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    backend = MockADC({"P9_33": 0.5, "P9_36": 0.6, "P9_39": 0.5}, noise=0.01, seed=1)
+    sampler = ADCSampler(PINS, CONVERSIONS, oversample=16, backend=backend)
+
+    sample = sampler.sample()
+
+    assert backend.reads == 3 * 16
+    assert sample.raw == pytest.approx([0.5, 0.6, 0.5], abs=0.01)
+    assert sample.mean[2] == pytest.approx(curr_conversion(0.5), abs=0.01)
+    assert np.all(sample.min <= sample.mean) and np.all(sample.mean <= sample.max)
+    assert np.all(sample.std > 0)
+
+    # without noise every reading of a pin is the same
+    sampler = ADCSampler(PINS, CONVERSIONS, oversample=4, backend=MockADC({"P9_33": 0.5}))
+    sample = sampler.sample()
+
+    assert sample.mean[0] == pytest.approx(temp_conversion(0.5))
+    assert np.all(sample.std == 0)
+
+def test_failed_pin():
+    """
+        Tests a pin that can not be read gives NaN readings without affecting the other pins
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    backend = MockADC({"P9_36": RuntimeError("read failed")})
+    sampler = ADCSampler(PINS, CONVERSIONS, oversample=4, backend=backend)
+
+    sample = sampler.sample()
+
+    assert np.isnan(sample.raw[1]) and np.isnan(sample.mean[1]) and np.isnan(sample.std[1])
+    assert sample.raw[0] == 0.5 and sample.raw[2] == 0.5
+    # the failed pin is only tried once per burst
+    assert backend.reads == 2 * 4 + 1
+
+    with pytest.raises(ValueError):
+        ADCSampler(PINS, ["temperature", "pressure", "current"], backend=MockADC())
+
+def test_sensor_table():
+    """
+        Tests the sensor table loads the sensors from the config in order and flags a sample against the thresholds
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    sensorsConfig = SensorsConfig.create_from_json({
+        "collection_cadence": 10,
+        "T_TEMP": {"warn_threshold": 0.4, "error_threshold": 0.6, "pin": "P9_33", "conversion": "temperature",
+                   "mitigation": "safe_mode"},
+        "T_CUR": {"warn_threshold": 0.4, "error_threshold": 0.6, "pin": "P9_39", "conversion": "current",
+                  "mitigation": "none"},
+        "X_TEMP": {"warn_threshold": 0.4, "error_threshold": 0.6, "pin": "P9_35", "conversion": "temperature"}
+    })
+
+    table = SensorTable.from_config(sensorsConfig)
+
+    assert table.names == ["T_TEMP", "T_CUR", "X_TEMP"]
+    assert list(table.safeMode) == [True, False, True]
+
+    flags = table.log_flags(np.array([0.3, 0.5, np.nan]))
+    assert list(flags) == [table.INFO, table.WARNING, 0]
+
+    sampler = table.create_sampler(oversample=2, backend=MockADC({"P9_33": 0.7, "P9_39": 0.7, "P9_35": 0.7}))
+    assert list(table.log_flags(sampler.sample().raw)) == [table.ERROR] * 3
+
+    # thresholds follow the config without changing the sensors
+    sensorsConfig.T_TEMP.error_threshold = 0.8
+    table.update_thresholds(sensorsConfig)
+    assert list(table.log_flags(np.array([0.7, 0.7, 0.7]))) == [table.WARNING, table.ERROR, table.ERROR]
+
+    # a config without pins can not be sampled
+    with pytest.raises(ValueError):
+        SensorTable.from_config(SensorsConfig.create_from_json({
+            "collection_cadence": 10, "T_TEMP": {"warn_threshold": 10, "error_threshold": 20}}))
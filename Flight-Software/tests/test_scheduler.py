@@ -9,6 +9,7 @@ Defines the unit tests for the scheduler service functions
 - test_pass_fully_completed
 - test_check_subprocesses_status
 - test_kill_subprocess
+- test_refresh_config
 
 @section libraries_scheduler Libraries/Modules
 - python pytest library
@@ -28,11 +29,13 @@ import time
 import os
 import logging
 import json
+import shutil
 import sys
 sys.path.append('/home/debian')
 from shared.config import Config
 from shared.tasks import Tasks
 from shared.logging import create_logger
+from shared.events import TimerHeap
 import Scheduler.scheduler
 
 def test_if_pass_started():
@@ -1300,3 +1303,39 @@ def test_safe_mode(caplog):
 
 
     assert "SCHEDULER IN SAFE MODE" in data_into_list[-2]
+
+def test_refresh_config(tmp_path):
+    """
+        tests the refresh_config function by changing the config from a second Config object, as the telemetry service
+        would, and checking the scheduler's config and pass boundary timers follow it
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    configPath = str(tmp_path / "config.json")
+    shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scheduler", "config.json"),
+                    configPath)
+    logger = logging.getLogger("Test_Scheduler")
+    config = Config(configPath)
+    timers = TimerHeap()
+    current_date = 1000
+
+    assert Scheduler.scheduler.refresh_config(config, timers, current_date, logger) is False
+    assert timers.next_deadline() is None
+
+    writer = Config(configPath)
+    with writer.batch():
+        writer.enter_safe_mode()
+        writer.write_timestamps(2000, 2150)
+
+    assert Scheduler.scheduler.refresh_config(config, timers, current_date, logger) is True
+    assert config.configFull.general.safe_mode is True
+    assert timers.next_deadline() == 2000 - config.configFull.general.pre_pass_init + \
+        Scheduler.scheduler.BOUNDARY_MARGIN
+
+    # unchanged since, nothing is re-read
+    assert Scheduler.scheduler.refresh_config(config, timers, current_date, logger) is False
@@ -0,0 +1,165 @@
+''' @file test_storage.py
+
+@brief Defines test for the storage manager.
+
+@section description_test_storage Description
+Defines the unit tests for the storage manager
+- test_index_built_and_reloaded
+- test_record_pass_and_space_needed
+- test_evict_oldest_passes
+- test_evict_failed_delete
+
+@section libraries_test_storage Libraries/Modules
+- python os library
+- python shutil library
+- python sys library
+
+@section todo_test_storage TODO
+- None.
+'''
+import os
+import shutil
+import sys
+sys.path.append('/home/debian')
+from shared.storage import StorageManager, DEFAULT_PASS_BYTES, INDEX_NAME
+
+def make_pass(path, name, sizes):
+    """
+        Creates a pass directory with files of the given sizes, one of them in a subdirectory
+
+            Parameters:
+                path (pathlib.Path) - root of the storage device
+                name (string) - name of the pass directory
+                sizes (list: int) - size of each file
+
+            Returns:
+                void
+    """
+
+    (path / name / "previews").mkdir(parents=True)
+    for i, size in enumerate(sizes):
+        directory = path / name / "previews" if i == 0 else path / name
+        (directory / f"frame{i}.tiff").write_bytes(b"\0" * size)
+
+def test_index_built_and_reloaded(tmp_path):
+    """
+        Tests the index is built from the pass directories when missing, ignores other files and directories, and is
+        reloaded without scanning when present
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    make_pass(tmp_path, "1727292818", [100, 200])
+    make_pass(tmp_path, "1727200000.5", [50])
+    (tmp_path / "lost+found").mkdir()
+    (tmp_path / "logs.log").write_text("log")
+
+    storage = StorageManager(str(tmp_path))
+
+    assert storage.passes() == ["1727200000.5", "1727292818"]
+    assert storage.index["1727292818"]["bytes"] == 300
+    assert storage.index["1727292818"]["files"] == 2
+    assert (tmp_path / INDEX_NAME).exists()
+
+    # a pass added without recording it is not picked up, the index is not rebuilt
+    make_pass(tmp_path, "1727300000", [10])
+    assert StorageManager(str(tmp_path)).passes() == ["1727200000.5", "1727292818"]
+
+def test_record_pass_and_space_needed(tmp_path):
+    """
+        Tests passes are recorded incrementally and the space needed for the next pass is the largest recent pass
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    storage = StorageManager(str(tmp_path))
+    assert storage.space_needed() == DEFAULT_PASS_BYTES
+
+    storage.record_pass("1000", 500, 5)
+    storage.record_pass("2000", 300, 3)
+    storage.record_pass("2000", 100, 1)
+    storage.record_pass("3000", 200, 2)
+    storage.record_pass("4000", 250, 2)
+
+    reloaded = StorageManager(str(tmp_path))
+    assert reloaded.index["2000"] == {"bytes": 400, "files": 4, "timestamp": 2000.0}
+    # the oldest pass is no longer one of the recent passes
+    assert reloaded.space_needed() == 400
+
+def test_evict_oldest_passes(tmp_path, monkeypatch):
+    """
+        Tests the oldest passes are deleted with their content until the next pass fits below the high-water mark, and
+        the kept pass is never deleted
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+                monkeypatch (pytest.MonkeyPatch) - pytest fixture to patch the disk usage
+
+            Returns:
+                void
+    """
+
+    for name in ["1000", "2000", "3000", "4000"]:
+        make_pass(tmp_path, name, [100, 150])
+    storage = StorageManager(str(tmp_path), highWaterMark=0.9)
+
+    # 1000 bytes device, 500 bytes used by other files plus the passes left on it
+    def disk_usage(path):
+        used = 500 + sum(storage.index[name]["bytes"] for name in os.listdir(tmp_path) if name in storage.index)
+        return 1000, used, 1000 - used
+
+    monkeypatch.setattr(shutil, "disk_usage", disk_usage)
+
+    evicted = storage.evict(needed=200, keep=["1000"])
+
+    # 1500 + 200 > 900, deleting 2000 and 3000 leaves 1000 + 200, deleting 4000 leaves 750 + 200, then nothing is
+    # left to delete
+    assert evicted == ["2000", "3000", "4000"]
+    assert not os.path.exists(tmp_path / "2000")
+    assert os.path.exists(tmp_path / "1000")
+    assert StorageManager(str(tmp_path)).passes() == ["1000"]
+
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: (1000, 500, 500))
+    assert storage.evict(needed=200) == []
+
+def test_evict_failed_delete(tmp_path, monkeypatch):
+    """
+        Tests a pass that can not be deleted stays in the index, so its deletion is retried, and the next pass is
+        deleted instead
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+                monkeypatch (pytest.MonkeyPatch) - pytest fixture to patch the disk usage and deletion
+
+            Returns:
+                void
+    """
+
+    for name in ["1000", "2000"]:
+        make_pass(tmp_path, name, [100, 150])
+    storage = StorageManager(str(tmp_path), highWaterMark=0.5)
+
+    def disk_usage(path):
+        used = sum(storage.index[name]["bytes"] for name in os.listdir(tmp_path) if name in storage.index)
+        return 1000, used, 1000 - used
+
+    rmtree = shutil.rmtree
+    def failing_rmtree(path, *args, **kwargs):
+        if os.path.basename(path) == "1000":
+            raise PermissionError("read only")
+        rmtree(path, *args, **kwargs)
+
+    monkeypatch.setattr(shutil, "disk_usage", disk_usage)
+    monkeypatch.setattr(shutil, "rmtree", failing_rmtree)
+
+    assert storage.evict(needed=400) == ["2000"]
+    assert StorageManager(str(tmp_path)).passes() == ["1000"]
+    assert os.path.exists(tmp_path / "1000")
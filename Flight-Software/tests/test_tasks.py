@@ -11,6 +11,7 @@ Defines the unit tests for the tasks class methods
 - test_array_to_string
 - test_post_pass_capture_timings
 - test_start_task
+- test_ready_time
 
 
 @section libraries_tasks Libraries/Modules
@@ -614,3 +615,85 @@ def test_start_task(caplog):
 
     assert caplog.records[1].message == "Process {id: 8} has started..."
 
+def test_ready_time(tmp_path):
+    """
+           Tests the ready_time function, checking that task delays and "after" dependencies delay the start of a task
+           without blocking, and that tasks run one after another wait for the previous task in their list
+
+           Parameters:
+               tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+           Returns:
+               void
+    """
+    # generate test tasks json
+    tasks = {
+        "tasks":
+        {
+            "pass":
+            [
+                {
+                    "id": 1,
+                    "name": "Start Basler Capture",
+                    "file_path": "",
+                    "delay": 5
+                },
+                {
+                    "id": 2,
+                    "name": "Start Tau Capture",
+                    "file_path": "",
+                    "delay": 0,
+                    "after": {"id": 1, "delay": 20}
+                }
+            ],
+            "post_pass":
+            [
+                {
+                    "id": 4,
+                    "name": "Transfer pass images to SD card",
+                    "file_path": "",
+                    "delay": 0
+                },
+                {
+                    "id": 5,
+                    "name": "Test task",
+                    "file_path": "",
+                    "delay": 0
+                }
+            ]
+        }
+    }
+
+    tasksPath = tmp_path / "tasks.json"
+    with open(tasksPath, 'w') as jsonFile:
+        json.dump(tasks, jsonFile)
+
+    tasks = Tasks(str(tasksPath))
+
+    passTasks = tasks.tasks['tasks']['pass']
+    postPassTasks = tasks.tasks['tasks']['post_pass']
+
+    # nothing has finished: tasks without dependencies are ready, the others wait
+    assert tasks.ready_time(passTasks[0]) == 0
+    assert tasks.ready_time(passTasks[1]) is None
+    assert tasks.ready_time(postPassTasks[0], postPassTasks) == 0
+    assert tasks.ready_time(postPassTasks[1], postPassTasks) is None
+
+    # task 1 finishing holds off the next task by its delay and starts task 2 20 seconds later
+    tasks.task_finished(passTasks[0], 100)
+    assert tasks.tasks_done == [1]
+    assert tasks.ready_time(postPassTasks[0], postPassTasks) == 105
+    assert tasks.ready_time(passTasks[1]) == 120
+
+    # the second post-pass task can start once the first has finished
+    tasks.task_finished(postPassTasks[0], 110)
+    assert tasks.ready_time(postPassTasks[1], postPassTasks) == 110
+
+    # a new pass forgets the finished tasks and their delays, and instances do not share their state
+    tasks.tasks_in_progress.append((None, passTasks[1]))
+    tasks.tasks_started = {1: 90, 2: 120}
+    tasks.new_pass()
+    assert tasks.tasks_done == [] and tasks.tasks_finished == {}
+    assert tasks.tasks_started == {2: 120}
+    assert tasks.ready_time(passTasks[0]) == 0
+    assert Tasks(str(tasksPath)).tasks_in_progress == []
@@ -0,0 +1,124 @@
+''' @file test_telemetry.py
+
+@brief Defines test for the binary telemetry format.
+
+@section description_test_telemetry Description
+Defines the unit tests for the binary telemetry writer, reader and csv export
+- test_write_read_telemetry
+- test_partial_record
+- test_export_csv
+
+@section libraries_test_telemetry Libraries/Modules
+- python pytest library
+- python sys library
+- python csv library
+- python numpy library
+
+@section todo_test_telemetry TODO
+- None.
+'''
+import pytest
+import csv
+import os
+import numpy as np
+import sys
+sys.path.append('/home/debian')
+from shared.telemetry import BinaryTelemetryWriter, read_telemetry, export_csv, record_dtype
+
+SENSOR_NAMES = ["T_TEMP", "B_TEMP", "A_TEMP", "CPU_TEMP", "T_CUR", "B_CUR", "A_CUR"]
+
+def write_samples(filename, count):
+    """
+        Writes a number of test samples to a binary telemetry file
+
+            Parameters:
+                filename (string): path to the telemetry file
+                count (int): number of samples to write
+
+            Returns:
+                void
+    """
+
+    with BinaryTelemetryWriter(filename, SENSOR_NAMES, flush_rows=4) as writer:
+        for i in range(count):
+            values = [20.5 + i, 21.0, 22.0, 45.25, 0.5, 0.75, float('NaN')]
+            flags = [20, 20, 20, 30, 20, 20, 0]
+            writer.append_sample(1636329600000000000 + i * 10**10, values, flags)
+
+def test_write_read_telemetry(tmp_path):
+    """
+        Tests samples written with the BinaryTelemetryWriter are read back by read_telemetry, and that each record
+        takes 43 bytes
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    filename = str(tmp_path / "telemetry.bin")
+    write_samples(filename, 10)
+
+    records = read_telemetry(filename)
+
+    assert record_dtype(SENSOR_NAMES).itemsize == 43
+    assert len(records) == 10
+    assert records["timestamp"][3] == 1636329600000000000 + 3 * 10**10
+    assert np.allclose(records["T_TEMP"], 20.5 + np.arange(10))
+    assert np.all(records["CPU_TEMP_FLAG"] == 30)
+    assert np.all(np.isnan(records["A_CUR"]))
+
+    # appending to an existing file keeps the header and the earlier records
+    write_samples(filename, 5)
+    assert len(read_telemetry(filename, mmap=False)) == 15
+
+def test_partial_record(tmp_path):
+    """
+        Tests a partially written last record is ignored by the reader and dropped before the writer appends
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    filename = str(tmp_path / "telemetry.bin")
+    write_samples(filename, 3)
+
+    with open(filename, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    assert len(read_telemetry(filename)) == 3
+
+    write_samples(filename, 1)
+    records = read_telemetry(filename)
+
+    assert len(records) == 4
+    assert records["timestamp"][3] == 1636329600000000000
+
+def test_export_csv(tmp_path):
+    """
+        Tests the csv export of a binary telemetry file
+
+            Parameters:
+                tmp_path (fixture): a fixture provided by pytest giving a temporary directory
+
+            Returns:
+                void
+    """
+
+    filename = str(tmp_path / "telemetry.bin")
+    csvFilename = str(tmp_path / "telemetry.csv")
+    write_samples(filename, 2)
+
+    assert export_csv(filename, csvFilename) == 2
+
+    with open(csvFilename, newline="") as f:
+        rows = list(csv.reader(f))
+
+    assert rows[0][:3] == ["Date", "T_TEMP", "T_TEMP_FLAG"]
+    assert rows[1][0] == "2021-11-08T00:00:00.000000000"
+    assert rows[2][1:3] == ["21.5", "20"]
+    assert len(rows) == 3
@@ -0,0 +1,100 @@
+''' @file test_timing.py
+
+@brief Defines test for the trigger timing functions.
+
+@section description_test_timing Description
+Defines the unit tests for the trigger timing functions
+- test_sleep_until
+- test_set_realtime
+- test_poll_with_backoff
+
+@section libraries_test_timing Libraries/Modules
+- python pytest library
+- python sys library
+- python os library
+- python time library
+- python logging library
+
+@section todo_test_timing TODO
+- None.
+'''
+import pytest
+import logging
+import os
+import time
+import sys
+sys.path.append('/home/debian')
+from shared.timing import sleep_until, set_realtime, poll_with_backoff
+
+def test_sleep_until():
+    """
+        Tests sleep_until never returns before the deadline, returns close after it, and returns straight away for a
+        deadline that has passed
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    for delay in [1000000, 5000000, 20000000]:
+        deadline = time.time_ns() + delay
+        wakeTime = sleep_until(deadline)
+
+        assert wakeTime >= deadline
+        assert wakeTime - deadline < 5000000
+
+    startTime = time.time_ns()
+    sleep_until(startTime - 1000000000)
+    assert time.time_ns() - startTime < 5000000
+
+def test_set_realtime():
+    """
+        Tests set_realtime applies a CPU affinity and reports an invalid priority as a failure rather than raising
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    logger = logging.getLogger("Test_Timing")
+    cpus = os.sched_getaffinity(0)
+
+    assert set_realtime(logger, cpus=cpus) is True
+    assert os.sched_getaffinity(0) == cpus
+
+    # priorities above 99 are never valid for SCHED_FIFO
+    assert set_realtime(logger, priority=1000) is False
+
+def test_poll_with_backoff():
+    """
+        Tests poll_with_backoff returns the first result of the probe, sleeping for a growing time between the calls,
+        and gives up at the timeout
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    callTimes = []
+
+    def probe():
+        callTimes.append(time.monotonic())
+        return "camera" if len(callTimes) == 4 else None
+
+    result, elapsed = poll_with_backoff(probe, 5, initial=0.02, maximum=0.05)
+
+    assert result == "camera"
+    gaps = [later - earlier for earlier, later in zip(callTimes, callTimes[1:])]
+    # sleeps of 0.02, 0.04 then 0.05 (the maximum) seconds
+    assert gaps[0] >= 0.02 and gaps[1] >= 0.04 and gaps[2] >= 0.05 and gaps[2] < 0.08
+    assert elapsed == pytest.approx(sum(gaps), abs=0.01)
+
+    result, elapsed = poll_with_backoff(lambda: None, 0.1, initial=0.03)
+    assert result is None
+    assert 0.1 <= elapsed < 0.2
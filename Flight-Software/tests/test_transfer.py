@@ -0,0 +1,271 @@
+''' @file test_transfer.py
+
+@brief Defines test for the crash safe file transfer.
+
+@section description_test_transfer Description
+Defines the unit tests for the crash safe file transfer
+- test_move_renames_on_same_filesystem
+- test_move_copies_and_verifies
+- test_move_resumes_verified_copy
+- test_move_replaces_partial_copy
+- test_copy_falls_back_midway
+- test_transfer_priority
+- test_transfer_workers
+- test_transfer_files
+
+@section libraries_test_transfer Libraries/Modules
+- python pytest library
+- python os library
+- python sys library
+- python threading library
+
+@section todo_test_transfer TODO
+- None.
+'''
+import pytest
+import os
+import sys
+import threading
+sys.path.append('/home/debian')
+import shared.transfer
+from shared.transfer import TransferJournal, move_file, copy_file, file_crc32, transfer_priority, transfer_workers, \
+    transfer_files, PARTIAL_SUFFIX, JOURNAL_NAME
+
+def make_file(path, size=100000):
+    """
+        Writes a file of random bytes
+
+            Parameters:
+                path (pathlib.Path) - path of the file
+                size (int) - size of the file in bytes
+
+            Returns:
+                content (bytes) - content of the file
+    """
+
+    content = os.urandom(size)
+    path.write_bytes(content)
+
+    return content
+
+def test_move_renames_on_same_filesystem(tmp_path):
+    """
+        Tests a file on the same filesystem as its destination is renamed
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "dst").mkdir()
+    content = make_file(tmp_path / "src" / "frame.tiff")
+    journal = TransferJournal(tmp_path / "dst")
+
+    size, method = move_file(str(tmp_path / "src" / "frame.tiff"), str(tmp_path / "dst" / "frame.tiff"), journal)
+
+    assert (size, method) == (len(content), "rename")
+    assert not (tmp_path / "src" / "frame.tiff").exists()
+    assert (tmp_path / "dst" / "frame.tiff").read_bytes() == content
+
+def test_move_copies_and_verifies(tmp_path):
+    """
+        Tests a copied file is verified, journalled and its source removed
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    content = make_file(tmp_path / "frame.bayer", 3000000)
+    (tmp_path / "dst").mkdir()
+    journal = TransferJournal(tmp_path / "dst")
+    src, dst = str(tmp_path / "frame.bayer"), str(tmp_path / "dst" / "frame.bayer")
+
+    size, method = move_file(src, dst, journal, allowRename=False)
+
+    assert (size, method) == (len(content), "copy")
+    assert not os.path.exists(src)
+    assert (tmp_path / "dst" / "frame.bayer").read_bytes() == content
+    assert not os.path.exists(dst + PARTIAL_SUFFIX)
+
+    # the journal survives a restart
+    assert TransferJournal(tmp_path / "dst").entries[src]["crc"] == file_crc32(dst)
+
+    journal.clear()
+    assert not (tmp_path / "dst" / JOURNAL_NAME).exists()
+
+def test_move_resumes_verified_copy(tmp_path):
+    """
+        Tests a transfer interrupted after a verified copy only removes the source when resumed, and a source changed
+        since is copied again
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    (tmp_path / "dst").mkdir()
+    src, dst = str(tmp_path / "timings.csv"), str(tmp_path / "dst" / "timings.csv")
+
+    content = make_file(tmp_path / "timings.csv")
+    move_file(src, dst, TransferJournal(tmp_path / "dst"), allowRename=False)
+    # interrupted before the source was removed
+    (tmp_path / "timings.csv").write_bytes(content)
+
+    size, method = move_file(src, dst, TransferJournal(tmp_path / "dst"), allowRename=False)
+    assert method == "resumed"
+    assert not os.path.exists(src)
+
+    content = make_file(tmp_path / "timings.csv")
+    size, method = move_file(src, dst, TransferJournal(tmp_path / "dst"), allowRename=False)
+    assert method == "copy"
+    assert (tmp_path / "dst" / "timings.csv").read_bytes() == content
+
+def test_move_replaces_partial_copy(tmp_path):
+    """
+        Tests a partial copy left by an interrupted transfer is replaced and never mistaken for a complete one
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    (tmp_path / "dst").mkdir()
+    content = make_file(tmp_path / "frame.jpg")
+    src, dst = str(tmp_path / "frame.jpg"), str(tmp_path / "dst" / "frame.jpg")
+    with open(dst + PARTIAL_SUFFIX, "wb") as f:
+        f.write(content[:1000])
+
+    size, method = move_file(src, dst, TransferJournal(tmp_path / "dst"), allowRename=False)
+
+    assert method == "copy"
+    assert (tmp_path / "dst" / "frame.jpg").read_bytes() == content
+    assert not os.path.exists(dst + PARTIAL_SUFFIX)
+
+def test_copy_falls_back_midway(tmp_path, monkeypatch):
+    """
+        Tests a copy that copy_file_range stops partway through is finished by the next method from where it stopped
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+                monkeypatch (pytest.MonkeyPatch) - pytest fixture to patch the kernel copy
+
+            Returns:
+                void
+    """
+
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("copy_file_range is not available")
+
+    content = make_file(tmp_path / "frame.tiff", 3000000)
+    copyFileRange = os.copy_file_range
+    calls = []
+
+    def failing_copy(src, dst, count, offsetSrc=None, offsetDst=None):
+        calls.append(offsetSrc)
+        if len(calls) > 1:
+            raise OSError("copy_file_range failed")
+        return copyFileRange(src, dst, 1000000, offsetSrc, offsetDst)
+
+    monkeypatch.setattr(os, "copy_file_range", failing_copy)
+
+    assert copy_file(str(tmp_path / "frame.tiff"), str(tmp_path / "copy.tiff")) == len(content)
+    assert calls == [0, 1000000]
+    assert (tmp_path / "copy.tiff").read_bytes() == content
+
+def test_transfer_priority():
+    """
+        Tests timings are transferred before the images, and the raw frames last
+
+            Parameters:
+                void
+
+            Returns:
+                void
+    """
+
+    paths = ["/home/debian/Tasks/tau2/frame.dat", "/home/debian/Tasks/basler/frame.tiff",
+             "/home/debian/Tasks/basler/frame.bayer", "/home/debian/Scheduler/timings.csv",
+             "/home/debian/Tasks/arducam/frame.jpg"]
+
+    ordered = sorted(paths, key=transfer_priority)
+
+    assert ordered[0] == "/home/debian/Scheduler/timings.csv"
+    assert ordered[1] == "/home/debian/Tasks/arducam/frame.jpg"
+    assert ordered[2] == "/home/debian/Tasks/basler/frame.tiff"
+    assert set(ordered[3:]) == {"/home/debian/Tasks/tau2/frame.dat", "/home/debian/Tasks/basler/frame.bayer"}
+
+def test_transfer_workers(tmp_path):
+    """
+        Tests the number of transfer threads is the one configured for the destination's device
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+
+            Returns:
+                void
+    """
+
+    (tmp_path / "pass").mkdir()
+
+    assert transfer_workers(str(tmp_path / "pass"), {"default": 2, str(tmp_path): 4}) == 4
+    assert transfer_workers(str(tmp_path / "pass"), {"default": 3, "/does/not/exist": 4}) == 3
+    assert transfer_workers(str(tmp_path / "pass"), {"default": 0}) == 1
+
+def test_transfer_files(tmp_path, monkeypatch):
+    """
+        Tests the files are moved in priority order by the pool of threads and a failed file is reported without
+        stopping the others
+
+            Parameters:
+                tmp_path (pathlib.Path) - temporary directory from pytest
+                monkeypatch (pytest.MonkeyPatch) - pytest fixture to patch the file moves
+
+            Returns:
+                void
+    """
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "dst").mkdir()
+    names = ["a.bayer", "b.tiff", "c.csv", "d.jpg", "e.dat"]
+    sizes = {name: len(make_file(tmp_path / "src" / name, 1000 * (i + 1))) for i, name in enumerate(names)}
+    (tmp_path / "src" / "missing.csv").write_bytes(b"")
+    transfers = [(str(tmp_path / "src" / name), str(tmp_path / "dst" / name)) for name in names + ["missing.csv"]]
+    os.remove(tmp_path / "src" / "missing.csv")
+
+    started = []
+    threads = set()
+    moveFile = shared.transfer.move_file
+
+    def record_move(source, destination, journal, allowRename):
+        started.append(os.path.basename(source))
+        threads.add(threading.current_thread().name)
+        return moveFile(source, destination, journal, allowRename)
+
+    monkeypatch.setattr(shared.transfer, "move_file", record_move)
+    journal = TransferJournal(tmp_path / "dst")
+
+    transferred, failed = transfer_files(transfers, journal, workers=1, allowRename=False)
+
+    assert started == ["c.csv", "missing.csv", "d.jpg", "b.tiff", "a.bayer", "e.dat"]
+    assert transferred == sum(sizes.values())
+    assert failed == [str(tmp_path / "src" / "missing.csv")]
+    for name in names:
+        assert (tmp_path / "dst" / name).stat().st_size == sizes[name]
+
+    (tmp_path / "src" / "f.tiff").write_bytes(b"frame")
+    (tmp_path / "src" / "g.tiff").write_bytes(b"frame")
+    threads.clear()
+    transferred, failed = transfer_files([(str(tmp_path / "src" / name), str(tmp_path / "dst" / name))
+                                          for name in ["f.tiff", "g.tiff"]], journal, workers=2)
+    assert (transferred, failed) == (10, [])
+    assert all(name.startswith("transfer") for name in threads)
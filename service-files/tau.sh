@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# run from the scheduler directory, the tau images are written to the working directory as when tau.py is run by the scheduler
+cd /home/debian/Scheduler
+python3 /home/debian/Tasks/tau2/tau.py --daemon
@@ -105,7 +105,7 @@ cd /home/debian/Tasks/tau2/lib/libthermalgrabber
 cmake CMakeLists.txt
 make
 cd /home/debian/Tasks/tau2
-g++ -std=c++11 /home/debian/Tasks/tau2/c++/src/capture.cpp -o main -I/home/debian/Tasks/tau2/lib/libthermalgrabber/inc -L/home/debian/Tasks/tau2/lib/libthermalgrabber/lib -lthermalgrabber
+g++ -std=c++11 /home/debian/Tasks/tau2/c++/src/capture.cpp -o main -I/home/debian/Tasks/tau2/lib/libthermalgrabber/inc -L/home/debian/Tasks/tau2/lib/libthermalgrabber/lib -lthermalgrabber -pthread
 cd /home/debian/tests/tau_files
 g++ -std=c++11 /home/debian/tests/tau_files/test_tau.cpp -o test_tau -I/home/debian/Tasks/tau2/lib/libthermalgrabber/inc -L/home/debian/Tasks/tau2/lib/libthermalgrabber/lib -lthermalgrabber
 echo $psw | sudo -S find /home/debian/Tasks/tau2/lib/libthermalgrabber -mindepth 1 ! -regex '^/home/debian/Tasks/tau2/lib/libthermalgrabber/lib\(/.*\)?' -delete
@@ -134,6 +134,16 @@ echo $psw | sudo -S systemctl enable telemetry.service
 echo $psw | sudo -S systemctl start telemetry.service
 echo $psw | sudo -S chmod u+x /usr/bin/telemetry.sh
 
+# Tau daemon service setup
+echo "${Yellow}Setting up a tau daemon service...${NoColor}"
+echo $psw | sudo -S mv /home/debian/service-files/tau.sh /usr/bin/tau.sh
+echo $psw | sudo -S mv /home/debian/service-files/tau.service /lib/systemd/tau.service
+echo $psw | sudo -S ln -s /lib/systemd/tau.service /etc/systemd/system/tau.service
+echo $psw | sudo -S systemctl daemon-reload
+echo $psw | sudo -S systemctl enable tau.service
+echo $psw | sudo -S systemctl start tau.service
+echo $psw | sudo -S chmod u+x /usr/bin/tau.sh
+
 # SDmount service setup
 echo "${Yellow}Setting up a telemetry service...${NoColor}"
 echo $psw | sudo -S mv /home/debian/service-files/SDmount.sh /usr/bin/SDmount.sh